@@ -0,0 +1,21 @@
+# src/dopingflow/_files.py
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Iterable
+
+
+def output_up_to_date(out_path: Path, input_paths: Iterable[str | Path]) -> bool:
+    """True iff out_path exists and is at least as new as every existing input."""
+    try:
+        out_mtime = out_path.stat().st_mtime_ns
+    except OSError:
+        return False
+    for p in input_paths:
+        try:
+            if os.stat(p).st_mtime_ns > out_mtime:
+                return False
+        except OSError:
+            continue
+    return True
@@ -0,0 +1,67 @@
+# src/dopingflow/_jsonio.py
+"""
+JSON helpers shared by the workflow steps: orjson when installed (the "speedups"
+extra), stdlib json otherwise and for whatever orjson rejects.
+"""
+from __future__ import annotations
+
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any
+
+try:
+    import orjson  # optional, faster JSON parsing and serialization
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# files above this size are parsed from a read-only mmap instead of a heap copy
+_MMAP_MIN_BYTES = 64 * 1024
+
+
+def loads_json(data: bytes) -> Any:
+    """Parse with orjson when installed; stdlib json handles what it rejects (NaN literals)."""
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(data)
+
+
+def load_json_file(path: str | Path) -> Any:
+    """
+    Parse a JSON file from its raw bytes (no intermediate str/utf-8 decode). Small files
+    take a single os.read(); large ones are handed to orjson as an mmap-backed buffer.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        size = os.fstat(fd).st_size
+        if orjson is not None and size >= _MMAP_MIN_BYTES:
+            with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mm, memoryview(mm) as buf:
+                try:
+                    return orjson.loads(buf)
+                except orjson.JSONDecodeError:
+                    return json.loads(mm[:])
+        data = os.read(fd, size)
+    finally:
+        os.close(fd)
+    return loads_json(data)
+
+
+def dumps_json(obj: Any, pretty: bool = False) -> bytes:
+    """
+    JSON as UTF-8 bytes, compact unless `pretty` (2-space indent). orjson output parses to
+    the same values as json.dumps (it only spells small exponents and non-ASCII characters
+    differently); values orjson does not serialize go through stdlib json, which only
+    uses its C encoder when compact.
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if pretty else None)
+        except TypeError:
+            pass
+    if pretty:
+        return json.dumps(obj, indent=2).encode("utf-8")
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
@@ -0,0 +1,27 @@
+# src/dopingflow/_toml.py
+"""
+input.toml loading shared by the workflow steps: parsed once per (path, mtime), so an
+edited file is read again while repeated loads of the same file are free.
+"""
+from __future__ import annotations
+
+import functools
+from pathlib import Path
+from typing import Any
+
+try:
+    import tomllib  # py3.11+
+except ModuleNotFoundError:  # pragma: no cover
+    import tomli as tomllib
+
+
+@functools.lru_cache(maxsize=16)
+def load_toml_cached(path_str: str, mtime_ns: int) -> dict[str, Any]:
+    # mtime_ns is part of the cache key only: an edited input.toml is parsed again
+    return tomllib.loads(Path(path_str).read_text(encoding="utf-8"))
+
+
+def load_toml(path: Path) -> dict[str, Any]:
+    """Parsed TOML, memoized per (path, mtime). The dict is shared: do not mutate it."""
+    path = path.resolve()
+    return load_toml_cached(str(path), path.stat().st_mtime_ns)
@@ -2,16 +2,24 @@
 from __future__ import annotations
 
 import csv
+import functools
+import hashlib
+import io
 import json
 import logging
 import math
 import os
+import queue
+import re
+import threading
 import time
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Tuple
 
+from dopingflow._toml import load_toml
 from dopingflow.hardware import resolve_torch_device
 
 log = logging.getLogger(__name__)
@@ -24,6 +32,15 @@ RELAX_POSCAR_REL = "02_relax/POSCAR"
 CAND_LIST_NAME = "selected_candidates.txt"
 OUT_CSV_NAME = "bandgap_alignn_summary.csv"
 BAND_META_REL = "03_band/meta.json"
+GRAPH_CACHE_REL = "03_band/.graph_cache.pt"
+MODEL_KEY = "jv_mbj_bandgap_alignn (local)"
+
+# One stripped, non-comment line of selected_candidates.txt
+_SELECTED_LINE_RE = re.compile(r"^\s*([^#\s].*?)\s*$", re.M)
+
+# Loaded model reused across run_bandgap calls (and across tasks in a CPU worker)
+_MODEL_BUNDLE = None
+_MODEL_CACHE_KEY = None
 
 
 # -----------------------------
@@ -39,6 +56,11 @@ class BandgapConfig:
     device: str
     gpu_id: int
     batch_size: int
+    mixed_precision: bool
+    torch_compile: bool
+    parse_workers: int
+    graph_cache: bool
+    trust_checkpoint: bool
 
 
 def _parse_bandgap_config(raw: dict[str, Any], root: Path) -> BandgapConfig:
@@ -55,6 +77,11 @@ def _parse_bandgap_config(raw: dict[str, Any], root: Path) -> BandgapConfig:
     device = str(bg.get("device", "cpu")).lower()
     gpu_id = int(bg.get("gpu_id", 0))
     batch_size = int(bg.get("batch_size", 32))
+    mixed_precision = bool(bg.get("mixed_precision", False))
+    torch_compile = bool(bg.get("torch_compile", False))
+    parse_workers = int(bg.get("parse_workers", 0))
+    graph_cache = bool(bg.get("graph_cache", False))
+    trust_checkpoint = bool(bg.get("trust_checkpoint", False))
 
     if cutoff <= 0:
         raise ValueError("[bandgap].cutoff must be > 0")
@@ -68,6 +95,8 @@ def _parse_bandgap_config(raw: dict[str, Any], root: Path) -> BandgapConfig:
         raise ValueError("[bandgap].gpu_id must be >= 0")
     if batch_size <= 0:
         raise ValueError("[bandgap].batch_size must be >= 1")
+    if parse_workers < 0:
+        raise ValueError("[bandgap].parse_workers must be >= 0")
 
     return BandgapConfig(
         outdir=outdir,
@@ -78,29 +107,48 @@ def _parse_bandgap_config(raw: dict[str, Any], root: Path) -> BandgapConfig:
         device=device,
         gpu_id=gpu_id,
         batch_size=batch_size,
+        mixed_precision=mixed_precision,
+        torch_compile=torch_compile,
+        parse_workers=parse_workers,
+        graph_cache=graph_cache,
+        trust_checkpoint=trust_checkpoint,
     )
 
 
 # -----------------------------
 # ALIGNN helpers
 # -----------------------------
-def _poscar_to_jarvis_atoms(poscar_path: Path):
-    from jarvis.core.atoms import Atoms
+def _read_poscar_arrays(poscar_path_str: str):
+    """Parse a POSCAR into plain (lattice_matrix, frac_coords, elements); cheap to pickle."""
     from pymatgen.core import Structure
 
-    s = Structure.from_file(str(poscar_path))
+    s = Structure.from_file(poscar_path_str)
+    return s.lattice.matrix, s.frac_coords, [str(sp) for sp in s.species]
+
+
+def _arrays_to_jarvis_atoms(lattice_mat, frac_coords, elements):
+    from jarvis.core.atoms import Atoms
+
     return Atoms(
-        lattice_mat=s.lattice.matrix,
-        coords=s.frac_coords,
-        elements=[str(sp) for sp in s.species],
+        lattice_mat=lattice_mat,
+        coords=frac_coords,
+        elements=elements,
         cartesian=False,
     )
 
 
+def _poscar_to_jarvis_atoms(poscar_path: Path):
+    return _arrays_to_jarvis_atoms(*_read_poscar_arrays(str(poscar_path)))
+
+
 def _find_model_dir(root: Path) -> Path:
     if not root.exists():
         raise RuntimeError(f"Model root folder not found: {root}")
 
+    # common case: ALIGNN_MODEL_DIR already points at the model folder
+    if (root / "config.json").is_file() and any(root.glob("*.pt")):
+        return root
+
     cfgs = list(root.rglob("config.json"))
     if not cfgs:
         raise RuntimeError(f"Could not find config.json under {root}")
@@ -114,7 +162,129 @@ def _find_model_dir(root: Path) -> Path:
     return cfgs[0].parent
 
 
-def _load_local_alignn_model(model_dir: Path, device_str: str):
+@functools.lru_cache(maxsize=4)
+def _find_model_dir_cached(root_str: str) -> Path:
+    """The rglob in _find_model_dir is deterministic per ALIGNN_MODEL_DIR value."""
+    return _find_model_dir(Path(root_str))
+
+
+def _find_checkpoint(model_dir: Path) -> Path:
+    ckpts = sorted(model_dir.glob("checkpoint_*.pt"))
+    if not ckpts:
+        ckpts = sorted(model_dir.glob("*.pt"))
+    if not ckpts:
+        raise RuntimeError(f"No checkpoint_*.pt or *.pt found in {model_dir}")
+    return ckpts[-1]
+
+
+def _get_alignn_model(
+    model_dir: Path, device_str: str, *, torch_compile: bool = False, trust_checkpoint: bool = False
+):
+    """
+    Return (model, cfg_path, ckpt_path, device), loading only when the model dir,
+    device, flags or checkpoint mtime changed since the last call in this process.
+    """
+    global _MODEL_BUNDLE, _MODEL_CACHE_KEY
+
+    ckpt = _find_checkpoint(model_dir)
+    key = (
+        str(model_dir),
+        device_str,
+        bool(torch_compile),
+        bool(trust_checkpoint),
+        str(ckpt),
+        ckpt.stat().st_mtime_ns,
+    )
+
+    if _MODEL_BUNDLE is not None and _MODEL_CACHE_KEY == key:
+        log.debug("ALIGNN model cache hit: %s", ckpt)
+        return _MODEL_BUNDLE
+
+    model, cfg_path, ckpt_path, device = _load_local_alignn_model(
+        model_dir, device_str, trust_checkpoint=trust_checkpoint
+    )
+    if torch_compile:
+        model = _compile_model(model)
+
+    _MODEL_BUNDLE = (model, cfg_path, ckpt_path, device)
+    _MODEL_CACHE_KEY = key
+    return _MODEL_BUNDLE
+
+
+def _compile_model(model):
+    """
+    Wrap the model with torch.compile (dynamic shapes, since graph sizes vary per batch;
+    default mode, as CUDA graphs do not suit batched DGL graphs of varying size).
+    Compilation is lazy, so errors raised at the first forward are handled by
+    _fall_back_to_eager; here only a missing or rejecting torch.compile is caught.
+    """
+    import torch
+
+    if not hasattr(torch, "compile"):
+        log.warning("torch.compile not available in this torch version; using eager model.")
+        return model
+
+    try:
+        compiled = torch.compile(model, dynamic=True)
+    except Exception as e:
+        log.warning("torch.compile failed (%r); using eager model.", e)
+        return model
+
+    log.info("ALIGNN model wrapped with torch.compile (dynamic=True)")
+    return compiled
+
+
+def _fall_back_to_eager(model, err: Exception):
+    """
+    Eager module of a torch.compile'd model whose forward failed, or None if `model` is
+    not compiled. The cached bundle is switched to it as well, so the rest of the run
+    (and later runs in this process) do not compile again.
+    """
+    global _MODEL_BUNDLE
+
+    eager = getattr(model, "_orig_mod", None)
+    if eager is None:
+        return None
+    log.warning("torch.compile'd ALIGNN model failed (%r); using the eager model from now on.", err)
+    if _MODEL_BUNDLE is not None and _MODEL_BUNDLE[0] is model:
+        _MODEL_BUNDLE = (eager,) + tuple(_MODEL_BUNDLE[1:])
+    return eager
+
+
+def _current_model(model):
+    """`model`, or its eager module once _fall_back_to_eager has replaced it in the cache."""
+    if _MODEL_BUNDLE is not None and getattr(model, "_orig_mod", None) is _MODEL_BUNDLE[0]:
+        return _MODEL_BUNDLE[0]
+    return model
+
+
+def _load_checkpoint_state(ckpt: Path, *, trusted: bool = False):
+    """
+    Load checkpoint tensors without unpickling arbitrary objects, memory-mapping the file
+    where supported (torch >= 2.1, zip format), else without mmap. A checkpoint that only
+    loads as a full pickle is refused unless `trusted` ([bandgap].trust_checkpoint).
+    Tensors stay on CPU; the model is moved to its device after load_state_dict.
+    """
+    import torch
+
+    try:
+        return torch.load(str(ckpt), map_location="cpu", weights_only=True, mmap=True)
+    except Exception as e:
+        log.debug("torch.load(weights_only=True, mmap=True) failed for %s (%r); retrying", ckpt, e)
+    try:
+        return torch.load(str(ckpt), map_location="cpu", weights_only=True)
+    except Exception as e:
+        if not trusted:
+            raise RuntimeError(
+                f"Checkpoint {ckpt} cannot be loaded with torch.load(weights_only=True): {e!r}\n"
+                "Set [bandgap].trust_checkpoint = true to unpickle it anyway "
+                "(only for checkpoints from a trusted source)."
+            ) from e
+        log.warning("Loading %s as a full pickle ([bandgap].trust_checkpoint = true): %r", ckpt, e)
+    return torch.load(str(ckpt), map_location="cpu", weights_only=False)
+
+
+def _load_local_alignn_model(model_dir: Path, device_str: str, *, trust_checkpoint: bool = False):
     import torch
     from alignn.config import ALIGNNConfig
     from alignn.models.alignn import ALIGNN
@@ -131,12 +301,7 @@ def _load_local_alignn_model(model_dir: Path, device_str: str):
     model_cfg.setdefault("name", "alignn")
     cfg = ALIGNNConfig(**model_cfg)
 
-    ckpts = sorted(model_dir.glob("checkpoint_*.pt"))
-    if not ckpts:
-        ckpts = sorted(model_dir.glob("*.pt"))
-    if not ckpts:
-        raise RuntimeError(f"No checkpoint_*.pt or *.pt found in {model_dir}")
-    ckpt = ckpts[-1]
+    ckpt = _find_checkpoint(model_dir)
 
     device = torch.device(device_str)
 
@@ -145,10 +310,11 @@ def _load_local_alignn_model(model_dir: Path, device_str: str):
     log.info("ALIGNN device : %s", device)
 
     model = ALIGNN(cfg)
-    state = torch.load(str(ckpt), map_location=device)
+    state = _load_checkpoint_state(ckpt, trusted=trust_checkpoint)
     if isinstance(state, dict) and "state_dict" in state:
         state = state["state_dict"]
-    state = {k.replace("module.", ""): v for k, v in state.items()}
+    if any("module." in k for k in state):
+        state = {k.replace("module.", ""): v for k, v in state.items()}
 
     model.load_state_dict(state, strict=False)
     model.to(device)
@@ -178,46 +344,128 @@ def _build_alignn_inputs(jarvis_atoms, cutoff: float, max_neighbors: int):
     return g, lg, lat
 
 
-def _predict_bandgap(model, jarvis_atoms, cutoff: float, max_neighbors: int) -> float:
+def _graph_cache_key(poscar_bytes: bytes, cutoff: float, max_neighbors: int) -> Tuple[str, float, int]:
+    return hashlib.sha256(poscar_bytes).hexdigest(), float(cutoff), int(max_neighbors)
+
+
+def _graph_to_tensors(g) -> Dict[str, Any]:
+    """A DGL graph as plain tensors (edges, node count, features) for a weights_only cache."""
+    src, dst = g.edges()
+    return {
+        "src": src,
+        "dst": dst,
+        "num_nodes": int(g.num_nodes()),
+        "ndata": dict(g.ndata),
+        "edata": dict(g.edata),
+    }
+
+
+def _graph_from_tensors(d: Dict[str, Any]):
+    import dgl
+
+    g = dgl.graph((d["src"], d["dst"]), num_nodes=int(d["num_nodes"]))
+    g.ndata.update(d["ndata"])
+    g.edata.update(d["edata"])
+    return g
+
+
+def _load_graph_cache(cache_path: Path, key: Tuple[str, float, int]):
+    """
+    Return the cached (item, summary) if the cache matches `key`, else None. The file holds
+    only tensors and plain containers, so it is read with weights_only=True: a cache file
+    in a shared or copied work tree cannot run code on load.
+    """
+    import torch
+
+    if not cache_path.is_file():
+        return None
+    try:
+        payload = torch.load(str(cache_path), map_location="cpu", weights_only=True)
+        if tuple(payload["key"]) != key:
+            return None
+        g = _graph_from_tensors(payload["g"])
+        lg = _graph_from_tensors(payload["lg"])
+        summary = (int(payload["n_atoms"]), dict(payload["composition"]))
+        return (g, lg, payload["lat"]), summary
+    except Exception as e:
+        log.debug("Ignoring unreadable graph cache %s: %r", cache_path, e)
+        return None
+
+
+def _save_graph_cache(cache_path: Path, key: Tuple[str, float, int], item, summary) -> None:
+    import torch
+
+    g, lg, lat = item
+    n_atoms, composition = summary
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cache_path.with_suffix(".tmp")
+        payload = {
+            "key": list(key),
+            "g": _graph_to_tensors(g),
+            "lg": _graph_to_tensors(lg),
+            "lat": lat,
+            "n_atoms": int(n_atoms),
+            "composition": {str(k): int(v) for k, v in composition.items()},
+        }
+        torch.save(payload, str(tmp))
+        os.replace(tmp, cache_path)
+    except Exception as e:
+        log.debug("Could not write graph cache %s: %r", cache_path, e)
+
+
+def _autocast(device, enabled: bool):
+    """bf16 autocast on CUDA when requested; a no-op context otherwise."""
+    import torch
+
+    return torch.autocast(
+        device_type=device.type,
+        dtype=torch.bfloat16,
+        enabled=bool(enabled and device.type == "cuda"),
+    )
+
+
+def _predict_bandgap(
+    model,
+    jarvis_atoms,
+    cutoff: float,
+    max_neighbors: int,
+    device,
+    *,
+    mixed_precision: bool = False,
+) -> float:
     import torch
 
     g, lg, lat = _build_alignn_inputs(jarvis_atoms, cutoff=cutoff, max_neighbors=max_neighbors)
 
-    device = next(model.parameters()).device
     g = g.to(device)
     lg = lg.to(device)
     lat = lat.to(device)
 
-    with torch.no_grad():
+    with torch.inference_mode(), _autocast(device, mixed_precision):
         pred = model((g, lg, lat))
 
-    return float(torch.as_tensor(pred).detach().cpu().reshape(-1)[0])
+    return float(torch.as_tensor(pred).detach().float().cpu().reshape(-1)[0])
 
 
-def _predict_bandgap_batch(model, items):
+def _predict_bandgap_batch(model, items, device, *, mixed_precision: bool = False):
     import dgl
     import torch
 
-    device = next(model.parameters()).device
-
     gs, lgs, lats = zip(*items)
     bg = dgl.batch(gs).to(device)
     blg = dgl.batch(lgs).to(device)
     blat = torch.cat(lats, dim=0).to(device)
 
-    with torch.no_grad():
+    with torch.inference_mode(), _autocast(device, mixed_precision):
         pred = model((bg, blg, blat))
 
-    return torch.as_tensor(pred).detach().cpu().reshape(-1).tolist()
+    return torch.as_tensor(pred).detach().float().cpu().reshape(-1).tolist()
 
 
 def _load_selected_candidates(path: Path) -> List[str]:
-    out: List[str] = []
-    for ln in path.read_text(encoding="utf-8").splitlines():
-        ln = ln.strip()
-        if ln and not ln.startswith("#"):
-            out.append(ln)
-    return out
+    """Non-empty, non-comment lines (stripped), in file order."""
+    return _SELECTED_LINE_RE.findall(path.read_text(encoding="utf-8"))
 
 
 def _write_band_meta(candidate_dir: Path, bandgap_eV: float, extra: Dict[str, Any]) -> None:
@@ -242,6 +490,7 @@ def _cpu_predict_one(
     cutoff: float,
     max_neighbors: int,
     model_dir_str: str,
+    trust_checkpoint: bool = False,
 ) -> Dict[str, Any]:
     poscar_path = Path(poscar_path_str)
     cand_dir = poscar_path.parents[1]
@@ -251,8 +500,10 @@ def _cpu_predict_one(
         jat = _poscar_to_jarvis_atoms(poscar_path)
         t0 = time.time()
 
-        model, cfg_path, ckpt_path, _device = _load_local_alignn_model(Path(model_dir_str), "cpu")
-        bg = _predict_bandgap(model, jat, cutoff=cutoff, max_neighbors=max_neighbors)
+        model, cfg_path, ckpt_path, device = _get_alignn_model(
+            Path(model_dir_str), "cpu", trust_checkpoint=trust_checkpoint
+        )
+        bg = _predict_bandgap(model, jat, cutoff=cutoff, max_neighbors=max_neighbors, device=device)
         wall_s = time.time() - t0
 
         return {
@@ -261,13 +512,13 @@ def _cpu_predict_one(
             "status": "ok",
             "extra": {
                 "status": "ok",
-                "model_key": "jv_mbj_bandgap_alignn (local)",
+                "model_key": MODEL_KEY,
                 "model_dir": str(model_dir_str),
                 "config_json": str(cfg_path),
                 "checkpoint": str(ckpt_path),
                 "input_poscar": str(poscar_path),
                 "n_atoms": int(len(jat.elements)),
-                "composition": dict(jat.composition.to_dict()),
+                "composition": dict(Counter(jat.elements)),
                 "graph_params": {
                     "cutoff": float(cutoff),
                     "max_neighbors": int(max_neighbors),
@@ -288,7 +539,7 @@ def _cpu_predict_one(
                     "cutoff": float(cutoff),
                     "max_neighbors": int(max_neighbors),
                 },
-                "model_key": "jv_mbj_bandgap_alignn (local)",
+                "model_key": MODEL_KEY,
                 "model_dir": str(model_dir_str),
             },
         }
@@ -297,40 +548,264 @@ def _cpu_predict_one(
 # -----------------------------
 # Per-folder processing
 # -----------------------------
+def _scan_relaxed_poscars(folder: Path) -> Dict[str, Path]:
+    """
+    One directory scan of `folder`: candidate dir name -> relaxed POSCAR path,
+    for subfolders that contain RELAX_POSCAR_REL.
+    """
+    found: Dict[str, Path] = {}
+    with os.scandir(folder) as it:
+        for entry in it:
+            if not entry.is_dir():
+                continue
+            p = os.path.join(entry.path, RELAX_POSCAR_REL)
+            if os.path.isfile(p):
+                found[entry.name] = Path(p)
+    return found
+
+
+def _listed_relaxed_poscars(folder: Path, cand_names: List[str]) -> List[Path]:
+    """
+    Relaxed POSCAR paths of the listed candidates, in list order. Only the listed names
+    are looked up; names that are not a direct subfolder name, or whose folder has no
+    relaxed POSCAR, are skipped with a warning.
+    """
+    poscars: List[Path] = []
+    not_child: List[str] = []
+    missing: List[str] = []
+    for name in cand_names:
+        if name in (".", "..") or os.path.basename(name) != name:
+            not_child.append(name)
+            continue
+        p = os.path.join(folder, name, RELAX_POSCAR_REL)
+        if os.path.isfile(p):
+            poscars.append(Path(p))
+        else:
+            missing.append(name)
+
+    if not_child:
+        log.warning(
+            "SELECT %s: ignoring %s entries that are not folder names: %s",
+            folder.name,
+            CAND_LIST_NAME,
+            not_child,
+        )
+    if missing:
+        log.warning(
+            "SELECT %s: no %s for listed candidates: %s", folder.name, RELAX_POSCAR_REL, missing
+        )
+    return poscars
+
+
 def _get_relaxed_poscars(folder: Path) -> List[Path]:
     cand_list = folder / CAND_LIST_NAME
     if cand_list.exists():
-        cand_names = _load_selected_candidates(cand_list)
-        poscars = [folder / c / RELAX_POSCAR_REL for c in cand_names]
-        poscars = [p for p in poscars if p.exists()]
+        poscars = _listed_relaxed_poscars(folder, _load_selected_candidates(cand_list))
         log.info("SELECT %s: using %d relaxed POSCARs from %s", folder.name, len(poscars), CAND_LIST_NAME)
         return poscars
 
-    poscars = sorted(folder.glob(f"candidate_*/{RELAX_POSCAR_REL}"))
+    found = _scan_relaxed_poscars(folder)
+    poscars = [found[name] for name in sorted(found) if name.startswith("candidate_")]
     log.info("SELECT %s: using glob: %d relaxed POSCARs", folder.name, len(poscars))
     return poscars
 
 
 def _write_summary_csv(out_csv: Path, rows: List[Tuple[str, float]]) -> None:
     rows_sorted = sorted(rows, key=lambda x: (math.isnan(x[1]), x[1]))
+    buf = io.StringIO()
+    w = csv.writer(buf)
+    w.writerow(["candidate", "bandgap_eV_ALIGNN_MBJ"])
+    w.writerows((cand, f"{bg:.6f}") for cand, bg in rows_sorted)
     with out_csv.open("w", newline="", encoding="utf-8") as f:
-        w = csv.writer(f)
-        w.writerow(["candidate", "bandgap_eV_ALIGNN_MBJ"])
-        for cand, bg in rows_sorted:
-            w.writerow([cand, f"{bg:.6f}"])
+        f.write(buf.getvalue())
+
+
+def _provenance_extra(
+    poscar_path: Path,
+    cfg: BandgapConfig,
+    model_dir: Path,
+    cfg_path: Path | None,
+    ckpt_path: Path | None,
+) -> Dict[str, Any]:
+    return {
+        "model_key": MODEL_KEY,
+        "model_dir": str(model_dir),
+        "config_json": str(cfg_path) if cfg_path else "",
+        "checkpoint": str(ckpt_path) if ckpt_path else "",
+        "input_poscar": str(poscar_path),
+        "graph_params": {
+            "cutoff": float(cfg.cutoff),
+            "max_neighbors": int(cfg.max_neighbors),
+        },
+    }
+
+
+def _atoms_summary(jat) -> Tuple[int, Dict[str, int]]:
+    """(n_atoms, element -> count), counted directly from the element list."""
+    return int(len(jat.elements)), dict(Counter(jat.elements))
 
 
-def _run_folder(folder: Path, cfg: BandgapConfig, model, cfg_path: Path | None, ckpt_path: Path | None, model_dir: Path) -> None:
+class _InputBuilder:
+    """
+    Prefetches ALIGNN inputs on a thread pool. With [bandgap].parse_workers > 0, the
+    Python-bound POSCAR parsing is sent to a process pool and threads only build graphs.
+    The thread pool is also used for meta.json writes.
+    """
+
+    def __init__(self, cfg: BandgapConfig):
+        import multiprocessing as mp
+
+        self.cfg = cfg
+        self.pool = ThreadPoolExecutor(max_workers=max(1, (os.cpu_count() or 2) // 2))
+        self.parse_pool = (
+            # spawn: never fork a process that may hold a CUDA context
+            ProcessPoolExecutor(max_workers=cfg.parse_workers, mp_context=mp.get_context("spawn"))
+            if cfg.parse_workers > 0
+            else None
+        )
+
+    def _build_one(self, poscar_path: Path):
+        """
+        Returns ((g, lg, lat), (n_atoms, composition)). Only the small summary is kept
+        alongside the graphs so the jarvis Atoms can be freed right after graph construction.
+        With [bandgap].graph_cache, both are reused from 03_band/.graph_cache.pt while the
+        POSCAR hash, cutoff and max_neighbors are unchanged.
+        """
+        if self.cfg.graph_cache:
+            cache_path = poscar_path.parents[1] / GRAPH_CACHE_REL
+            key = _graph_cache_key(poscar_path.read_bytes(), self.cfg.cutoff, self.cfg.max_neighbors)
+            cached = _load_graph_cache(cache_path, key)
+            if cached is not None:
+                return cached
+            item, summary = self._build_uncached(poscar_path)
+            _save_graph_cache(cache_path, key, item, summary)
+            return item, summary
+        return self._build_uncached(poscar_path)
+
+    def _build_uncached(self, poscar_path: Path):
+        if self.parse_pool is not None:
+            arrays = self.parse_pool.submit(_read_poscar_arrays, str(poscar_path)).result()
+            jat = _arrays_to_jarvis_atoms(*arrays)
+        else:
+            jat = _poscar_to_jarvis_atoms(poscar_path)
+        item = _build_alignn_inputs(jat, cutoff=self.cfg.cutoff, max_neighbors=self.cfg.max_neighbors)
+        return item, _atoms_summary(jat)
+
+    def submit(self, chunk: List[Path]) -> List[Tuple[Path, Future]]:
+        return [(p, self.pool.submit(self._build_one, p)) for p in chunk]
+
+    def shutdown(self) -> None:
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        if self.parse_pool is not None:
+            self.parse_pool.shutdown(wait=True, cancel_futures=True)
+
+
+def _predict_chunk(
+    folder: Path,
+    chunk: List[Tuple[Path, Future]],
+    cfg: BandgapConfig,
+    model,
+    device,
+    cfg_path: Path | None,
+    ckpt_path: Path | None,
+    model_dir: Path,
+    pool: ThreadPoolExecutor,
+    writes: List[Future],
+) -> List[Tuple[str, float]]:
+    """
+    Collect prefetched graphs for one chunk of POSCARs and run a single batched forward pass.
+    Candidates whose graph build fails are recorded as NaN and excluded from the batch.
+    meta.json writes are submitted to `pool`; their futures are appended to `writes`.
+    """
+    rows: List[Tuple[str, float]] = []
+    batch_items: List[Tuple[Any, Any, Any]] = []
+    batch_meta: List[Tuple[Path, Tuple[int, Dict[str, int]]]] = []
+
+    for poscar_path, fut in chunk:
+        try:
+            item, summary = fut.result()
+            batch_items.append(item)
+            batch_meta.append((poscar_path, summary))
+        except Exception as e:
+            cand_dir = poscar_path.parents[1]
+            log.warning("%s/%s: FAIL bandgap input build: %s", folder.name, cand_dir.name, repr(e))
+            extra = {"status": "fail", "error": repr(e)}
+            extra.update(_provenance_extra(poscar_path, cfg, model_dir, cfg_path, ckpt_path))
+            writes.append(pool.submit(_write_band_meta, cand_dir, float("nan"), extra))
+            rows.append((cand_dir.name, float("nan")))
+
+    if not batch_items:
+        return rows
+
+    model = _current_model(model)
+    t0 = time.time()
+    try:
+        try:
+            preds = _predict_bandgap_batch(model, batch_items, device, mixed_precision=cfg.mixed_precision)
+        except Exception as e:
+            eager = _fall_back_to_eager(model, e)
+            if eager is None:
+                raise
+            t0 = time.time()
+            preds = _predict_bandgap_batch(eager, batch_items, device, mixed_precision=cfg.mixed_precision)
+    except Exception as e:
+        for poscar_path, _summary in batch_meta:
+            cand_dir = poscar_path.parents[1]
+            log.warning("%s/%s: FAIL bandgap batch: %s", folder.name, cand_dir.name, repr(e))
+            extra = {"status": "fail", "error": repr(e)}
+            extra.update(_provenance_extra(poscar_path, cfg, model_dir, cfg_path, ckpt_path))
+            writes.append(pool.submit(_write_band_meta, cand_dir, float("nan"), extra))
+            rows.append((cand_dir.name, float("nan")))
+        return rows
+
+    # walltime is amortized over the batch
+    wall_s = (time.time() - t0) / len(batch_items)
+
+    for (poscar_path, (n_atoms, composition)), bg in zip(batch_meta, preds):
+        cand_dir = poscar_path.parents[1]
+        log.info("%s/%s: bandgap = %.4f eV", folder.name, cand_dir.name, bg)
+
+        extra = {"status": "ok"}
+        extra.update(_provenance_extra(poscar_path, cfg, model_dir, cfg_path, ckpt_path))
+        extra.update(
+            {
+                "n_atoms": n_atoms,
+                "composition": composition,
+                "walltime_s": float(wall_s),
+                "batch_size": len(batch_items),
+            }
+        )
+        writes.append(pool.submit(_write_band_meta, cand_dir, float(bg), extra))
+        rows.append((cand_dir.name, float(bg)))
+
+    return rows
+
+
+@dataclass
+class _FolderPlan:
+    folder: Path
+    out_csv: Path
+    rows: List[Tuple[str, float]]
+    todo_poscars: List[Path]
+    first_chunk: List[Tuple[Path, Future]] | None = None
+
+
+def _plan_folder(folder: Path, cfg: BandgapConfig, builder: _InputBuilder | None) -> _FolderPlan | None:
+    """
+    I/O side of one folder: skip checks, candidate selection and reuse of existing
+    meta.json values. When an input builder is given, the first chunk is submitted
+    right away so it is ready by the time the folder reaches inference.
+    """
     out_csv = folder / OUT_CSV_NAME
 
     if cfg.skip_if_done and out_csv.exists():
         log.info("SKIP %s: %s already exists", folder.name, OUT_CSV_NAME)
-        return
+        return None
 
     poscars = _get_relaxed_poscars(folder)
     if not poscars:
         log.info("SKIP %s: no relaxed POSCARs found (run Step 03; Step 04 optional)", folder.name)
-        return
+        return None
 
     rows: List[Tuple[str, float]] = []
     todo_poscars: List[Path] = []
@@ -352,15 +827,63 @@ def _run_folder(folder: Path, cfg: BandgapConfig, model, cfg_path: Path | None,
 
         todo_poscars.append(poscar_path)
 
+    plan = _FolderPlan(folder=folder, out_csv=out_csv, rows=rows, todo_poscars=todo_poscars)
+    if builder is not None and todo_poscars:
+        plan.first_chunk = builder.submit(todo_poscars[: cfg.batch_size])
+    return plan
+
+
+def _plan_folders_ahead(
+    folders: List[Path],
+    cfg: BandgapConfig,
+    builder: _InputBuilder | None,
+    q: queue.Queue,
+    stop: threading.Event,
+) -> None:
+    """Producer thread: plan folders in order; ends with None, or forwards an exception."""
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for folder in folders:
+            if not put((folder, _plan_folder(folder, cfg, builder))):
+                return
+    except BaseException as e:
+        put(e)
+        return
+    put(None)
+
+
+def _run_folder(
+    plan: _FolderPlan,
+    cfg: BandgapConfig,
+    model,
+    device,
+    cfg_path: Path | None,
+    ckpt_path: Path | None,
+    model_dir: Path,
+    builder: _InputBuilder | None,
+) -> None:
+    folder = plan.folder
+    rows = plan.rows
+    todo_poscars = plan.todo_poscars
+
     if not todo_poscars:
-        _write_summary_csv(out_csv, rows)
+        _write_summary_csv(plan.out_csv, rows)
         log.info("OK   %s: wrote %s and candidate_*/03_band/meta.json", folder.name, OUT_CSV_NAME)
         return
 
     # -------------------------
-    # CPU parallel mode
+    # CPU parallel mode (model is only loaded in-process for batched modes)
     # -------------------------
-    if cfg.device == "cpu" and cfg.n_workers > 1 and len(todo_poscars) > 1:
+    if model is None:
         log.info("%s: running CPU parallel bandgap with %d workers", folder.name, cfg.n_workers)
 
         futures = []
@@ -373,6 +896,7 @@ def _run_folder(folder: Path, cfg: BandgapConfig, model, cfg_path: Path | None,
                         cfg.cutoff,
                         cfg.max_neighbors,
                         str(model_dir),
+                        cfg.trust_checkpoint,
                     )
                 )
 
@@ -394,207 +918,32 @@ def _run_folder(folder: Path, cfg: BandgapConfig, model, cfg_path: Path | None,
                 rows.append((cand_name, bg))
 
     # -------------------------
-    # CUDA batched mode
-    # -------------------------
-    elif cfg.device == "cuda":
-        log.info("%s: running CUDA batched bandgap (batch_size=%d)", folder.name, cfg.batch_size)
-
-        batch_items: List[Tuple[Any, Any, Any]] = []
-        batch_meta: List[Tuple[Path, Any]] = []
-
-        for poscar_path in todo_poscars:
-            try:
-                jat = _poscar_to_jarvis_atoms(poscar_path)
-                g, lg, lat = _build_alignn_inputs(jat, cutoff=cfg.cutoff, max_neighbors=cfg.max_neighbors)
-                batch_items.append((g, lg, lat))
-                batch_meta.append((poscar_path, jat))
-            except Exception as e:
-                cand_dir = poscar_path.parents[1]
-                cand_name = cand_dir.name
-                log.warning("%s/%s: FAIL bandgap input build: %s", folder.name, cand_name, repr(e))
-                _write_band_meta(
-                    cand_dir,
-                    float("nan"),
-                    {
-                        "status": "fail",
-                        "error": repr(e),
-                        "input_poscar": str(poscar_path),
-                        "graph_params": {
-                            "cutoff": float(cfg.cutoff),
-                            "max_neighbors": int(cfg.max_neighbors),
-                        },
-                        "model_key": "jv_mbj_bandgap_alignn (local)",
-                        "model_dir": str(model_dir),
-                        "config_json": str(cfg_path) if cfg_path else "",
-                        "checkpoint": str(ckpt_path) if ckpt_path else "",
-                    },
-                )
-                rows.append((cand_name, float("nan")))
-                continue
-
-            if len(batch_items) == cfg.batch_size:
-                try:
-                    preds = _predict_bandgap_batch(model, batch_items)
-
-                    for (poscar_path_i, jat_i), bg in zip(batch_meta, preds):
-                        cand_dir = poscar_path_i.parents[1]
-                        cand_name = cand_dir.name
-
-                        log.info("%s/%s: bandgap = %.4f eV", folder.name, cand_name, bg)
-
-                        extra = {
-                            "status": "ok",
-                            "model_key": "jv_mbj_bandgap_alignn (local)",
-                            "model_dir": str(model_dir),
-                            "config_json": str(cfg_path) if cfg_path else "",
-                            "checkpoint": str(ckpt_path) if ckpt_path else "",
-                            "input_poscar": str(poscar_path_i),
-                            "n_atoms": int(len(jat_i.elements)),
-                            "composition": dict(jat_i.composition.to_dict()),
-                            "graph_params": {
-                                "cutoff": float(cfg.cutoff),
-                                "max_neighbors": int(cfg.max_neighbors),
-                            },
-                        }
-                        _write_band_meta(cand_dir, float(bg), extra)
-                        rows.append((cand_name, float(bg)))
-
-                except Exception as e:
-                    for poscar_path_i, _jat_i in batch_meta:
-                        cand_dir = poscar_path_i.parents[1]
-                        cand_name = cand_dir.name
-                        log.warning("%s/%s: FAIL bandgap batch: %s", folder.name, cand_name, repr(e))
-                        _write_band_meta(
-                            cand_dir,
-                            float("nan"),
-                            {
-                                "status": "fail",
-                                "error": repr(e),
-                                "input_poscar": str(poscar_path_i),
-                                "graph_params": {
-                                    "cutoff": float(cfg.cutoff),
-                                    "max_neighbors": int(cfg.max_neighbors),
-                                },
-                                "model_key": "jv_mbj_bandgap_alignn (local)",
-                                "model_dir": str(model_dir),
-                                "config_json": str(cfg_path) if cfg_path else "",
-                                "checkpoint": str(ckpt_path) if ckpt_path else "",
-                            },
-                        )
-                        rows.append((cand_name, float("nan")))
-
-                batch_items = []
-                batch_meta = []
-
-        # Flush remaining batch
-        if batch_items:
-            try:
-                preds = _predict_bandgap_batch(model, batch_items)
-
-                for (poscar_path_i, jat_i), bg in zip(batch_meta, preds):
-                    cand_dir = poscar_path_i.parents[1]
-                    cand_name = cand_dir.name
-
-                    log.info("%s/%s: bandgap = %.4f eV", folder.name, cand_name, bg)
-
-                    extra = {
-                        "status": "ok",
-                        "model_key": "jv_mbj_bandgap_alignn (local)",
-                        "model_dir": str(model_dir),
-                        "config_json": str(cfg_path) if cfg_path else "",
-                        "checkpoint": str(ckpt_path) if ckpt_path else "",
-                        "input_poscar": str(poscar_path_i),
-                        "n_atoms": int(len(jat_i.elements)),
-                        "composition": dict(jat_i.composition.to_dict()),
-                        "graph_params": {
-                            "cutoff": float(cfg.cutoff),
-                            "max_neighbors": int(cfg.max_neighbors),
-                        },
-                    }
-                    _write_band_meta(cand_dir, float(bg), extra)
-                    rows.append((cand_name, float(bg)))
-
-            except Exception as e:
-                for poscar_path_i, _jat_i in batch_meta:
-                    cand_dir = poscar_path_i.parents[1]
-                    cand_name = cand_dir.name
-                    log.warning("%s/%s: FAIL bandgap batch: %s", folder.name, cand_name, repr(e))
-                    _write_band_meta(
-                        cand_dir,
-                        float("nan"),
-                        {
-                            "status": "fail",
-                            "error": repr(e),
-                            "input_poscar": str(poscar_path_i),
-                            "graph_params": {
-                                "cutoff": float(cfg.cutoff),
-                                "max_neighbors": int(cfg.max_neighbors),
-                            },
-                            "model_key": "jv_mbj_bandgap_alignn (local)",
-                            "model_dir": str(model_dir),
-                            "config_json": str(cfg_path) if cfg_path else "",
-                            "checkpoint": str(ckpt_path) if ckpt_path else "",
-                        },
-                    )
-                    rows.append((cand_name, float("nan")))
-
-    # -------------------------
-    # CPU serial mode
+    # Batched mode (CUDA, or CPU serial)
     # -------------------------
     else:
-        for poscar_path in todo_poscars:
-            cand_dir = poscar_path.parents[1]
-            cand_name = cand_dir.name
-
-            try:
-                jat = _poscar_to_jarvis_atoms(poscar_path)
-
-                t0 = time.time()
-                bg = _predict_bandgap(model, jat, cutoff=cfg.cutoff, max_neighbors=cfg.max_neighbors)
-                wall_s = time.time() - t0
-
-                log.info("%s/%s: bandgap = %.4f eV", folder.name, cand_name, bg)
-
-                extra = {
-                    "status": "ok",
-                    "model_key": "jv_mbj_bandgap_alignn (local)",
-                    "model_dir": str(model_dir),
-                    "config_json": str(cfg_path) if cfg_path else "",
-                    "checkpoint": str(ckpt_path) if ckpt_path else "",
-                    "input_poscar": str(poscar_path),
-                    "n_atoms": int(len(jat.elements)),
-                    "composition": dict(jat.composition.to_dict()),
-                    "graph_params": {
-                        "cutoff": float(cfg.cutoff),
-                        "max_neighbors": int(cfg.max_neighbors),
-                    },
-                    "walltime_s": float(wall_s),
-                }
-                _write_band_meta(cand_dir, bg, extra)
-                rows.append((cand_name, bg))
-
-            except Exception as e:
-                log.warning("%s/%s: FAIL bandgap: %s", folder.name, cand_name, repr(e))
-                _write_band_meta(
-                    cand_dir,
-                    float("nan"),
-                    {
-                        "status": "fail",
-                        "error": repr(e),
-                        "input_poscar": str(poscar_path),
-                        "graph_params": {
-                            "cutoff": float(cfg.cutoff),
-                            "max_neighbors": int(cfg.max_neighbors),
-                        },
-                        "model_key": "jv_mbj_bandgap_alignn (local)",
-                        "model_dir": str(model_dir),
-                        "config_json": str(cfg_path) if cfg_path else "",
-                        "checkpoint": str(ckpt_path) if ckpt_path else "",
-                    },
+        assert builder is not None
+        log.info("%s: running batched bandgap on %s (batch_size=%d)", folder.name, cfg.device, cfg.batch_size)
+
+        chunks = [todo_poscars[i : i + cfg.batch_size] for i in range(0, len(todo_poscars), cfg.batch_size)]
+
+        # Graph building for chunk k+1 runs on the thread pool while chunk k is in the forward pass.
+        writes: List[Future] = []
+        pending = plan.first_chunk or builder.submit(chunks[0])
+        for k in range(len(chunks)):
+            current = pending
+            if k + 1 < len(chunks):
+                pending = builder.submit(chunks[k + 1])
+            rows.extend(
+                _predict_chunk(
+                    folder, current, cfg, model, device, cfg_path, ckpt_path, model_dir, builder.pool, writes
                 )
-                rows.append((cand_name, float("nan")))
+            )
 
-    _write_summary_csv(out_csv, rows)
+        # all candidate meta.json files must be on disk before the summary is written
+        for fut in writes:
+            fut.result()
+
+    _write_summary_csv(plan.out_csv, rows)
     log.info("OK   %s: wrote %s and candidate_*/03_band/meta.json", folder.name, OUT_CSV_NAME)
 
 
@@ -612,7 +961,12 @@ def run_bandgap(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None
     Outputs per composition folder:
       - bandgap_alignn_summary.csv
       - candidate_*/03_band/meta.json
+
+    Folders are planned (selection, skip checks, first graph builds) one or two
+    folders ahead of inference on a background thread.
     """
+    import torch
+
     cfg = _parse_bandgap_config(raw_cfg, root)
     device_str = resolve_torch_device(cfg.device, cfg.gpu_id)
 
@@ -620,8 +974,7 @@ def run_bandgap(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None
     if not model_root_env:
         raise RuntimeError("Missing env var ALIGNN_MODEL_DIR (points to your ALIGNN model folder).")
 
-    model_root = Path(model_root_env)
-    model_dir = _find_model_dir(model_root)
+    model_dir = _find_model_dir_cached(model_root_env)
 
     # Load model once only for CPU serial / CUDA mode
     model = None
@@ -630,7 +983,9 @@ def run_bandgap(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None
     device = cfg.device
 
     if cfg.device == "cuda" or cfg.n_workers == 1:
-        model, cfg_path, ckpt_path, device = _load_local_alignn_model(model_dir, device_str)
+        model, cfg_path, ckpt_path, device = _get_alignn_model(
+            model_dir, device_str, torch_compile=cfg.torch_compile, trust_checkpoint=cfg.trust_checkpoint
+        )
 
     if not cfg.outdir.exists():
         raise FileNotFoundError(f"Output directory not found: {cfg.outdir} (did you run Step 01?)")
@@ -641,28 +996,49 @@ def run_bandgap(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None
     log.info("Bandgap device: %s", cfg.device)
     log.info("Bandgap CPU workers: %d", cfg.n_workers)
     log.info("Bandgap batch size: %d", cfg.batch_size)
+    log.info("Bandgap mixed precision (bf16, CUDA only): %s", cfg.mixed_precision)
+    log.info("Bandgap torch.compile: %s", cfg.torch_compile)
+    log.info("Bandgap graph cache: %s", cfg.graph_cache)
     log.info("Output per folder: %s", OUT_CSV_NAME)
     log.info("NOTE: main-directory files are ignored; only subfolders are processed.")
 
-    for i, folder in enumerate(folders, start=1):
-        log.info("RUN (%d/%d) %s", i, len(folders), folder.name)
-        _run_folder(folder, cfg, model, cfg_path, ckpt_path, model_dir)
-
-    log.info("DONE Step 05 bandgap for all structure folders.")
-
-
-# TOML wrapper
-try:
-    import tomllib
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
+    builder = _InputBuilder(cfg) if model is not None else None
+    q: queue.Queue = queue.Queue(maxsize=2)
+    stop = threading.Event()
+    producer = threading.Thread(
+        target=_plan_folders_ahead,
+        args=(folders, cfg, builder, q, stop),
+        name="bandgap-planner",
+        daemon=True,
+    )
+    producer.start()
 
+    try:
+        # One outer inference context for the whole run; the inner ones become no-ops.
+        with torch.inference_mode():
+            i = 0
+            while True:
+                item = q.get()
+                if item is None:
+                    break
+                if isinstance(item, BaseException):
+                    raise item
+
+                folder, plan = item
+                i += 1
+                log.info("RUN (%d/%d) %s", i, len(folders), folder.name)
+                if plan is not None:
+                    _run_folder(plan, cfg, model, device, cfg_path, ckpt_path, model_dir, builder)
+    finally:
+        stop.set()
+        producer.join()
+        if builder is not None:
+            builder.shutdown()
 
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
+    log.info("DONE Step 05 bandgap for all structure folders.")
 
 
 def run_bandgap_from_toml(config_path: Path) -> None:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     run_bandgap(raw, root, config_path=config_path)
\ No newline at end of file
@@ -7,14 +7,11 @@ from typing import Optional
 import typer
 
 from dopingflow.logging import setup_logging
-from dopingflow.refs import run_refs_build_from_toml
-from dopingflow.generate import run_generate_from_toml
-from dopingflow.scan import run_scan_from_toml
-from dopingflow.relax import run_relax_from_toml
-from dopingflow.filtering import run_filtering_from_toml
-from dopingflow.bandgap import run_bandgap_from_toml
-from dopingflow.formation import run_formation_from_toml
-from dopingflow.collect import run_collect_from_toml
+
+# Step modules are imported inside each command: they pull in pymatgen and the
+# ML backends, which `--help` and single-step commands should not pay for.
+# Within run-all, everything stays in one process, so imports and module-level
+# caches (e.g. the loaded ALIGNN model) are shared across steps.
 
 app = typer.Typer(help="dopingflow: ML doping workflow pipeline")
 
@@ -31,17 +28,22 @@ def refs_build_cmd(
 ) -> None:
     """Step 00: Build/cache reference energies."""
     _init(config, verbose)
+    from dopingflow.refs import run_refs_build_from_toml
+
     run_refs_build_from_toml(config)
 
 
 @app.command("generate")
 def generate_cmd(
     config: Path = typer.Option(Path("input.toml"), "-c", "--config", exists=True),
+    force: bool = typer.Option(False, "--force", help="Regenerate everything, ignoring [generate].skip_if_done"),
     verbose: bool = typer.Option(False, "--verbose", help="More detailed logs"),
 ) -> None:
     """Step 01: Generate random doped structures."""
     _init(config, verbose)
-    run_generate_from_toml(config)
+    from dopingflow.generate import run_generate_from_toml
+
+    run_generate_from_toml(config, force=force)
 
 
 @app.command("scan")
@@ -51,6 +53,8 @@ def scan_cmd(
 ) -> None:
     """Step 02: Symmetry-unique scan + M3GNet single-point energies (top-k)."""
     _init(config, verbose)
+    from dopingflow.scan import run_scan_from_toml
+
     run_scan_from_toml(config)
 
 
@@ -61,6 +65,8 @@ def relax_cmd(
 ) -> None:
     """Step 03: Relax scanned candidates with M3GNet Relaxer."""
     _init(config, verbose)
+    from dopingflow.relax import run_relax_from_toml
+
     run_relax_from_toml(config)
 
 
@@ -75,6 +81,8 @@ def filter_cmd(
 ) -> None:
     """Step 04: Filter relaxed candidates (window or top-N)."""
     _init(config, verbose)
+    from dopingflow.filtering import run_filtering_from_toml
+
     run_filtering_from_toml(config, only=only, force=force, window_meV=window_meV, topn=topn)
 
 
@@ -85,6 +93,8 @@ def bandgap_cmd(
 ) -> None:
     """Step 05: Predict bandgap for filtered relaxed candidates (ALIGNN)."""
     _init(config, verbose)
+    from dopingflow.bandgap import run_bandgap_from_toml
+
     run_bandgap_from_toml(config)
 
 
@@ -95,6 +105,8 @@ def formation_cmd(
 ) -> None:
     """Step 06: Compute formation energies using cached references."""
     _init(config, verbose)
+    from dopingflow.formation import run_formation_from_toml
+
     run_formation_from_toml(config)
 
 
@@ -103,10 +115,12 @@ def collect_cmd(
     config: Path = typer.Option(Path("input.toml"), "-c", "--config", exists=True),
     verbose: bool = typer.Option(False, "--verbose", help="More detailed logs"),
 ) -> None:
-    """Step 07: Collect selected candidates into one CSV database."""
+    """Step 07: Collect selected candidates into one database (CSV and/or Parquet)."""
     _init(config, verbose)
+    from dopingflow.collect import run_collect_from_toml
+
     out_path = run_collect_from_toml(config)
-    typer.echo(f"\nWrote database CSV: {out_path}")
+    typer.echo(f"\nWrote database: {out_path}")
 
 
 @app.command("run-all")
@@ -139,17 +153,26 @@ def run_all_cmd(
     """
     _init(config, verbose)
 
+    def _step(module: str, func: str, **kwargs):
+        def run():
+            import importlib
+
+            return getattr(importlib.import_module(f"dopingflow.{module}"), func)(config, **kwargs)
+
+        return run
+
     steps = [
-        ("refs", "00 refs-build", lambda: run_refs_build_from_toml(config)),
-        ("generate", "01 generate", lambda: run_generate_from_toml(config)),
-        ("scan", "02 scan", lambda: run_scan_from_toml(config)),
-        ("relax", "03 relax", lambda: run_relax_from_toml(config)),
-        ("filter", "04 filter", lambda: run_filtering_from_toml(
-            config, only=filter_only, force=force, window_meV=window_meV, topn=topn
+        ("refs", "00 refs-build", _step("refs", "run_refs_build_from_toml")),
+        ("generate", "01 generate", _step("generate", "run_generate_from_toml")),
+        ("scan", "02 scan", _step("scan", "run_scan_from_toml")),
+        ("relax", "03 relax", _step("relax", "run_relax_from_toml")),
+        ("filter", "04 filter", _step(
+            "filtering", "run_filtering_from_toml",
+            only=filter_only, force=force, window_meV=window_meV, topn=topn,
         )),
-        ("bandgap", "05 bandgap", lambda: run_bandgap_from_toml(config)),
-        ("formation", "06 formation", lambda: run_formation_from_toml(config)),
-        ("collect", "07 collect", lambda: run_collect_from_toml(config)),
+        ("bandgap", "05 bandgap", _step("bandgap", "run_bandgap_from_toml")),
+        ("formation", "06 formation", _step("formation", "run_formation_from_toml")),
+        ("collect", "07 collect", _step("collect", "run_collect_from_toml")),
     ]
 
     key_to_idx = {k: i for i, (k, _, _) in enumerate(steps)}
@@ -193,4 +216,4 @@ def run_all_cmd(
 
         # Nice UX: show output for collect
         if k == "collect" and isinstance(res, Path):
-            typer.echo(f"\nWrote database CSV: {res}")
\ No newline at end of file
+            typer.echo(f"\nWrote database: {res}")
\ No newline at end of file
@@ -1,16 +1,25 @@
 # src/dopingflow/collect.py
 from __future__ import annotations
 
+import contextlib
 import csv
+import functools
 import json
 import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Collection, Dict, List, Optional, Sequence, Set, Tuple
+
+from dopingflow._files import output_up_to_date
+from dopingflow._jsonio import load_json_file
+from dopingflow._toml import load_toml
 
 log = logging.getLogger(__name__)
 
 OUT_CSV = "results_database.csv"
+OUT_PARQUET = "results_database.parquet"
 
 # composition-level files
 META_COMP = "metadata.json"
@@ -21,25 +30,96 @@ BANDGAP_SUMMARY = "bandgap_alignn_summary.csv"
 FORMATION_CSV = "formation_energies.csv"
 
 # candidate-level
-RELAX_META = Path("02_relax") / "meta.json"
-FORMATION_META = Path("04_formation") / "meta.json"
+RELAX_META = "02_relax/meta.json"
+FORMATION_META = "04_formation/meta.json"
+
+# threads used to read candidate meta.json files of one folder
+_PREFETCH_THREADS = 16
+
+# shared read-only default for per-candidate lookups
+_EMPTY: Dict[str, Any] = {}
+
+# results_database.csv columns; rows are built as tuples in this order
+DB_COLUMNS = (
+    # composition-level
+    "composition_tag",
+    "requested_index",
+    "requested_pct_json",
+    "effective_pct_json",
+    "rounded_counts_json",
+    "host_species",
+    "n_host",
+    "supercell_json",
+    # candidate-level
+    "candidate",
+    "candidate_path",
+    # relax filtered
+    "rank_relax_filtered",
+    "E_relaxed_eV_filtered",
+    "delta_e_eV",
+    "filter_mode",
+    # scan
+    "rank_scan",
+    "E_scan_eV",
+    # relax meta (step 03)
+    "E_relaxed_eV",
+    # bandgap
+    "bandgap_eV",
+    # formation (prefer meta.json)
+    "reference_mode",
+    "E_form_eV_total",
+    "E_form_norm",
+    "E_form_norm_unit",
+    "n_dopant_atoms",
+    "dopant_counts_json",
+    # legacy string (optional; can be empty)
+    "dopant_counts",
+)
+
+# Parquet column types (everything else is stored as string). Energies stay float64:
+# float32 keeps ~7 significant digits, i.e. only ~1e-4 eV on -500 eV totals.
+_PARQUET_CATEGORY = ("composition_tag", "host_species", "filter_mode", "reference_mode", "E_form_norm_unit")
+_PARQUET_INT32 = ("requested_index", "n_host", "rank_relax_filtered", "rank_scan", "n_dopant_atoms")
+_PARQUET_FLOAT64 = (
+    "E_relaxed_eV_filtered",
+    "delta_e_eV",
+    "E_scan_eV",
+    "E_relaxed_eV",
+    "bandgap_eV",
+    "E_form_eV_total",
+    "E_form_norm",
+)
 
 
 @dataclass(frozen=True)
 class DBConfig:
     outdir: Path
     skip_if_done: bool
+    n_workers: int
+    format: str  # "csv", "parquet" or "both"
 
 
-def read_json(path: Path) -> Optional[dict]:
-    if not path.exists():
-        return None
+@functools.lru_cache(maxsize=4096)
+def _read_json_cached(path_str: str, mtime_ns: int) -> Optional[dict]:
+    # mtime_ns is part of the cache key only: a rewritten file is parsed again
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return load_json_file(path_str)
     except Exception:
         return None
 
 
+def read_json(path: str | Path) -> Optional[dict]:
+    """
+    Parsed JSON, or None if missing/unreadable. Memoized per (path, mtime), so the
+    returned object is shared between calls and must not be mutated.
+    """
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    return _read_json_cached(os.fspath(path), mtime_ns)
+
+
 def safe_get(d: Optional[dict], *keys, default=None):
     cur = d
     for k in keys:
@@ -50,22 +130,30 @@ def safe_get(d: Optional[dict], *keys, default=None):
 
 
 def _to_int(x: Any) -> Optional[int]:
+    if x is None:
+        return None
+    if type(x) is int:
+        return x
+    s = x.strip() if isinstance(x, str) else str(x).strip()
+    if not s:
+        return None
     try:
-        s = str(x).strip()
-        if s == "":
-            return None
         return int(float(s))
-    except Exception:
+    except (ValueError, OverflowError):
         return None
 
 
 def _to_float(x: Any) -> Optional[float]:
+    if x is None:
+        return None
+    if type(x) is float:
+        return x
+    s = x.strip() if isinstance(x, str) else str(x).strip()
+    if not s:
+        return None
     try:
-        s = str(x).strip()
-        if s == "":
-            return None
         return float(s)
-    except Exception:
+    except ValueError:
         return None
 
 
@@ -77,149 +165,398 @@ def _parse_db_config(raw: dict[str, Any], root: Path) -> DBConfig:
     outdir = (root / outdir_name).resolve()
 
     skip_if_done = bool(db.get("skip_if_done", True))
-    return DBConfig(outdir=outdir, skip_if_done=skip_if_done)
+    n_workers = int(db.get("n_workers", 1))
+    if n_workers <= 0:
+        raise ValueError("[database].n_workers must be >= 1")
+    fmt = str(db.get("format", "csv")).strip().lower()
+    if fmt not in {"csv", "parquet", "both"}:
+        raise ValueError("[database].format must be 'csv', 'parquet' or 'both'")
+    return DBConfig(outdir=outdir, skip_if_done=skip_if_done, n_workers=n_workers, format=fmt)
 
 
-def read_selected_txt(path: Path) -> List[str]:
-    if not path.exists():
-        return []
-    names: List[str] = []
-    for ln in path.read_text(encoding="utf-8").splitlines():
-        ln = ln.strip()
-        if ln and not ln.startswith("#"):
-            names.append(ln)
-    return names
+def _read_csv_table(path: Path) -> Tuple[Dict[str, int], List[List[str]]]:
+    """
+    Read a CSV as (column name -> index, data rows). Blank lines are dropped and short
+    rows are padded with "", so callers can index cells directly instead of building
+    a dict per row as csv.DictReader does.
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = [r for r in csv.reader(f) if r]
+    if not rows:
+        return {}, []
 
+    header = rows[0]
+    n = len(header)
+    cols = {name: i for i, name in enumerate(header)}
+    data = [r if len(r) >= n else r + [""] * (n - len(r)) for r in rows[1:]]
+    return cols, data
 
-def read_filtered_table(path: Path) -> Dict[str, Dict[str, Any]]:
+
+def _col_indices(cols: Dict[str, int], *names: str) -> List[int]:
+    """Indices of the columns in `names` that exist, in priority order."""
+    return [cols[n] for n in names if n in cols]
+
+
+def _first_nonempty(row: Sequence[str], idxs: Sequence[int]) -> str:
+    for i in idxs:
+        if row[i]:
+            return row[i]
+    return ""
+
+
+def _strip(x: str) -> str:
+    return x.strip()
+
+
+# value spec: output key -> (source column aliases in priority order, converter)
+ValueSpec = Dict[str, Tuple[Tuple[str, ...], Callable[[str], Any]]]
+
+
+def _read_keyed_csv(
+    path: Path,
+    key_aliases: Tuple[str, ...],
+    value_spec: ValueSpec,
+    only: Optional[Collection[str]] = None,
+) -> Dict[str, Dict[str, Any]]:
     """
-    Parse ranking_relax_filtered.csv into:
-      candidate -> {"rank_relax_filtered": int, "E_relaxed_eV_filtered": float, "delta_e_eV": float, "filter_mode": str}
+    Shared reader for the per-folder CSVs: candidate -> {output key: value}.
 
-    Expected columns written by filtering.py:
-      rank_filtered, candidate, energy_relaxed_eV, delta_e_eV, ..., filter_mode
+    The candidate name is the first non-empty `key_aliases` column. Each value is the
+    first converted alias cell that is not None/"" (else converter("")). Aliases are
+    resolved to column indices once per file. With `only`, rows of other candidates
+    are skipped before any conversion.
     """
     out: Dict[str, Dict[str, Any]] = {}
     if not path.exists():
         return out
 
-    with open(path, "r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            cand = (row.get("candidate") or "").strip()
-            if not cand:
-                continue
+    cols, data = _read_csv_table(path)
+    i_key = _col_indices(cols, *key_aliases)
+    fields = [(key, _col_indices(cols, *aliases), conv, conv("")) for key, (aliases, conv) in value_spec.items()]
 
-            out[cand] = {
-                "rank_relax_filtered": _to_int(row.get("rank_filtered")),
-                "E_relaxed_eV_filtered": _to_float(row.get("energy_relaxed_eV")),
-                "delta_e_eV": _to_float(row.get("delta_e_eV")),
-                "filter_mode": (row.get("filter_mode") or "").strip(),
-            }
+    for row in data:
+        cand = _first_nonempty(row, i_key).strip()
+        if not cand or (only is not None and cand not in only):
+            continue
+
+        rec: Dict[str, Any] = {}
+        for key, idxs, conv, missing in fields:
+            value = missing
+            for i in idxs:
+                v = conv(row[i])
+                if v is not None and v != "":
+                    value = v
+                    break
+            rec[key] = value
+        out[cand] = rec
 
     return out
 
 
-def read_scan_ranking(path: Path) -> Dict[str, Dict[str, Any]]:
-    out: Dict[str, Dict[str, Any]] = {}
-    if not path.exists():
-        return out
+FILTERED_SPEC: ValueSpec = {
+    "rank_relax_filtered": (("rank_filtered",), _to_int),
+    "E_relaxed_eV_filtered": (("energy_relaxed_eV",), _to_float),
+    "delta_e_eV": (("delta_e_eV",), _to_float),
+    "filter_mode": (("filter_mode",), _strip),
+}
 
-    with open(path, "r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            cand = (
-                row.get("candidate")
-                or row.get("candidate_id")
-                or row.get("name")
-                or row.get("folder")
-                or ""
-            ).strip()
-            if not cand:
-                continue
+SCAN_SPEC: ValueSpec = {
+    "rank_scan": (("rank", "rank_scan"), _to_int),
+    "E_scan_eV": (("E_eV", "energy_eV", "E_scan_eV", "energy_sp_eV", "energy"), _to_float),
+}
 
-            rank = _to_int(row.get("rank") or row.get("rank_scan"))
-            E = _to_float(row.get("E_eV") or row.get("energy_eV") or row.get("E_scan_eV") or row.get("energy_sp_eV") or row.get("energy"))
+BANDGAP_SPEC: ValueSpec = {
+    "bandgap_eV": (("bandgap_eV_ALIGNN_MBJ", "bandgap_eV", "bandgap", "pred_bandgap", "pred_bandgap_eV"), _to_float),
+}
 
-            out[cand] = {"rank_scan": rank, "E_scan_eV": E}
-    return out
+FORMATION_SPEC: ValueSpec = {
+    "reference_mode": (("reference_mode",), _strip),
+    "E_form_eV_total": (("E_form_eV_total", "E_form_total", "E_form_total_eV"), _to_float),
+    "E_form_norm": (("E_form_per_dopant", "E_form_per_host", "E_form_norm", "E_form_total"), _to_float),
+    "n_dopant_atoms": (("n_dopant_atoms",), _to_int),
+    "dopant_counts": (("dopant_counts",), _strip),
+}
 
 
-def read_bandgap_summary(path: Path) -> Dict[str, Dict[str, Any]]:
-    out: Dict[str, Dict[str, Any]] = {}
+def read_selected_txt(path: Path) -> List[str]:
     if not path.exists():
-        return out
+        return []
+    names: List[str] = []
+    for ln in path.read_text(encoding="utf-8").splitlines():
+        ln = ln.strip()
+        if ln and not ln.startswith("#"):
+            names.append(ln)
+    return names
 
-    with open(path, "r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            cand = (row.get("candidate") or row.get("candidate_id") or row.get("name") or "").strip()
-            if not cand:
-                continue
 
-            bg = None
-            for key in ("bandgap_eV_ALIGNN_MBJ", "bandgap_eV", "bandgap", "pred_bandgap", "pred_bandgap_eV"):
-                if key in row and row[key] is not None and str(row[key]).strip() != "":
-                    bg = _to_float(row[key])
-                    if bg is not None:
-                        break
+def read_filtered_table(path: Path) -> Dict[str, Dict[str, Any]]:
+    """
+    Parse ranking_relax_filtered.csv into:
+      candidate -> {"rank_relax_filtered": int, "E_relaxed_eV_filtered": float, "delta_e_eV": float, "filter_mode": str}
+
+    Expected columns written by filtering.py:
+      rank_filtered, candidate, energy_relaxed_eV, delta_e_eV, ..., filter_mode
+    """
+    return _read_keyed_csv(path, ("candidate",), FILTERED_SPEC)
 
-            out[cand] = {"bandgap_eV": bg}
-    return out
+
+def read_scan_ranking(path: Path, only: Optional[Collection[str]] = None) -> Dict[str, Dict[str, Any]]:
+    """Parse ranking_scan.csv into candidate -> {"rank_scan", "E_scan_eV"}."""
+    return _read_keyed_csv(path, ("candidate", "candidate_id", "name", "folder"), SCAN_SPEC, only)
 
 
-def read_formation_csv(path: Path) -> Dict[str, Dict[str, Any]]:
+def read_bandgap_summary(path: Path, only: Optional[Collection[str]] = None) -> Dict[str, Dict[str, Any]]:
+    return _read_keyed_csv(path, ("candidate", "candidate_id", "name"), BANDGAP_SPEC, only)
+
+
+def read_formation_csv(path: Path, only: Optional[Collection[str]] = None) -> Dict[str, Dict[str, Any]]:
     """
     formation_energies.csv written by formation.py.
 
     We keep it as a fallback, but prefer candidate_*/04_formation/meta.json for rich info.
     """
-    out: Dict[str, Dict[str, Any]] = {}
-    if not path.exists():
-        return out
-
-    with open(path, "r", encoding="utf-8") as f:
-        r = csv.DictReader(f)
-        for row in r:
-            cand = (row.get("candidate") or "").strip()
-            if not cand:
-                continue
-
-            out[cand] = {
-                "reference_mode": (row.get("reference_mode") or "").strip(),
-                "E_form_eV_total": _to_float(row.get("E_form_eV_total") or row.get("E_form_total") or row.get("E_form_total_eV")),
-                "E_form_norm": _to_float(
-                    row.get("E_form_per_dopant")
-                    or row.get("E_form_per_host")
-                    or row.get("E_form_norm")
-                    or row.get("E_form_total")
-                ),
-                "n_dopant_atoms": _to_int(row.get("n_dopant_atoms")),
-                "dopant_counts": (row.get("dopant_counts") or "").strip(),
-            }
-    return out
+    return _read_keyed_csv(path, ("candidate",), FORMATION_SPEC, only)
 
 
-def read_formation_meta(path: Path) -> Dict[str, Any]:
+def read_formation_meta(path: str | Path) -> Dict[str, Any]:
     """
     candidate_*/04_formation/meta.json written by formation.py.
     """
     d = read_json(path) or {}
+    reported = d.get("reported")
+    if not isinstance(reported, dict):
+        reported = {}
+    pristine = d.get("pristine")
+    if not isinstance(pristine, dict):
+        pristine = {}
     return {
         "reference_mode": d.get("reference_mode"),
         "E_form_eV_total": d.get("E_form_eV_total"),
-        "E_form_norm": safe_get(d, "reported", "value", default=None),
-        "E_form_norm_unit": safe_get(d, "reported", "unit", default=""),
+        "E_form_norm": reported.get("value"),
+        "E_form_norm_unit": reported.get("unit", ""),
         "dopant_counts_dict": d.get("dopant_counts", None),
         # If you ever add it later:
-        "n_atoms_supercell": safe_get(d, "pristine", "n_atoms_supercell", default=None),
+        "n_atoms_supercell": pristine.get("n_atoms_supercell"),
     }
 
 
+def _collect_one_folder(folder: Path) -> Optional[List[Tuple[Any, ...]]]:
+    """
+    Database rows for the selected candidates of one composition folder, or None if the
+    folder has no selection (the caller logs it; this may run in a worker process).
+    """
+    rows_out: List[Tuple[Any, ...]] = []
+    comp_tag = folder.name
+
+    selected = read_selected_txt(folder / SELECTED_TXT)
+    filtered_map = read_filtered_table(folder / RANK_RELAX_FILTERED)
+
+    # Strict selection policy (never include unfiltered candidates)
+    if selected:
+        candidate_names = selected
+    elif filtered_map:
+        candidate_names = sorted(filtered_map.keys())
+    else:
+        return None
+
+    comp_meta = read_json(folder / META_COMP)
+    if not isinstance(comp_meta, dict):
+        comp_meta = {}
+    # left join on the selected candidates: other rows are never materialized
+    selected_set = frozenset(candidate_names)
+    scan_map = read_scan_ranking(folder / RANK_SCAN, only=selected_set)
+    bg_map = read_bandgap_summary(folder / BANDGAP_SUMMARY, only=selected_set)
+    form_csv_map = read_formation_csv(folder / FORMATION_CSV, only=selected_set)
+
+    # composition-level fields are the same for every candidate of the folder
+    requested_pct = comp_meta.get("requested_pct")
+    effective_pct = comp_meta.get("effective_pct")
+    rounded_counts = comp_meta.get("rounded_counts")
+    supercell = comp_meta.get("supercell")
+    req_pct_s = json.dumps(requested_pct) if requested_pct is not None else ""
+    eff_pct_s = json.dumps(effective_pct) if effective_pct is not None else ""
+    rounded_s = json.dumps(rounded_counts) if rounded_counts is not None else ""
+    supercell_s = json.dumps(supercell) if supercell is not None else ""
+    requested_index = comp_meta.get("requested_index")
+    host_species = comp_meta.get("host_species", "")
+    n_host = comp_meta.get("n_host")
+
+    # Per-candidate meta.json files are tiny; read them concurrently so the per-file
+    # latency overlaps instead of adding up.
+    folder_str = os.fspath(folder)
+    cand_dirs = [f"{folder_str}/{c}" for c in candidate_names]
+    with ThreadPoolExecutor(max_workers=_PREFETCH_THREADS) as ex:
+        relax_metas = list(ex.map(read_json, [f"{d}/{RELAX_META}" for d in cand_dirs]))
+        fmetas = list(ex.map(read_formation_meta, [f"{d}/{FORMATION_META}" for d in cand_dirs]))
+
+    for cand, cand_dir, relax_meta, fmeta in zip(candidate_names, cand_dirs, relax_metas, fmetas):
+        relax_meta = relax_meta or {}
+
+        # formation: prefer candidate meta
+        fcsv = form_csv_map.get(cand, _EMPTY)
+        filt = filtered_map.get(cand, _EMPTY)
+        scan = scan_map.get(cand, _EMPTY)
+
+        reference_mode = fmeta.get("reference_mode") or fcsv.get("reference_mode") or ""
+        E_form_total = fmeta.get("E_form_eV_total")
+        E_form_norm = fmeta.get("E_form_norm")
+        E_form_unit = fmeta.get("E_form_norm_unit") or ""
+
+        # fallback to CSV if meta missing
+        if E_form_total is None:
+            E_form_total = fcsv.get("E_form_eV_total")
+        if E_form_norm is None:
+            E_form_norm = fcsv.get("E_form_norm")
+
+        # dopant counts
+        dop_counts_dict = fmeta.get("dopant_counts_dict")
+        dop_counts_json = json.dumps(dop_counts_dict) if isinstance(dop_counts_dict, dict) else ""
+        dop_counts_legacy = fcsv.get("dopant_counts", "")
+
+        row = (
+            # composition-level
+            comp_tag,
+            requested_index,
+            req_pct_s,
+            eff_pct_s,
+            rounded_s,
+            host_species,
+            n_host,
+            supercell_s,
+            # candidate-level
+            cand,
+            cand_dir,  # folder is under the already-resolved [structure].outdir
+            # filtered relax info
+            filt.get("rank_relax_filtered"),
+            filt.get("E_relaxed_eV_filtered"),
+            filt.get("delta_e_eV"),
+            filt.get("filter_mode", ""),
+            # scan
+            scan.get("rank_scan"),
+            scan.get("E_scan_eV"),
+            # relax meta
+            relax_meta.get("energy_relaxed_eV", None),
+            # bandgap
+            bg_map.get(cand, _EMPTY).get("bandgap_eV"),
+            # formation
+            reference_mode,
+            _to_float(E_form_total),
+            _to_float(E_form_norm),
+            str(E_form_unit or ""),
+            _to_int(fcsv.get("n_dopant_atoms")),
+            dop_counts_json,
+            dop_counts_legacy,
+        )
+
+        rows_out.append(row)
+
+    return rows_out
+
+
+def _collect_inputs(folder: Path) -> List[str | Path]:
+    """Files the rows of `folder` are derived from."""
+    paths: List[str | Path] = [folder / n for n in (META_COMP, SELECTED_TXT, RANK_RELAX_FILTERED, RANK_SCAN, BANDGAP_SUMMARY, FORMATION_CSV)]
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.name.startswith("candidate_") and e.is_dir():
+                paths.append(f"{e.path}/{RELAX_META}")
+                paths.append(f"{e.path}/{FORMATION_META}")
+    return paths
+
+
+def _read_existing_rows(out_csv: Path) -> Optional[Dict[str, List[List[str]]]]:
+    """
+    Rows of an existing results_database.csv grouped by composition_tag, or None if it
+    cannot be reused (unreadable or written with a different column layout).
+    """
+    try:
+        with open(out_csv, "r", encoding="utf-8", newline="") as f:
+            reader = csv.reader(f)
+            if tuple(next(reader, ())) != DB_COLUMNS:
+                return None
+            grouped: Dict[str, List[List[str]]] = {}
+            for row in reader:
+                if row:
+                    grouped.setdefault(row[0], []).append(row)
+            return grouped
+    except OSError:
+        return None
+
+
+def _read_existing_tags(out_parquet: Path) -> Optional[Set[str]]:
+    """composition_tag values in an existing results_database.parquet, or None if unreadable."""
+    import pandas as pd
+
+    try:
+        return set(pd.read_parquet(out_parquet, columns=["composition_tag"])["composition_tag"])
+    except Exception:
+        return None
+
+
+def _has_selection(folder: Path) -> bool:
+    """True iff `folder` has a selection file, so _collect_one_folder may give it rows."""
+    return (folder / SELECTED_TXT).exists() or (folder / RANK_RELAX_FILTERED).exists()
+
+
+def _check_parquet_deps() -> None:
+    try:
+        import pandas  # noqa: F401
+        import pyarrow  # noqa: F401  (pandas' parquet engine)
+    except ImportError as e:
+        raise RuntimeError(
+            '[database].format="parquet" needs pandas and pyarrow: pip install -e ".[parquet]"'
+        ) from e
+
+
+def _write_parquet(out_path: Path, rows: List[Sequence[Any]]) -> None:
+    """
+    Write the database as Parquet (zstd) with typed columns. Rows may mix fresh tuples
+    and rows reused from the CSV (all strings); both are coerced to the same types.
+    """
+    import pandas as pd
+
+    df = pd.DataFrame.from_records(rows, columns=list(DB_COLUMNS))
+    # Python's float() round-trips the repr written to the CSV; pd.to_numeric may not
+    for c in _PARQUET_INT32:
+        df[c] = df[c].map(_to_int).astype("Int32")
+    for c in _PARQUET_FLOAT64:
+        df[c] = df[c].map(_to_float).astype("float64")
+    for c in DB_COLUMNS:
+        if c not in _PARQUET_INT32 and c not in _PARQUET_FLOAT64:
+            df[c] = df[c].fillna("").astype(str)
+    for c in _PARQUET_CATEGORY:
+        df[c] = df[c].astype("category")
+
+    tmp = out_path.with_name(out_path.name + ".tmp")
+    df.to_parquet(tmp, engine="pyarrow", compression="zstd", index=False)
+    os.replace(tmp, out_path)
+
+
+def _map_folders(fn, folders: List[Path], n_workers: int):
+    """
+    Yield fn(folder) for each folder, in folder order. With n_workers > 1 the folders are
+    processed in a spawn process pool and results are yielded as they come in (in order),
+    so the caller remains the only writer.
+    """
+    n_workers = min(n_workers, len(folders))
+    if n_workers <= 1:
+        for folder in folders:
+            yield fn(folder)
+        return
+
+    import multiprocessing as mp
+
+    log.info("Collect workers: %d", n_workers)
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context("spawn")) as ex:
+        yield from ex.map(fn, folders)
+
+
 def run_collect(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None = None) -> Path:
     """
-    Step 07: Collect results into ONE flat CSV database (results_database.csv),
-    ONLY for the filtered/selected candidates (Step 04 output).
+    Step 07: Collect results into ONE flat database (results_database.csv and/or
+    results_database.parquet, see [database].format), ONLY for the filtered/selected
+    candidates (Step 04 output). Returns the CSV path, or the Parquet path if no CSV
+    is written.
 
     Selection priority:
       1) selected_candidates.txt
@@ -228,161 +565,83 @@ def run_collect(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None
     cfg = _parse_db_config(raw_cfg, root)
 
     out_csv = (root / OUT_CSV).resolve()
-    if cfg.skip_if_done and out_csv.exists():
-        log.info("SKIP %s already exists: %s", OUT_CSV, out_csv)
-        log.info("Set [database].skip_if_done=false to overwrite.")
-        return out_csv
+    out_parquet = (root / OUT_PARQUET).resolve()
+    write_csv = cfg.format in {"csv", "both"}
+    write_parquet = cfg.format in {"parquet", "both"}
+    outputs = ([out_csv] if write_csv else []) + ([out_parquet] if write_parquet else [])
+    if write_parquet:
+        _check_parquet_deps()
 
     if not cfg.outdir.exists():
         raise FileNotFoundError(f"[structure].outdir not found: {cfg.outdir}")
 
-    folders = sorted([p for p in cfg.outdir.iterdir() if p.is_dir()])
+    # DirEntry.is_dir() answers from the readdir d_type (no stat) for non-symlinks
+    with os.scandir(cfg.outdir) as it:
+        folders = [cfg.outdir / name for name in sorted(e.name for e in it if e.is_dir())]
     log.info("Step 07 collect: %d composition folders in: %s", len(folders), cfg.outdir)
 
-    header = [
-        # composition-level
-        "composition_tag",
-        "requested_index",
-        "requested_pct_json",
-        "effective_pct_json",
-        "rounded_counts_json",
-        "host_species",
-        "n_host",
-        "supercell_json",
-        # candidate-level
-        "candidate",
-        "candidate_path",
-        # relax filtered
-        "rank_relax_filtered",
-        "E_relaxed_eV_filtered",
-        "delta_e_eV",
-        "filter_mode",
-        # scan
-        "rank_scan",
-        "E_scan_eV",
-        # relax meta (step 03)
-        "E_relaxed_eV",
-        # bandgap
-        "bandgap_eV",
-        # formation (prefer meta.json)
-        "reference_mode",
-        "E_form_eV_total",
-        "E_form_norm",
-        "E_form_norm_unit",
-        "n_dopant_atoms",
-        "dopant_counts_json",
-        # legacy string (optional; can be empty)
-        "dopant_counts",
-    ]
-
-    rows_out: List[Dict[str, Any]] = []
-
-    for folder in folders:
-        comp_tag = folder.name
-
-        selected = read_selected_txt(folder / SELECTED_TXT)
-        filtered_map = read_filtered_table(folder / RANK_RELAX_FILTERED)
-
-        # Strict selection policy (never include unfiltered candidates)
-        if selected:
-            candidate_names = selected
-        elif filtered_map:
-            candidate_names = sorted(filtered_map.keys())
-        else:
-            log.warning("Skip %s: no %s and no %s", comp_tag, SELECTED_TXT, RANK_RELAX_FILTERED)
-            continue
+    # With skip_if_done, rows of folders whose inputs are all older than the existing
+    # database are copied over unchanged; only the other folders are re-read. Reuse
+    # goes through the CSV, so a Parquet-only database is rebuilt whole when stale.
+    reused: Dict[str, List[List[str]]] = {}
+    todo = folders
+    if cfg.skip_if_done and all(p.exists() for p in outputs):
+        existing = _read_existing_rows(out_csv) if write_csv else _read_existing_tags(out_parquet)
+        if existing is not None:
+            # a folder with old inputs but no rows in the database (copied in with its
+            # mtimes, or dropped by an earlier failed collect) is read like a changed one
+            todo = [
+                f
+                for f in folders
+                if not all(output_up_to_date(p, _collect_inputs(f)) for p in outputs)
+                or (f.name not in existing and _has_selection(f))
+            ]
+            if not todo:
+                log.info("SKIP database is up to date: %s", ", ".join(str(p) for p in outputs))
+                log.info("Set [database].skip_if_done=false to force a rebuild.")
+                return outputs[0]
+            if write_csv:
+                stale = {f.name for f in todo}
+                reused = {f.name: existing[f.name] for f in folders if f.name not in stale and f.name in existing}
+                log.info("%s: %d/%d folders changed since last collect", OUT_CSV, len(todo), len(folders))
+            else:
+                todo = folders
+
+    # CSV rows are written folder by folder to a temporary file that replaces the
+    # database only once complete: a failed run leaves the previous database in place
+    # instead of a truncated one newer than every input. Only Parquet keeps all rows.
+    n_rows = 0
+    all_rows: List[Sequence[Any]] = []
+    tmp_csv = out_csv.with_name(out_csv.name + ".tmp")
+    with contextlib.ExitStack() as stack:
+        w = None
+        if write_csv:
+            f = stack.enter_context(open(tmp_csv, "w", newline="", encoding="utf-8", buffering=1 << 20))
+            w = csv.writer(f)
+            w.writerow(DB_COLUMNS)
+
+        results = _map_folders(_collect_one_folder, todo, cfg.n_workers)
+        for folder in folders:
+            rows = reused[folder.name] if folder.name in reused else next(results)
+            if rows is None:
+                log.warning("Skip %s: no %s and no %s", folder.name, SELECTED_TXT, RANK_RELAX_FILTERED)
+                continue
+            if w is not None:
+                w.writerows(rows)
+            if write_parquet:
+                all_rows.extend(rows)
+            n_rows += len(rows)
+
+    if write_csv:
+        os.replace(tmp_csv, out_csv)
+    if write_parquet:
+        _write_parquet(out_parquet, all_rows)
 
-        comp_meta = read_json(folder / META_COMP) or {}
-        scan_map = read_scan_ranking(folder / RANK_SCAN)
-        bg_map = read_bandgap_summary(folder / BANDGAP_SUMMARY)
-        form_csv_map = read_formation_csv(folder / FORMATION_CSV)
-
-        requested_pct = safe_get(comp_meta, "requested_pct", default=None)
-        effective_pct = safe_get(comp_meta, "effective_pct", default=None)
-        rounded_counts = safe_get(comp_meta, "rounded_counts", default=None)
-        supercell = safe_get(comp_meta, "supercell", default=None)
-
-        for cand in candidate_names:
-            cand_dir = folder / cand
-            relax_meta = read_json(cand_dir / RELAX_META) or {}
-
-            # formation: prefer candidate meta
-            fmeta = read_formation_meta(cand_dir / FORMATION_META)
-            fcsv = form_csv_map.get(cand, {}) if isinstance(form_csv_map, dict) else {}
-
-            reference_mode = fmeta.get("reference_mode") or fcsv.get("reference_mode") or ""
-            E_form_total = fmeta.get("E_form_eV_total")
-            E_form_norm = fmeta.get("E_form_norm")
-            E_form_unit = fmeta.get("E_form_norm_unit") or ""
-
-            # fallback to CSV if meta missing
-            if E_form_total is None:
-                E_form_total = fcsv.get("E_form_eV_total")
-            if E_form_norm is None:
-                E_form_norm = fcsv.get("E_form_norm")
-
-            # dopant counts
-            dop_counts_dict = fmeta.get("dopant_counts_dict")
-            dop_counts_json = json.dumps(dop_counts_dict) if isinstance(dop_counts_dict, dict) else ""
-            dop_counts_legacy = fcsv.get("dopant_counts", "") if isinstance(fcsv, dict) else ""
-
-            row = {
-                "composition_tag": comp_tag,
-                "requested_index": safe_get(comp_meta, "requested_index", default=None),
-                "requested_pct_json": json.dumps(requested_pct) if requested_pct is not None else "",
-                "effective_pct_json": json.dumps(effective_pct) if effective_pct is not None else "",
-                "rounded_counts_json": json.dumps(rounded_counts) if rounded_counts is not None else "",
-                "host_species": safe_get(comp_meta, "host_species", default=""),
-                "n_host": safe_get(comp_meta, "n_host", default=None),
-                "supercell_json": json.dumps(supercell) if supercell is not None else "",
-                "candidate": cand,
-                "candidate_path": str(cand_dir.resolve()),
-                # filtered relax info
-                "rank_relax_filtered": filtered_map.get(cand, {}).get("rank_relax_filtered", None),
-                "E_relaxed_eV_filtered": filtered_map.get(cand, {}).get("E_relaxed_eV_filtered", None),
-                "delta_e_eV": filtered_map.get(cand, {}).get("delta_e_eV", None),
-                "filter_mode": filtered_map.get(cand, {}).get("filter_mode", ""),
-                # scan
-                "rank_scan": scan_map.get(cand, {}).get("rank_scan", None),
-                "E_scan_eV": scan_map.get(cand, {}).get("E_scan_eV", None),
-                # relax meta
-                "E_relaxed_eV": relax_meta.get("energy_relaxed_eV", None),
-                # bandgap
-                "bandgap_eV": bg_map.get(cand, {}).get("bandgap_eV", None),
-                # formation
-                "reference_mode": reference_mode,
-                "E_form_eV_total": _to_float(E_form_total),
-                "E_form_norm": _to_float(E_form_norm),
-                "E_form_norm_unit": str(E_form_unit or ""),
-                "n_dopant_atoms": _to_int(fcsv.get("n_dopant_atoms")) if isinstance(fcsv, dict) else None,
-                "dopant_counts_json": dop_counts_json,
-                "dopant_counts": dop_counts_legacy,
-            }
-
-            rows_out.append(row)
-
-    with open(out_csv, "w", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(f, fieldnames=header)
-        w.writeheader()
-        for r in rows_out:
-            w.writerow(r)
-
-    log.info("DONE Step 07 collect: wrote %d rows to %s", len(rows_out), out_csv)
-    return out_csv
-
-
-# TOML wrapper
-try:
-    import tomllib  # py3.11+
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
+    log.info("DONE Step 07 collect: wrote %d rows to %s", n_rows, ", ".join(str(p) for p in outputs))
+    return outputs[0]
 
 
 def run_collect_from_toml(config_path: Path) -> Path:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     return run_collect(raw, root, config_path=config_path)
\ No newline at end of file
@@ -3,10 +3,15 @@ from __future__ import annotations
 
 import csv
 import logging
+import os
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from dopingflow._toml import load_toml
+
 log = logging.getLogger(__name__)
 
 # -----------------------------
@@ -60,6 +65,10 @@ def _parse_filter_config(raw: dict[str, Any], root: Path) -> FilterConfig:
 # -----------------------------
 # I/O helpers
 # -----------------------------
+def _cell(row: List[str], i: Optional[int]) -> str:
+    return row[i] if i is not None else ""
+
+
 def _read_ranking_relax(path: Path) -> List[Dict[str, Any]]:
     """
     Read ranking_relax.csv and keep only rows with status==ok.
@@ -69,18 +78,31 @@ def _read_ranking_relax(path: Path) -> List[Dict[str, Any]]:
 
     rows: List[Dict[str, Any]] = []
     with path.open("r", newline="") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, [])
+        n = len(header)
+        # column indices resolved once per file (None if the column is absent)
+        cols = {name: i for i, name in enumerate(header)}
+        i_status, i_cand, i_e = cols.get("status"), cols.get("candidate"), cols.get("energy_relaxed_eV")
+        i_rank_relax, i_rank_sp = cols.get("rank_relax"), cols.get("rank_sp")
+        i_e_sp, i_sig = cols.get("energy_sp_eV"), cols.get("signature")
+
         for r in reader:
-            status = (r.get("status") or "").strip()
+            if not r:
+                continue
+            if len(r) < n:
+                r += [""] * (n - len(r))
+
+            status = _cell(r, i_status).strip()
             if status != "ok":
                 continue
 
-            cand = (r.get("candidate") or "").strip()
+            cand = _cell(r, i_cand).strip()
             if not cand:
                 continue
 
             try:
-                e_rel = float(r["energy_relaxed_eV"])
+                e_rel = float(_cell(r, i_e))
             except Exception:
                 continue
 
@@ -88,10 +110,10 @@ def _read_ranking_relax(path: Path) -> List[Dict[str, Any]]:
                 {
                     "candidate": cand,
                     "energy_relaxed_eV": e_rel,
-                    "rank_relax": r.get("rank_relax", ""),
-                    "rank_sp": r.get("rank_sp", ""),
-                    "energy_sp_eV": r.get("energy_sp_eV", ""),
-                    "signature": r.get("signature", ""),
+                    "rank_relax": _cell(r, i_rank_relax),
+                    "rank_sp": _cell(r, i_rank_sp),
+                    "energy_sp_eV": _cell(r, i_e_sp),
+                    "signature": _cell(r, i_sig),
                 }
             )
 
@@ -147,8 +169,9 @@ def _filter_rows(
     window_meV_override: Optional[float],
     topn_override: Optional[int],
 ) -> Tuple[List[Dict[str, Any]], float, str]:
-    rows_sorted = sorted(rows, key=lambda r: r["energy_relaxed_eV"])
-    emin = float(rows_sorted[0]["energy_relaxed_eV"])
+    energies = np.fromiter((r["energy_relaxed_eV"] for r in rows), dtype=float, count=len(rows))
+    order = np.argsort(energies, kind="stable")
+    emin = float(energies[order[0]])
 
     # overrides force the mode
     mode = cfg.mode
@@ -160,13 +183,14 @@ def _filter_rows(
     if mode == "window":
         window_meV = float(window_meV_override) if window_meV_override is not None else cfg.window_meV
         window_eV = window_meV / 1000.0
-        kept = [r for r in rows_sorted if (r["energy_relaxed_eV"] - emin) <= window_eV]
+        within = order[(energies[order] - emin) <= window_eV]
+        kept = [rows[i] for i in within]
         mode_desc = f"window_{window_meV:g}meV"
         return kept, emin, mode_desc
 
     # mode == "topn"
     topn = int(topn_override) if topn_override is not None else cfg.max_candidates
-    kept = rows_sorted[: min(topn, len(rows_sorted))]
+    kept = [rows[i] for i in order[:topn]]
     mode_desc = f"topn_{topn}"
     return kept, emin, mode_desc
 
@@ -231,7 +255,8 @@ def run_filtering(
     if not cfg.outdir.exists():
         raise FileNotFoundError(f"Output directory not found: {cfg.outdir} (did you run Step 01?)")
 
-    folders = sorted([p for p in cfg.outdir.iterdir() if p.is_dir()])
+    with os.scandir(cfg.outdir) as it:
+        folders = [cfg.outdir / name for name in sorted(e.name for e in it if e.is_dir())]
 
     log.info("Step 04 filter: %d structure folders in: %s", len(folders), cfg.outdir)
     log.info("Input : %s", RANKING_IN)
@@ -247,17 +272,6 @@ def run_filtering(
     log.info("DONE Step 04 filter for all structure folders.")
 
 
-# TOML wrapper (like your other steps)
-try:
-    import tomllib  # py3.11+
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
-
-
 def run_filtering_from_toml(
     config_path: Path,
     *,
@@ -266,6 +280,6 @@ def run_filtering_from_toml(
     window_meV: Optional[float] = None,
     topn: Optional[int] = None,
 ) -> None:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     run_filtering(raw, root, only=only, force=force, window_meV=window_meV, topn=topn)
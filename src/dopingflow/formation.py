@@ -2,12 +2,22 @@
 from __future__ import annotations
 
 import csv
+import functools
 import json
 import logging
+import os
+import re
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import repeat
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from dopingflow._files import output_up_to_date
+from dopingflow._jsonio import load_json_file
+from dopingflow._toml import load_toml
 
 log = logging.getLogger(__name__)
 
@@ -19,6 +29,11 @@ RELAX_POSCAR = "02_relax/POSCAR"
 OUT_CSV = "formation_energies.csv"
 OUT_META_REL = "04_formation/meta.json"
 
+_ELEMENT_RE = re.compile(r"^[A-Z][a-z]?$")
+
+# threads used to read candidate inputs of one folder
+_PREFETCH_THREADS = 16
+
 
 @dataclass(frozen=True)
 class FormationConfig:
@@ -27,6 +42,7 @@ class FormationConfig:
     anion_species: List[str]
     skip_if_done: bool
     normalize: str  # "total" | "per_dopant" | "per_host"
+    n_workers: int
 
 
 def _parse_formation_config(raw: dict[str, Any], root: Path) -> FormationConfig:
@@ -51,23 +67,40 @@ def _parse_formation_config(raw: dict[str, Any], root: Path) -> FormationConfig:
     if normalize not in {"total", "per_dopant", "per_host"}:
         raise ValueError("[formation].normalize must be one of: total, per_dopant, per_host")
 
+    n_workers = int(form.get("n_workers", 1))
+    if n_workers <= 0:
+        raise ValueError("[formation].n_workers must be >= 1")
+
     return FormationConfig(
         outdir=outdir,
         host_species=host_species,
         anion_species=anion_species,
         skip_if_done=skip_if_done,
         normalize=normalize,
+        n_workers=n_workers,
     )
 
 
-def _load_ref_json(root: Path) -> dict[str, Any]:
-    p = (root / REF_JSON).resolve()
+@dataclass(frozen=True)
+class _FormationRefs:
+    """Reference quantities shared by every folder (picklable for worker processes)."""
+
+    ref_mode: str
+    definition: str
+    host_formula: str
+    E_pristine: float
+    n_atoms_supercell: int
+    mu: Dict[str, float]
+    mu_host: float
+
+
+def _load_ref_json(p: Path) -> dict[str, Any]:
     if not p.exists():
         raise FileNotFoundError(
             f"Missing reference file: {p}\n"
             "Run Step 00 first: dopingflow refs-build -c input.toml"
         )
-    return json.loads(p.read_text(encoding="utf-8"))
+    return load_json_file(p)
 
 
 def _get_pristine_energy_and_natoms(ref: dict[str, Any]) -> tuple[float, int]:
@@ -218,38 +251,88 @@ def _read_selected_candidates(path: Path) -> List[str]:
     return out
 
 
-def _count_species_from_poscar(poscar_path: Path) -> Dict[str, int]:
-    from pymatgen.core import Structure
+def _count_species_fast(poscar_path: str) -> Optional[Dict[str, int]]:
+    """
+    Species counts from the VASP5 POSCAR header (line 6: symbols, line 7: counts).
+    Returns None if the header does not look like that (e.g. VASP4 without symbols).
+    """
+    with open(poscar_path, "r", encoding="utf-8") as f:
+        head = [f.readline() for _ in range(7)]
+
+    symbols = head[5].split()
+    try:
+        numbers = [int(x) for x in head[6].split()]
+    except ValueError:
+        return None
+    if not symbols or len(symbols) != len(numbers) or not all(_ELEMENT_RE.match(x) for x in symbols):
+        return None
 
-    s = Structure.from_file(str(poscar_path))
     counts: Dict[str, int] = {}
-    for site in s:
-        el = site.species_string
-        counts[el] = counts.get(el, 0) + 1
+    for el, n in zip(symbols, numbers):
+        counts[el] = counts.get(el, 0) + n
     return counts
 
 
-def _get_candidate_poscars(folder: Path) -> List[Path]:
+@functools.lru_cache(maxsize=None)
+def _count_species_pymatgen(poscar_path_str: str, mtime_ns: int) -> Dict[str, int]:
+    # mtime_ns is part of the cache key only: a rewritten POSCAR is parsed again
+    from pymatgen.core import Structure
+
+    s = Structure.from_file(poscar_path_str)
+    # Composition already holds the per-species amounts (first-appearance order, like
+    # the old per-site loop); POSCAR sites are ordered, so amounts are whole numbers.
+    return {str(sp): int(round(n)) for sp, n in s.composition.items()}
+
+
+def _count_species_from_poscar(poscar_path: str) -> Dict[str, int]:
+    counts = _count_species_fast(poscar_path)
+    if counts is not None:
+        return counts
+    counts = _count_species_pymatgen(poscar_path, os.stat(poscar_path).st_mtime_ns)
+    return dict(counts)
+
+
+def _get_candidate_poscars(folder: Path) -> Tuple[List[str], str]:
+    """Returns (names of candidates with a relaxed POSCAR, SELECT log line)."""
+    folder_str = os.fspath(folder)
     cand_list = folder / CAND_LIST
     if cand_list.exists():
         names = _read_selected_candidates(cand_list)
-        poscars = [folder / n / RELAX_POSCAR for n in names]
-        poscars = [p for p in poscars if p.exists()]
-        log.info("SELECT %s: using %d candidates from %s", folder.name, len(poscars), CAND_LIST)
-        return poscars
+        names = [n for n in names if os.path.exists(f"{folder_str}/{n}/{RELAX_POSCAR}")]
+        return names, f"SELECT {folder.name}: using {len(names)} candidates from {CAND_LIST}"
 
-    poscars = sorted(folder.glob(f"candidate_*/{RELAX_POSCAR}"))
-    log.info("SELECT %s: using glob: %d candidates", folder.name, len(poscars))
-    return poscars
+    with os.scandir(folder) as it:
+        names = sorted(e.name for e in it if e.name.startswith("candidate_") and e.is_dir())
+    names = [n for n in names if os.path.isfile(f"{folder_str}/{n}/{RELAX_POSCAR}")]
+    return names, f"SELECT {folder.name}: using glob: {len(names)} candidates"
 
 
-def _load_relax_energy(meta_path: Path) -> float:
-    d = json.loads(meta_path.read_text(encoding="utf-8"))
+def _formation_inputs(folder: Path, ref_path: Path) -> List[str | Path]:
+    """Files formation_energies.csv of `folder` is derived from."""
+    paths: List[str | Path] = [ref_path, folder / CAND_LIST]
+    with os.scandir(folder) as it:
+        for e in it:
+            if e.name.startswith("candidate_") and e.is_dir():
+                paths.append(f"{e.path}/{RELAX_META}")
+                paths.append(f"{e.path}/{RELAX_POSCAR}")
+    return paths
+
+
+def _load_relax_energy(meta_path: str) -> float:
+    d = load_json_file(meta_path)
     if "energy_relaxed_eV" not in d:
         raise KeyError(f"{meta_path} missing 'energy_relaxed_eV'")
     return float(d["energy_relaxed_eV"])
 
 
+def _read_candidate_inputs(cand_dir: str) -> Optional[Tuple[float, Dict[str, int]]]:
+    """(E_doped, species counts) for one relaxed candidate, or None if its meta.json is missing."""
+    meta_path = f"{cand_dir}/{RELAX_META}"
+    if not os.path.exists(meta_path):
+        return None
+    return _load_relax_energy(meta_path), _count_species_from_poscar(f"{cand_dir}/{RELAX_POSCAR}")
+
+
 def _compute_substitution_dopant_counts(
     counts_doped: Dict[str, int],
     host: str,
@@ -269,10 +352,156 @@ def _compute_substitution_dopant_counts(
     return dopants
 
 
-def _write_candidate_meta(candidate_dir: Path, payload: Dict[str, Any]) -> None:
-    out_dir = candidate_dir / "04_formation"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    (out_dir / "meta.json").write_text(json.dumps(payload, indent=2), encoding="utf-8")
+def _write_candidate_meta(candidate_dir: str, payload: Dict[str, Any]) -> None:
+    out_dir = f"{candidate_dir}/04_formation"
+    os.makedirs(out_dir, exist_ok=True)
+    with open(f"{out_dir}/meta.json", "w", encoding="utf-8") as f:
+        f.write(json.dumps(payload, indent=2))
+
+
+def _formation_one_folder(
+    folder: Path,
+    cfg: FormationConfig,
+    refs: _FormationRefs,
+    progress: str,
+) -> List[Tuple[int, str]]:
+    """
+    Compute formation energies for one composition folder and write its outputs.
+
+    Runs in-process or in a worker process; log lines are returned as (level, message)
+    and emitted by the caller so they reach the run log in both cases.
+    """
+    notes: List[Tuple[int, str]] = []
+    out_csv = folder / OUT_CSV
+
+    names, select_msg = _get_candidate_poscars(folder)
+    notes.append((logging.INFO, select_msg))
+    if not names:
+        notes.append((logging.INFO, f"SKIP {progress} {folder.name}: no relaxed candidates found (run Step 03)"))
+        return notes
+
+    rows: List[Tuple[str, float, float, float, int, str]] = []
+
+    # loop invariants as locals
+    mu, mu_host = refs.mu, refs.mu_host
+    E_pristine, n_atoms_supercell = refs.E_pristine, refs.n_atoms_supercell
+    host, anions, normalize = cfg.host_species, cfg.anion_species, cfg.normalize
+    # (mu_host - mu_d) per species, and the correction term per dopant-count signature:
+    # candidates of one composition folder share a handful of signatures.
+    dmu = {el: mu_host - v for el, v in mu.items()}
+    corr_cache: Dict[Tuple[Tuple[str, int], ...], Tuple[float, List[str]]] = {}
+
+    # Candidate inputs are read on a thread pool so file latency overlaps. Results are
+    # consumed in order, so errors surface for the same candidate as a serial read.
+    # candidate paths are plain strings: no Path objects built per candidate
+    folder_str = os.fspath(folder)
+    cand_dirs = [f"{folder_str}/{n}" for n in names]
+    with ThreadPoolExecutor(max_workers=_PREFETCH_THREADS) as ex:
+        pending = [ex.submit(_read_candidate_inputs, d) for d in cand_dirs]
+
+    for cand, cand_dir, fut in zip(names, cand_dirs, pending):
+        inputs = fut.result()
+        if inputs is None:
+            notes.append((logging.WARNING, f"{folder.name}/{cand}: missing {RELAX_META} -> skip"))
+            continue
+
+        E_doped, counts = inputs
+        dop_counts = _compute_substitution_dopant_counts(counts, host, anions)
+        n_dop_total = sum(dop_counts.values())
+
+        # formation energy correction term: sum_d n_d (mu_host - mu_d)
+        sig = tuple(dop_counts.items())
+        cached = corr_cache.get(sig)
+        if cached is None:
+            corr = 0.0
+            missing: List[str] = []
+            for d, n in sig:
+                if d not in dmu:
+                    missing.append(d)
+                    continue
+                corr += float(n) * dmu[d]
+            cached = corr_cache[sig] = (corr, missing)
+        corr, missing = cached
+
+        if missing:
+            notes.append((logging.WARNING, f"{folder.name}/{cand}: missing mu for {missing} -> skip"))
+            continue
+
+        E_form_total = float(E_doped - E_pristine + corr)
+
+        # normalization mode
+        if normalize == "total":
+            E_report = E_form_total
+            norm_tag = "total_eV"
+
+        elif normalize == "per_host":
+            if n_atoms_supercell <= 0:
+                raise KeyError(
+                    "reference JSON missing host/pristine n_atoms_supercell "
+                    "(needed for normalize='per_host')."
+                )
+            E_report = E_form_total / float(n_atoms_supercell)
+            norm_tag = "eV_per_supercell_atom"
+
+        else:
+            # per dopant atom
+            if n_dop_total <= 0:
+                E_report = E_form_total
+                norm_tag = "total_eV"
+            else:
+                E_report = E_form_total / float(n_dop_total)
+                norm_tag = "eV_per_dopant_atom"
+
+        # Write candidate meta for collection stage
+        payload: Dict[str, Any] = {
+            "stage": "04_formation",
+            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "reference_mode": refs.ref_mode,
+            "definition": refs.definition,
+            "host_formula": refs.host_formula,
+            "host_species": host,
+            "anion_species": anions,
+            "E_doped_eV": float(E_doped),
+            "E_pristine_eV": float(E_pristine),
+            "n_atoms_supercell": int(n_atoms_supercell),
+            "mu_eV_per_atom_used": {
+                host: float(mu_host),
+                **{k: float(mu[k]) for k in dop_counts.keys()},
+            },
+            "dopant_counts": dop_counts,
+            "E_form_eV_total": float(E_form_total),
+            "reported": {"value": float(E_report), "unit": norm_tag},
+        }
+        _write_candidate_meta(cand_dir, payload)
+
+        dop_str = ";".join([f"{k}:{v}" for k, v in sorted(dop_counts.items())]) if dop_counts else ""
+        rows.append((cand, E_doped, E_form_total, E_report, n_dop_total, dop_str))
+
+    if not rows:
+        notes.append((logging.INFO, f"SKIP {folder.name}: no valid candidates"))
+        return notes
+
+    # Sort by total formation energy
+    rows.sort(key=itemgetter(2))
+
+    with out_csv.open("w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(
+            [
+                "candidate",
+                "E_doped_eV",
+                "E_form_eV_total",
+                f"E_form_{cfg.normalize}",
+                "n_dopant_atoms",
+                "dopant_counts",
+                "reference_mode",
+            ]
+        )
+        for cand, E_d, Eft, Erf, nd, dops in rows:
+            w.writerow([cand, f"{E_d:.8f}", f"{Eft:.8f}", f"{Erf:.8f}", nd, dops, refs.ref_mode])
+
+    notes.append((logging.INFO, f"OK   {folder.name}: wrote {OUT_CSV} (rows={len(rows)})"))
+    return notes
 
 
 def run_formation(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None = None) -> None:
@@ -288,7 +517,8 @@ def run_formation(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | No
       - candidate_*/04_formation/meta.json
     """
     cfg = _parse_formation_config(raw_cfg, root)
-    ref = _load_ref_json(root)
+    ref_path = (root / REF_JSON).resolve()
+    ref = _load_ref_json(ref_path)
 
     # pristine host energy (supercell total) + natoms (for per_host normalization)
     E_pristine, n_atoms_supercell = _get_pristine_energy_and_natoms(ref)
@@ -311,141 +541,59 @@ def run_formation(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | No
     if not cfg.outdir.exists():
         raise FileNotFoundError(f"Output directory not found: {cfg.outdir} (did you run Step 01?)")
 
-    folders = sorted([p for p in cfg.outdir.iterdir() if p.is_dir()])
+    with os.scandir(cfg.outdir) as it:
+        folders = [cfg.outdir / name for name in sorted(e.name for e in it if e.is_dir())]
 
     log.info("Step 06 formation: scanning %d folders in: %s", len(folders), cfg.outdir)
-    log.info("Using reference file: %s", (root / REF_JSON).resolve())
+    log.info("Using reference file: %s", ref_path)
     log.info("Output per folder: %s", OUT_CSV)
 
+    refs = _FormationRefs(
+        ref_mode=ref_mode,
+        definition=ref.get("definition", ""),
+        host_formula=host_formula,
+        E_pristine=float(E_pristine),
+        n_atoms_supercell=int(n_atoms_supercell),
+        mu=mu,
+        mu_host=float(mu_host),
+    )
+
+    todo: List[Tuple[Path, str]] = []
     for i, folder in enumerate(folders, start=1):
         out_csv = folder / OUT_CSV
 
-        if cfg.skip_if_done and out_csv.exists():
-            log.info("SKIP (%d/%d) %s: %s exists", i, len(folders), folder.name, OUT_CSV)
+        if cfg.skip_if_done and output_up_to_date(out_csv, _formation_inputs(folder, ref_path)):
+            log.info("SKIP (%d/%d) %s: %s is up to date", i, len(folders), folder.name, OUT_CSV)
             continue
 
-        poscars = _get_candidate_poscars(folder)
-        if not poscars:
-            log.info("SKIP (%d/%d) %s: no relaxed candidates found (run Step 03)", i, len(folders), folder.name)
-            continue
-
-        rows: List[Tuple[str, float, float, float, int, str]] = []
-
-        for poscar in poscars:
-            cand_dir = poscar.parents[1]  # candidate_XXX
-            meta_path = cand_dir / RELAX_META
-            if not meta_path.exists():
-                log.warning("%s/%s: missing %s -> skip", folder.name, cand_dir.name, RELAX_META)
-                continue
-
-            E_doped = _load_relax_energy(meta_path)
-            counts = _count_species_from_poscar(poscar)
-            dop_counts = _compute_substitution_dopant_counts(counts, cfg.host_species, cfg.anion_species)
-            n_dop_total = sum(dop_counts.values())
-
-            # formation energy correction term: sum_d n_d (mu_host - mu_d)
-            corr = 0.0
-            missing: List[str] = []
-            for d, n in dop_counts.items():
-                if d not in mu:
-                    missing.append(d)
-                    continue
-                corr += float(n) * (mu_host - mu[d])
-
-            if missing:
-                log.warning("%s/%s: missing mu for %s -> skip", folder.name, cand_dir.name, missing)
-                continue
-
-            E_form_total = float(E_doped - E_pristine + corr)
-
-            # normalization mode
-            if cfg.normalize == "total":
-                E_report = E_form_total
-                norm_tag = "total_eV"
-
-            elif cfg.normalize == "per_host":
-                if n_atoms_supercell <= 0:
-                    raise KeyError(
-                        "reference JSON missing host/pristine n_atoms_supercell "
-                        "(needed for normalize='per_host')."
-                    )
-                E_report = E_form_total / float(n_atoms_supercell)
-                norm_tag = "eV_per_supercell_atom"
-
-            else:
-                # per dopant atom
-                if n_dop_total <= 0:
-                    E_report = E_form_total
-                    norm_tag = "total_eV"
-                else:
-                    E_report = E_form_total / float(n_dop_total)
-                    norm_tag = "eV_per_dopant_atom"
-
-            # Write candidate meta for collection stage
-            payload: Dict[str, Any] = {
-                "stage": "04_formation",
-                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
-                "reference_mode": ref_mode,
-                "definition": ref.get("definition", ""),
-                "host_formula": host_formula,
-                "host_species": cfg.host_species,
-                "anion_species": cfg.anion_species,
-                "E_doped_eV": float(E_doped),
-                "E_pristine_eV": float(E_pristine),
-                "n_atoms_supercell": int(n_atoms_supercell),
-                "mu_eV_per_atom_used": {
-                    cfg.host_species: float(mu_host),
-                    **{k: float(mu[k]) for k in dop_counts.keys()},
-                },
-                "dopant_counts": dop_counts,
-                "E_form_eV_total": float(E_form_total),
-                "reported": {"value": float(E_report), "unit": norm_tag},
-            }
-            _write_candidate_meta(cand_dir, payload)
-
-            dop_str = ";".join([f"{k}:{v}" for k, v in sorted(dop_counts.items())]) if dop_counts else ""
-            rows.append((cand_dir.name, E_doped, E_form_total, E_report, n_dop_total, dop_str))
-
-        if not rows:
-            log.info("SKIP %s: no valid candidates", folder.name)
-            continue
-
-        # Sort by total formation energy
-        rows.sort(key=lambda x: x[2])
-
-        with out_csv.open("w", newline="", encoding="utf-8") as f:
-            w = csv.writer(f)
-            w.writerow(
-                [
-                    "candidate",
-                    "E_doped_eV",
-                    "E_form_eV_total",
-                    f"E_form_{cfg.normalize}",
-                    "n_dopant_atoms",
-                    "dopant_counts",
-                    "reference_mode",
-                ]
+        todo.append((folder, f"({i}/{len(folders)})"))
+
+    # Folders are independent: each writes only its own CSV and candidate meta files.
+    n_workers = min(cfg.n_workers, len(todo))
+    if n_workers > 1:
+        import multiprocessing as mp
+
+        log.info("Formation workers: %d", n_workers)
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=mp.get_context("spawn")) as ex:
+            results = ex.map(
+                _formation_one_folder,
+                [folder for folder, _ in todo],
+                repeat(cfg),
+                repeat(refs),
+                [progress for _, progress in todo],
             )
-            for cand, E_d, Eft, Erf, nd, dops in rows:
-                w.writerow([cand, f"{E_d:.8f}", f"{Eft:.8f}", f"{Erf:.8f}", nd, dops, ref_mode])
-
-        log.info("OK   %s: wrote %s (rows=%d)", folder.name, OUT_CSV, len(rows))
+            for notes in results:
+                for level, msg in notes:
+                    log.log(level, msg)
+    else:
+        for folder, progress in todo:
+            for level, msg in _formation_one_folder(folder, cfg, refs, progress):
+                log.log(level, msg)
 
     log.info("DONE Step 06 formation.")
 
 
-# TOML wrapper
-try:
-    import tomllib  # py3.11+
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
-
-
 def run_formation_from_toml(config_path: Path) -> None:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     run_formation(raw, root, config_path=config_path)
\ No newline at end of file
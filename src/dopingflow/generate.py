@@ -1,23 +1,37 @@
 from __future__ import annotations
 
+import functools
 import hashlib
 import json
 import logging
+import math
+import os
 import shutil
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from dataclasses import dataclass
+from itertools import islice
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
-
-try:
-    import tomllib  # py3.11+
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
+import numpy as np
 from pymatgen.core import Structure
 from pymatgen.io.vasp import Poscar
 
+from dopingflow._jsonio import dumps_json
+from dopingflow._toml import load_toml
+
 log = logging.getLogger(__name__)
 
+# threads writing POSCAR/metadata.json files while the next structure is built
+_WRITE_THREADS = 4
+
+# compositions sent to a worker process per task
+_JOBS_PER_TASK = 8
+
+# compositions rounded per normalize_batch call when streaming enumerated compositions
+_ROUND_CHUNK = 4096
+
 
 # -----------------------------
 # Config for this step
@@ -31,6 +45,9 @@ class GenerateConfig:
     poscar_order: List[str]
     seed_base: int
     clean_outdir: bool  # keep default True to match old behavior
+    skip_if_done: bool  # keep compositions whose POSCAR/metadata.json are current
+    n_workers: int  # processes building/writing structures (1 = serial)
+    shuffle_rng: str  # "python" (random.Random, historical) or "philox" (NumPy)
 
     # doping
     mode: str  # "explicit" or "enumerate"
@@ -47,8 +64,15 @@ class GenerateConfig:
     levels: List[float]
 
 
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
+@functools.lru_cache(maxsize=16)
+def _load_structure_cached(path_str: str, mtime_ns: int) -> Structure:
+    # keyed like load_toml_cached: a rewritten POSCAR is parsed again
+    return Structure.from_file(path_str)
+
+
+def _load_structure(path: Path) -> Structure:
+    """Structure from a POSCAR, parsed once per (path, mtime). Returns a private copy."""
+    return _load_structure_cached(str(path), path.stat().st_mtime_ns).copy()
 
 
 def _parse_generate_config(raw: dict[str, Any]) -> GenerateConfig:
@@ -61,6 +85,13 @@ def _parse_generate_config(raw: dict[str, Any]) -> GenerateConfig:
     poscar_order = list(gen.get("poscar_order", []))
     seed_base = int(gen.get("seed_base", 0))
     clean_outdir = bool(gen.get("clean_outdir", True))  # default=True matches old script
+    skip_if_done = bool(gen.get("skip_if_done", False))
+    n_workers = int(gen.get("n_workers", 1))
+    if n_workers <= 0:
+        raise ValueError("[generate].n_workers must be >= 1")
+    shuffle_rng = str(gen.get("shuffle_rng", "python")).strip().lower()
+    if shuffle_rng not in {"python", "philox"}:
+        raise ValueError("[generate].shuffle_rng must be 'python' or 'philox'")
 
     mode = str(dop.get("mode", "explicit")).lower().strip()
     if mode not in {"explicit", "enumerate"}:
@@ -89,6 +120,9 @@ def _parse_generate_config(raw: dict[str, Any]) -> GenerateConfig:
         poscar_order=poscar_order,
         seed_base=seed_base,
         clean_outdir=clean_outdir,
+        skip_if_done=skip_if_done,
+        n_workers=n_workers,
+        shuffle_rng=shuffle_rng,
         mode=mode,
         host_species=host_species,
         compositions=compositions,
@@ -135,59 +169,119 @@ def _load_relaxed_host_supercell(root: Path) -> tuple[Structure, Path, dict[str,
             "Run refs-build again, or check reference_structures/relaxed outputs."
         )
 
-    s = Structure.from_file(str(poscar_path))
+    s = _load_structure(poscar_path)
     return s, poscar_path, data
 
 
 # -----------------------------
 # Core helpers (kept from your script)
 # -----------------------------
-def validate_composition_minimal(requested_pct: Dict[str, float]) -> None:
-    if not requested_pct:
-        raise ValueError("Composition dict is empty.")
-    for k, v in requested_pct.items():
-        if not isinstance(k, str) or not k.strip():
-            raise ValueError(f"Invalid element key: {k!r}")
-        if v < 0:
-            raise ValueError(f"Negative percent for {k}: {v}")
+def normalize_batch(n_host: int, requested_pcts: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Round a (N_comps, N_dopants) array of dopant percentages to integer dopant counts and
+    the effective percentages they give. Elementwise this is exactly the scalar rounding
+    of normalize_to_counts_and_effective (same operation order, round half to even).
+    Non-finite inputs give undefined counts; they are rejected during validation.
+    """
+    pcts = np.asarray(requested_pcts, dtype=np.float64)
+    with np.errstate(invalid="ignore"):
+        counts = np.rint(pcts * n_host / 100.0).astype(np.int64)
+    if n_host > 0:
+        eff = 100.0 * counts / n_host
+    else:
+        eff = np.zeros(counts.shape)
+    return counts, eff
+
+
+def _rounded_compositions(
+    n_host: int, compositions: List[Dict[str, float]]
+) -> List[Tuple[Dict[str, int], Dict[str, float]]]:
+    """Per-composition (counts, effective %) dicts from a single normalize_batch call."""
+    columns = {el: j for j, el in enumerate(dict.fromkeys(el for c in compositions for el in c))}
+    pcts = np.zeros((len(compositions), len(columns)))
+    for i, comp in enumerate(compositions):
+        for el, pct in comp.items():
+            pcts[i, columns[el]] = pct
+
+    counts, eff = normalize_batch(n_host, pcts)
+    out = []
+    for i, comp in enumerate(compositions):
+        cols = [columns[el] for el in comp]
+        out.append((dict(zip(comp, counts[i, cols].tolist())), dict(zip(comp, eff[i, cols].tolist()))))
+    return out
+
+
+def _iter_rounded(
+    n_host: int, compositions: Iterable[Dict[str, float]]
+) -> Iterator[Tuple[Dict[str, float], Tuple[Dict[str, int], Dict[str, float]]]]:
+    """(composition, rounded) pairs, rounding _ROUND_CHUNK compositions at a time."""
+    from itertools import islice
+
+    it = iter(compositions)
+    while True:
+        chunk = list(islice(it, _ROUND_CHUNK))
+        if not chunk:
+            return
+        yield from zip(chunk, _rounded_compositions(n_host, chunk))
 
 
 def normalize_to_counts_and_effective(
-    n_host: int, requested_pct: Dict[str, float]
+    n_host: int,
+    requested_pct: Dict[str, float],
+    *,
+    rounded: Optional[Tuple[Dict[str, int], Dict[str, float]]] = None,
 ) -> tuple[Dict[str, int], Dict[str, float], List[str], float, float]:
     """
-    Convert requested dopant percentages (relative to host sites) into integer dopant counts
-    by rounding to the nearest integer number of substitutions.
+    Validate requested dopant percentages (relative to host sites) and convert them into
+    integer dopant counts by rounding to the nearest integer number of substitutions.
+
+    `rounded` may hold the (counts, effective %) dicts precomputed for a whole batch of
+    compositions (see _rounded_compositions); they are validated and returned as is.
     """
-    warnings: List[str] = []
+    if not requested_pct:
+        raise ValueError("Composition dict is empty.")
 
-    requested_total = float(sum(requested_pct.values()))
-    if requested_total > 100.0 + 1e-9:
-        raise ValueError(f"Requested total dopant % exceeds 100%: {requested_total}")
+    if rounded is None:
+        rounded = _rounded_compositions(n_host, [requested_pct])[0]
+    counts, effective = rounded
 
-    counts: Dict[str, int] = {}
-    effective: Dict[str, float] = {}
+    warnings: List[str] = []
+    requested_total = 0.0
+    eff_total = 0.0
+    n_dopants = 0
 
+    # one pass: validation, warnings and the running totals
     for el, pct in requested_pct.items():
-        raw = pct * n_host / 100.0
-        c = int(round(raw))
-        counts[el] = c
+        if not isinstance(el, str) or not el.strip():
+            raise ValueError(f"Invalid element key: {el!r}")
+        if pct < 0:
+            raise ValueError(f"Negative percent for {el}: {pct}")
+        if not math.isfinite(pct):
+            raise ValueError(f"Non-finite percent for {el}: {pct}")
+
+        c = counts[el]
+        eff = effective[el]
 
-        eff = (100.0 * c / n_host) if n_host > 0 else 0.0
-        effective[el] = eff
+        requested_total += pct
+        eff_total += eff
+        n_dopants += c
 
         if abs(eff - pct) > 1e-9:
             warnings.append(f"{el}: requested {pct:.6g}% -> rounded to {c} atoms -> effective {eff:.6g}%")
 
-    eff_total = float(sum(effective.values()))
+    requested_total = float(requested_total)
+    eff_total = float(eff_total)
+    if requested_total > 100.0 + 1e-9:
+        raise ValueError(f"Requested total dopant % exceeds 100%: {requested_total}")
+
     if abs(eff_total - requested_total) > 1e-9:
         warnings.append(
             f"Total: requested {requested_total:.6g}% -> effective {eff_total:.6g}% after rounding"
         )
 
-    if sum(counts.values()) > n_host:
+    if n_dopants > n_host:
         raise ValueError(
-            f"Rounded dopant atoms ({sum(counts.values())}) exceed host sites ({n_host}). "
+            f"Rounded dopant atoms ({n_dopants}) exceed host sites ({n_host}). "
             "Reduce requested doping or increase supercell."
         )
 
@@ -214,8 +308,15 @@ def composition_tag(effective_pct: Dict[str, float], must_first: List[str] | Non
 
 
 def stable_seed_from_tag(tag: str, seed_base: int) -> int:
-    h = hashlib.sha256((str(seed_base) + "::" + tag).encode("utf-8")).hexdigest()
-    return int(h[:8], 16)
+    # first 4 digest bytes, big-endian == int(hexdigest()[:8], 16): seeds (and thus the
+    # generated structures) stay the same as in earlier versions
+    h = hashlib.sha256(f"{seed_base}::{tag}".encode("utf-8")).digest()
+    return int.from_bytes(h[:4], "big")
+
+
+def _host_site_indices(s: Structure, host_species: str) -> List[int]:
+    species = np.array([site.species_string for site in s])
+    return np.flatnonzero(species == host_species).tolist()
 
 
 def build_structure_from_counts(
@@ -223,22 +324,50 @@ def build_structure_from_counts(
     host_species: str,
     dopant_counts: Dict[str, int],
     seed: int,
+    *,
+    host_indices: Optional[List[int]] = None,
+    shuffle_rng: str = "python",
 ) -> Structure:
-    import random
+    """
+    Substitute dopants on randomly chosen (seeded) host sites of `pristine`.
+    `host_indices` may be passed precomputed (see _host_site_indices); it is not modified.
 
-    s = pristine.copy()
-    rng = random.Random(seed)
+    shuffle_rng="python" (random.Random) reproduces structures of earlier versions for
+    the same seed; "philox" shuffles with NumPy's Philox generator instead (faster on
+    large supercells, but a different substitution pattern for the same seed).
+    """
+    species: List[Any] = [site.species_string for site in pristine]
+    if host_indices is None:
+        host_indices = _host_site_indices(pristine, host_species)
+    if sum(dopant_counts.values()) > len(host_indices):
+        raise ValueError(
+            f"Dopant atoms ({sum(dopant_counts.values())}) exceed host sites ({len(host_indices)})."
+        )
 
-    host_indices = [i for i, site in enumerate(s) if site.species_string == host_species]
-    rng.shuffle(host_indices)
+    if shuffle_rng == "philox":
+        order = np.array(host_indices, dtype=np.int64)
+        np.random.Generator(np.random.Philox(np.random.SeedSequence(seed))).shuffle(order)
+        host_indices = order.tolist()
+    else:
+        import random
+
+        host_indices = list(host_indices)
+        random.Random(seed).shuffle(host_indices)
 
     cursor = 0
     for dopant, n in dopant_counts.items():
-        for _ in range(n):
-            idx = host_indices[cursor]
-            cursor += 1
-            s[idx] = dopant
-    return s
+        for idx in host_indices[cursor : cursor + n]:
+            species[idx] = dopant
+        cursor += n
+
+    # one new Structure from the substituted species list: no deep copy of the
+    # pristine supercell and no per-site __setitem__
+    return Structure(
+        pristine.lattice,
+        species,
+        pristine.frac_coords,
+        site_properties=pristine.site_properties or None,
+    )
 
 
 def reorder_structure_by_species(s: Structure, order: List[str]) -> Structure:
@@ -246,13 +375,21 @@ def reorder_structure_by_species(s: Structure, order: List[str]) -> Structure:
         return s
 
     order = [x for x in order if x]
-    species_in_s = [sp.symbol for sp in s.composition.elements]
+    # element symbols straight from the sites (s.composition would build a Composition)
+    species_in_s = {sp.symbol for site in s for sp in site.species}
     remaining = [x for x in species_in_s if x not in order]
     final = order + sorted(remaining)
 
-    return s.get_sorted_structure(
-        key=lambda site: final.index(site.species_string) if site.species_string in final else 10**9
-    )
+    # first position wins, as with final.index(); species not in final sort last
+    rank: Dict[str, int] = {}
+    for i, sp in enumerate(final):
+        rank.setdefault(sp, i)
+
+    # a stable sort of an already ordered structure is the identity: skip it
+    ranks = [rank.get(site.species_string, 10**9) for site in s]
+    if all(a <= b for a, b in zip(ranks, ranks[1:])):
+        return s
+    return s.get_sorted_structure(key=lambda site: rank.get(site.species_string, 10**9))
 
 
 def enumerate_compositions(
@@ -262,43 +399,228 @@ def enumerate_compositions(
     allowed_totals: List[float],
     levels: List[float],
 ) -> List[Dict[str, float]]:
-    from itertools import combinations, product
+    return list(iter_compositions(dopants, must_include, max_dopants_total, allowed_totals, levels))
+
 
+def iter_compositions(
+    dopants: List[str],
+    must_include: List[str],
+    max_dopants_total: int,
+    allowed_totals: List[float],
+    levels: List[float],
+) -> Iterator[Dict[str, float]]:
+    """
+    Lazy version of enumerate_compositions (same compositions, same order). The arguments
+    are validated when called; compositions are produced one at a time while iterating.
+    """
+    # With unique dopants and unique levels every (subset, level tuple) pair is a distinct
+    # composition, so no dedup pass is needed afterwards. Deduplicating the levels keeps
+    # the first occurrences, i.e. the same order the old post-hoc dedup produced.
     dopants = list(dict.fromkeys(dopants))
     must_include = list(dict.fromkeys(must_include))
+    levels = list(dict.fromkeys(float(x) for x in levels))
 
     if not dopants:
         raise ValueError("enumerate mode requires [doping].dopants")
     if not levels:
-        raise ValueError("enumerate mode requires [doping].levels (e.g., [5,10,15])")
+        raise ValueError("enumerate mode requires non-empty [doping].levels (e.g., [5,10,15])")
     if not allowed_totals:
-        raise ValueError("enumerate mode requires [doping].allowed_totals (e.g., [5,10,15])")
+        raise ValueError(
+            "enumerate mode requires non-empty [doping].allowed_totals (e.g., [5,10,15])"
+        )
 
-    comps: List[Dict[str, float]] = []
+    return _iter_compositions(
+        dopants,
+        must_include,
+        min(max_dopants_total, len(dopants)),
+        np.asarray(levels, dtype=np.float64),
+        np.asarray(allowed_totals, dtype=np.float64),
+    )
 
-    for k in range(1, max_dopants_total + 1):
-        for subset in combinations(dopants, k):
-            subset = list(subset)
-            if any(m not in subset for m in must_include):
-                continue
 
-            for lv in product(levels, repeat=k):
-                comp = {el: float(p) for el, p in zip(subset, lv)}
-                total = sum(comp.values())
-                if any(abs(total - t) < 1e-9 for t in allowed_totals):
-                    comps.append(comp)
+# slack for the bound checks that prune level prefixes; looser than the 1e-9 used to
+# match totals, so rounding in the bounds never drops a valid tuple
+_PRUNE_TOL = 1e-6
+
+
+def _allowed_level_rows(L: np.ndarray, allowed: np.ndarray, k: int) -> List[List[float]]:
+    """
+    Level tuples of length k whose total is one of `allowed`, in
+    itertools.product(levels, repeat=k) order. The tuples are built one position at a
+    time and prefixes that can no longer reach any allowed total are dropped before
+    they are expanded.
+    """
+    lo, hi = L.min(), L.max()
+    amin, amax = allowed.min(), allowed.max()
+    n = len(L)
+
+    rows = np.empty((1, 0))
+    sums = np.zeros(1)
+    for i in range(k):
+        rows = np.hstack([np.repeat(rows, n, axis=0), np.tile(L, len(rows))[:, None]])
+        sums = np.repeat(sums, n) + np.tile(L, len(sums))
+        left = k - i - 1
+        keep = (sums + left * lo <= amax + _PRUNE_TOL) & (sums + left * hi >= amin - _PRUNE_TOL)
+        rows, sums = rows[keep], sums[keep]
+
+    ok = (np.abs(sums[:, None] - allowed[None, :]) < 1e-9).any(axis=1)
+    return rows[ok].tolist()
+
+
+def _iter_compositions(
+    dopants: List[str], must_include: List[str], max_k: int, L: np.ndarray, allowed: np.ndarray
+) -> Iterator[Dict[str, float]]:
+    from itertools import combinations
+
+    # no levels or no allowed totals: nothing can match (and min/max are undefined)
+    if L.size == 0 or allowed.size == 0:
+        return
+
+    lo, hi = float(L.min()), float(L.max())
+    amin, amax = float(allowed.min()), float(allowed.max())
+
+    for k in range(1, max_k + 1):
+        # no k levels can add up to an allowed total
+        if lo * k > amax + _PRUNE_TOL or hi * k < amin - _PRUNE_TOL:
+            continue
+
+        # level tuples are the same for every subset of size k
+        level_rows = _allowed_level_rows(L, allowed, k)
+        if not level_rows:
+            continue
+
+        subsets = [s for s in combinations(dopants, k) if all(m in s for m in must_include)]
+        for subset in subsets:
+            for lv in level_rows:
+                yield dict(zip(subset, lv))
+
+
+def _render_one_composition(
+    pristine: Structure,
+    host_species: str,
+    host_indices: List[int],
+    poscar_order: List[str],
+    shuffle_rng: str,
+    seed: int,
+    dopant_counts: Dict[str, int],
+    meta: Dict[str, Any],
+) -> Tuple[str, bytes]:
+    """(POSCAR text, metadata.json bytes) for one composition."""
+    s = build_structure_from_counts(
+        pristine=pristine,
+        host_species=host_species,
+        dopant_counts=dopant_counts,
+        seed=seed,
+        host_indices=host_indices,
+        shuffle_rng=shuffle_rng,
+    )
+    s2 = reorder_structure_by_species(s, poscar_order)
+    return Poscar(s2).get_str(vasp4_compatible=False), dumps_json(meta, pretty=True)
+
 
-    uniq = {}
-    for c in comps:
-        key = tuple(sorted(c.items()))
-        uniq[key] = c
-    return list(uniq.values())
+def _write_composition_files(comp_dir: str, poscar_text: str, meta_bytes: bytes) -> None:
+    os.makedirs(comp_dir, exist_ok=True)
+    with open(os.path.join(comp_dir, "POSCAR"), "w", encoding="utf-8") as f:
+        f.write(poscar_text)
+    with open(os.path.join(comp_dir, "metadata.json"), "wb") as f:
+        f.write(meta_bytes)
+
+
+def _write_one_composition(
+    pristine: Structure,
+    host_species: str,
+    host_indices: List[int],
+    poscar_order: List[str],
+    shuffle_rng: str,
+    comp_dir: str,
+    seed: int,
+    dopant_counts: Dict[str, int],
+    meta: Dict[str, Any],
+) -> None:
+    texts = _render_one_composition(
+        pristine, host_species, host_indices, poscar_order, shuffle_rng, seed, dopant_counts, meta
+    )
+    _write_composition_files(comp_dir, *texts)
+
+
+# per-worker state, set once by the pool initializer (the pristine supercell is
+# pickled once per worker instead of once per composition)
+_WORKER_STATE: Optional[Tuple[Structure, str, List[int], List[str], str]] = None
+
+
+def _init_worker(
+    pristine: Structure,
+    host_species: str,
+    host_indices: List[int],
+    poscar_order: List[str],
+    shuffle_rng: str,
+) -> None:
+    global _WORKER_STATE
+    _WORKER_STATE = (pristine, host_species, host_indices, poscar_order, shuffle_rng)
+
+
+def _write_one_in_worker(job: Tuple[str, int, Dict[str, int], Dict[str, Any]]) -> None:
+    assert _WORKER_STATE is not None
+    _write_one_composition(*_WORKER_STATE, *job)
+
+
+def _write_many_in_worker(jobs: List[Tuple[str, int, Dict[str, int], Dict[str, Any]]]) -> None:
+    for job in jobs:
+        _write_one_in_worker(job)
+
+
+def _run_bounded(ex: Executor, fn, items: Iterable[Any], max_in_flight: int) -> None:
+    """
+    Submit fn(item) for each item, keeping at most `max_in_flight` unfinished tasks: the
+    oldest is waited for (and its error re-raised) before the next item is drawn.
+    """
+    pending: Deque[Future] = deque()
+    for item in items:
+        if len(pending) >= max_in_flight:
+            pending.popleft().result()
+        pending.append(ex.submit(fn, item))
+    while pending:
+        pending.popleft().result()
+
+
+def _unrequested_compositions(outdir: Path, requested_tags: Set[str]) -> List[Path]:
+    """Composition folders (those with a metadata.json) in outdir whose tag is not requested."""
+    with os.scandir(outdir) as it:
+        return sorted(
+            Path(e.path)
+            for e in it
+            if e.is_dir()
+            and e.name not in requested_tags
+            and os.path.isfile(os.path.join(e.path, "metadata.json"))
+        )
+
+
+def _composition_up_to_date(comp_dir: str, meta: Dict[str, Any], host_mtime_ns: int) -> bool:
+    """
+    True iff comp_dir holds a POSCAR newer than the host supercell and a metadata.json
+    equal to `meta` (same seed, counts, ordering, ... so the same structure).
+    """
+    try:
+        if os.stat(os.path.join(comp_dir, "POSCAR")).st_mtime_ns < host_mtime_ns:
+            return False
+        with open(os.path.join(comp_dir, "metadata.json"), "r", encoding="utf-8") as f:
+            existing = json.load(f)
+    except (OSError, ValueError):
+        return False
+    # round-trip so tuples/ints compare the way they were stored
+    return existing == json.loads(json.dumps(meta))
 
 
 # -----------------------------
 # Public API (module entry)
 # -----------------------------
-def run_generate(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None = None) -> Path:
+def run_generate(
+    raw_cfg: dict[str, Any],
+    root: Path,
+    *,
+    config_path: Path | None = None,
+    force: bool = False,
+) -> Path:
     """
     Generate one random doped POSCAR per composition.
 
@@ -310,18 +632,23 @@ def run_generate(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | Non
     Output:
       <outdir>/<tag>/POSCAR
       <outdir>/<tag>/metadata.json
+
+    With [generate].skip_if_done, the outdir is kept (unless force=True) and
+    compositions whose outputs are up to date are not rewritten. Folders of compositions
+    that are no longer requested are removed ([generate].clean_outdir) or reported.
     """
     cfg = _parse_generate_config(raw_cfg)
+    incremental = cfg.skip_if_done and not force
 
     outdir = (root / cfg.outdir).resolve()
-    if cfg.clean_outdir and outdir.exists():
+    if cfg.clean_outdir and not incremental and outdir.exists():
         log.info("Cleaning existing outdir: %s", outdir)
         shutil.rmtree(outdir)
     outdir.mkdir(parents=True, exist_ok=True)
 
     pristine, host_supercell_path, ref_data = _load_relaxed_host_supercell(root)
 
-    host_indices = [i for i, site in enumerate(pristine) if site.species_string == cfg.host_species]
+    host_indices = _host_site_indices(pristine, cfg.host_species)
     n_host = len(host_indices)
     log.info(
         "Using relaxed host supercell: %s",
@@ -335,11 +662,13 @@ def run_generate(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | Non
             "Check [doping].host_species."
         )
 
+    requested_comps: Iterable[Dict[str, float]]
     if cfg.mode == "explicit":
         requested_comps = cfg.compositions
         must_first_for_tag: List[str] = []
     else:
-        requested_comps = enumerate_compositions(
+        # streamed: enumerated compositions are never all held in one list
+        requested_comps = iter_compositions(
             dopants=cfg.dopants,
             must_include=cfg.must_include,
             max_dopants_total=cfg.max_dopants_total,
@@ -348,69 +677,124 @@ def run_generate(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | Non
         )
         must_first_for_tag = cfg.must_include
 
-    log.info("Mode=%s. Compositions to generate: %d", cfg.mode, len(requested_comps))
+    log.info("Mode=%s.", cfg.mode)
 
+    # Tags, seeds and rounding warnings are resolved serially (tag disambiguation is
+    # order dependent); building and writing the structures is independent per job.
+    # Jobs are produced lazily and handed on as they come, so neither the compositions
+    # nor their meta dicts are ever all held at once.
     tag_counts: Dict[str, int] = {}
-
-    for idx, requested_comp in enumerate(requested_comps, start=1):
-        validate_composition_minimal(requested_comp)
-
-        dopant_counts, effective_pct, warnings, total_req, total_eff = normalize_to_counts_and_effective(
-            n_host=n_host,
-            requested_pct=requested_comp,
-        )
-
-        base_tag = composition_tag(effective_pct, must_first=must_first_for_tag) or "pristine"
-        tag_counts[base_tag] = tag_counts.get(base_tag, 0) + 1
-        tag = base_tag if tag_counts[base_tag] == 1 else f"{base_tag}__v{tag_counts[base_tag]}"
-
-        seed = stable_seed_from_tag(tag, cfg.seed_base)
-
-        if warnings:
-            log.warning("DOPING ROUNDING WARNING (requested #%d): %s", idx, requested_comp)
-            for w in warnings:
-                log.warning("  - %s", w)
-            log.warning("  -> Using EFFECTIVE composition tag: %s", tag)
-
-        s = build_structure_from_counts(
-            pristine=pristine,
-            host_species=cfg.host_species,
-            dopant_counts=dopant_counts,
-            seed=seed,
-        )
-        s2 = reorder_structure_by_species(s, cfg.poscar_order)
-
-        comp_dir = outdir / tag
-        comp_dir.mkdir(exist_ok=True)
-
-        Poscar(s2).write_file(str(comp_dir / "POSCAR"), vasp4_compatible=False)
-
-        meta = {
-            "composition_tag_effective": tag,
-            "composition_tag_effective_base": base_tag,
-            "requested_index": idx,
-            "seed": seed,
-            "poscar_order": cfg.poscar_order,
-            "host_species": cfg.host_species,
-            "n_host": n_host,
-            "requested_pct": requested_comp,
-            "rounded_counts": dopant_counts,
-            "effective_pct": effective_pct,
-            "requested_total_pct": total_req,
-            "effective_total_pct": total_eff,
-            "rounding_warnings": warnings,
-            "input_file": str(config_path.name) if config_path else "input.toml",
-            "refs_json": str((root / "reference_structures" / "reference_energies.json").resolve()),
-            "host_supercell_poscar": str(host_supercell_path),
-            "refs_reference_mode": str(ref_data.get("reference_mode", "")),
-        }
-        (comp_dir / "metadata.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    host_mtime_ns = host_supercell_path.stat().st_mtime_ns
+    tally = {"requested": 0, "skipped": 0, "written": 0}
+    requested_tags: Set[str] = set()
+
+    # per-composition paths are plain strings; Path stays at the API boundary
+    outdir_str = str(outdir)
+    refs_json_str = str((root / "reference_structures" / "reference_energies.json").resolve())
+    input_file = str(config_path.name) if config_path else "input.toml"
+    host_supercell_str = str(host_supercell_path)
+
+    def iter_jobs() -> Iterator[Tuple[str, int, Dict[str, int], Dict[str, Any]]]:
+        for idx, (requested_comp, rounded) in enumerate(_iter_rounded(n_host, requested_comps), start=1):
+            tally["requested"] = idx
+            dopant_counts, effective_pct, warnings, total_req, total_eff = normalize_to_counts_and_effective(
+                n_host=n_host,
+                requested_pct=requested_comp,
+                rounded=rounded,
+            )
+
+            base_tag = composition_tag(effective_pct, must_first=must_first_for_tag) or "pristine"
+            tag_counts[base_tag] = tag_counts.get(base_tag, 0) + 1
+            tag = base_tag if tag_counts[base_tag] == 1 else f"{base_tag}__v{tag_counts[base_tag]}"
+
+            seed = stable_seed_from_tag(tag, cfg.seed_base)
+
+            if warnings:
+                log.warning("DOPING ROUNDING WARNING (requested #%d): %s", idx, requested_comp)
+                for w in warnings:
+                    log.warning("  - %s", w)
+                log.warning("  -> Using EFFECTIVE composition tag: %s", tag)
+
+            meta = {
+                "composition_tag_effective": tag,
+                "composition_tag_effective_base": base_tag,
+                "requested_index": idx,
+                "seed": seed,
+                "shuffle_rng": cfg.shuffle_rng,
+                "poscar_order": cfg.poscar_order,
+                "host_species": cfg.host_species,
+                "n_host": n_host,
+                "requested_pct": requested_comp,
+                "rounded_counts": dopant_counts,
+                "effective_pct": effective_pct,
+                "requested_total_pct": total_req,
+                "effective_total_pct": total_eff,
+                "rounding_warnings": warnings,
+                "input_file": input_file,
+                "refs_json": refs_json_str,
+                "host_supercell_poscar": host_supercell_str,
+                "refs_reference_mode": str(ref_data.get("reference_mode", "")),
+            }
+            comp_dir = os.path.join(outdir_str, tag)
+            requested_tags.add(tag)
+            if incremental and _composition_up_to_date(comp_dir, meta, host_mtime_ns):
+                log.debug("SKIP %s: up to date", tag)
+                tally["skipped"] += 1
+                continue
+            tally["written"] += 1
+            yield comp_dir, seed, dopant_counts, meta
+
+    if cfg.n_workers > 1:
+        import multiprocessing as mp
+
+        # processes are started on the first submit, so a run with nothing to write spawns none
+        log.info("Generate workers: %d", cfg.n_workers)
+        with ProcessPoolExecutor(
+            max_workers=cfg.n_workers,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(pristine, cfg.host_species, host_indices, cfg.poscar_order, cfg.shuffle_rng),
+        ) as ex:
+            batches = iter(lambda it=iter_jobs(): list(islice(it, _JOBS_PER_TASK)), [])
+            _run_bounded(ex, _write_many_in_worker, batches, 4 * cfg.n_workers)
+    else:
+        # file writes go to a small thread pool so they overlap with building the next
+        # structure; result() re-raises write errors
+        with ThreadPoolExecutor(max_workers=_WRITE_THREADS) as io:
+            rendered = (
+                (
+                    comp_dir,
+                    *_render_one_composition(
+                        pristine, cfg.host_species, host_indices, cfg.poscar_order, cfg.shuffle_rng, seed, counts, meta
+                    ),
+                )
+                for comp_dir, seed, counts, meta in iter_jobs()
+            )
+            _run_bounded(io, lambda job: _write_composition_files(*job), rendered, 4 * _WRITE_THREADS)
+
+    log.info("Compositions to generate: %d", tally["requested"])
+    if incremental:
+        log.info("skip_if_done: %d up to date, %d written", tally["skipped"], tally["written"])
+        # later steps walk every subfolder, so leftovers would end up in the database
+        stale = _unrequested_compositions(outdir, requested_tags)
+        if stale and cfg.clean_outdir:
+            log.info("clean_outdir: removing %d compositions no longer requested", len(stale))
+            for d in stale:
+                shutil.rmtree(d)
+        elif stale:
+            log.warning(
+                "%d composition folders in %s are no longer requested and are kept "
+                "(clean_outdir=false); later steps will include them: %s",
+                len(stale),
+                outdir,
+                [d.name for d in stale],
+            )
 
     log.info("Done. Wrote structures to: %s", outdir)
     return outdir
 
 
-def run_generate_from_toml(config_path: Path) -> Path:
-    raw = _load_raw_toml(config_path)
+def run_generate_from_toml(config_path: Path, *, force: bool = False) -> Path:
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
-    return run_generate(raw, root, config_path=config_path)
\ No newline at end of file
+    return run_generate(raw, root, config_path=config_path, force=force)
\ No newline at end of file
@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import logging
 import os
-from typing import Optional, Tuple
+from typing import Any, Dict, Optional, Tuple
 
 log = logging.getLogger(__name__)
 
+# process-wide calculators, keyed by (backend, model, task, device)
+_SHARED_CALCULATORS: Dict[Tuple[str, str, str, str], Any] = {}
+
 _ALLOWED_BACKENDS = {"m3gnet", "uma", "mace", "grace"}
 
 _UMA_MODELS = {"uma-s-1p2", "uma-s-1p1", "uma-m-1p1"}
@@ -187,10 +190,14 @@ def prepare_backend_runtime(
     gpu_id: int,
     tf_threads: int = 1,
     omp_threads: int = 1,
+    xla_jit: bool = False,
 ) -> None:
     """
     Configure backend runtime environment in the current process.
     Call this before constructing the calculator.
+
+    xla_jit enables TensorFlow XLA auto-clustering (m3gnet only). Like the thread
+    settings it only takes effect if TensorFlow is not imported yet in this process.
     """
     import warnings
 
@@ -209,6 +216,10 @@ def prepare_backend_runtime(
         os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0"
         os.environ["TF_NUM_INTRAOP_THREADS"] = str(tf_threads)
         os.environ["TF_NUM_INTEROP_THREADS"] = str(tf_threads)
+        if xla_jit:
+            flags = os.environ.get("TF_XLA_FLAGS", "")
+            if "--tf_xla_auto_jit" not in flags:
+                os.environ["TF_XLA_FLAGS"] = f"{flags} --tf_xla_auto_jit=2".strip()
 
         warnings.filterwarnings("ignore", category=DeprecationWarning)
         warnings.filterwarnings("ignore", message=".*experimental_relax_shapes.*")
@@ -225,6 +236,14 @@ def prepare_backend_runtime(
             except Exception:
                 pass
 
+            # the env vars above are read only when TF is first imported; these also cover
+            # a TF imported earlier, and fail harmlessly once its runtime has started
+            try:
+                tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+                tf.config.threading.set_inter_op_parallelism_threads(tf_threads)
+            except Exception:
+                pass
+
             gpus = tf.config.list_physical_devices("GPU")
 
             if device == "cpu":
@@ -328,4 +347,26 @@ def build_ase_calculator(
 
         return grace_fm(model)
 
-    raise ValueError(f"Unsupported backend calculator build: {backend}")
\ No newline at end of file
+    raise ValueError(f"Unsupported backend calculator build: {backend}")
+
+
+def get_shared_calculator(
+    *,
+    backend: str,
+    model: str,
+    task: str,
+    device: str,
+):
+    """
+    Like build_ase_calculator, but returns the calculator already built in this process
+    for the same (backend, model, task, device). Loading a model takes seconds; with
+    this, steps running in one process (e.g. `dopingflow run-all`) load it only once.
+    """
+    key = (str(backend).strip().lower(), str(model), str(task), str(device).strip().lower())
+    calc = _SHARED_CALCULATORS.get(key)
+    if calc is None:
+        calc = build_ase_calculator(backend=backend, model=model, task=task, device=device)
+        _SHARED_CALCULATORS[key] = calc
+    else:
+        log.debug("Reusing %s calculator (model=%s, task=%s, device=%s)", *key)
+    return calc
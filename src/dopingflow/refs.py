@@ -1,15 +1,21 @@
 from __future__ import annotations
 
+import contextlib
+import functools
 import json
 import logging
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List
 
+from dopingflow._toml import load_toml
 from dopingflow.ml_backends import (
     build_ase_calculator,
     check_backend_dependency,
+    get_shared_calculator,
     normalize_backend_config,
     prepare_backend_runtime,
     set_default_runtime_env,
@@ -45,6 +51,7 @@ class RefConfig:
     max_steps: int
     tf_threads: int
     omp_threads: int
+    n_workers: int
 
     device: str
     gpu_id: int
@@ -101,6 +108,10 @@ def _parse_ref_config(raw: dict[str, Any], root: Path) -> RefConfig:
     if omp_threads <= 0:
         raise ValueError("[references].omp_threads must be > 0")
 
+    n_workers = int(refs.get("n_workers", 1))
+    if n_workers <= 0:
+        raise ValueError("[references].n_workers must be >= 1")
+
     device = str(refs.get("device", "cpu")).strip().lower()
     gpu_id = int(refs.get("gpu_id", 0))
     if device not in {"cpu", "cuda"}:
@@ -173,6 +184,7 @@ def _parse_ref_config(raw: dict[str, Any], root: Path) -> RefConfig:
         max_steps=max_steps,
         tf_threads=tf_threads,
         omp_threads=omp_threads,
+        n_workers=n_workers,
         device=device,
         gpu_id=gpu_id,
         backend=backend,
@@ -193,12 +205,19 @@ def _parse_ref_config(raw: dict[str, Any], root: Path) -> RefConfig:
     )
 
 
-def _read_poscar(path: Path):
+@functools.lru_cache(maxsize=32)
+def _load_structure_cached(path_str: str, mtime_ns: int):
     from pymatgen.core import Structure
 
+    return Structure.from_file(path_str)
+
+
+def _read_poscar(path: Path):
     if not path.exists():
         raise FileNotFoundError(f"POSCAR not found: {path}")
-    return Structure.from_file(str(path))
+    # parsed once per (path, mtime) in this process; callers get their own copy
+    path = path.resolve()
+    return _load_structure_cached(str(path), path.stat().st_mtime_ns).copy()
 
 
 def _write_poscar(struct, path: Path) -> None:
@@ -226,7 +245,7 @@ def _ensure_calculator(cfg: RefConfig) -> None:
         omp_threads=cfg.omp_threads,
     )
 
-    _CALCULATOR = build_ase_calculator(
+    _CALCULATOR = get_shared_calculator(
         backend=cfg.backend,
         model=cfg.model,
         task=cfg.task,
@@ -238,16 +257,52 @@ def _ensure_calculator(cfg: RefConfig) -> None:
     _CALCULATOR_DEVICE = cfg.device
 
 
-def _relax_structure_and_energy(struct, cfg: RefConfig):
+class _CalculatorPool:
+    """
+    Calculators for the reference-relaxation threads. ASE calculators keep per-call
+    state, so each one is lent to one thread at a time. The module calculator is lent
+    first; another is built only when every existing one is in use, so at most one per
+    concurrently running thread exists.
+    """
+
+    def __init__(self, cfg: RefConfig):
+        _ensure_calculator(cfg)
+        self._cfg = cfg
+        self._lock = threading.Lock()
+        self._free = [_CALCULATOR]
+
+    @contextlib.contextmanager
+    def borrow(self):
+        with self._lock:
+            calculator = self._free.pop() if self._free else None
+        if calculator is None:
+            log.info("Loading an extra calculator for a reference-relaxation thread")
+            calculator = build_ase_calculator(
+                backend=self._cfg.backend,
+                model=self._cfg.model,
+                task=self._cfg.task,
+                device=self._cfg.device,
+            )
+        try:
+            yield calculator
+        finally:
+            with self._lock:
+                self._free.append(calculator)
+
+
+def _relax_structure_and_energy(struct, cfg: RefConfig, *, calculator=None):
     """
     Unified structural relaxation using the same ASE calculator/optimizer route as relax.py.
+    Uses the module calculator unless `calculator` is given.
     Returns:
       (relaxed_structure, final_energy_eV, n_steps, final_fmax, converged)
     """
-    _ensure_calculator(cfg)
+    if calculator is None:
+        _ensure_calculator(cfg)
+        calculator = _CALCULATOR
     return relax_structure_with_calculator(
         struct,
-        calculator=_CALCULATOR,
+        calculator=calculator,
         optimizer_name=cfg.optimizer,
         fmax=cfg.fmax,
         max_steps=cfg.max_steps,
@@ -349,10 +404,18 @@ def run_refs_build(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | N
     # --- 3) Relax reference structures ---
     references: Dict[str, dict] = {}
 
-    def relax_ref(name: str, poscar_path: Path, ref_type: str) -> None:
+    def relax_ref(
+        name: str, poscar_path: Path, ref_type: str, *, pool: _CalculatorPool | None = None
+    ) -> dict:
         s = _read_poscar(poscar_path)
         t = time.time()
-        s_relaxed, E, nsteps, fmax_final, converged = _relax_structure_and_energy(s, cfg)
+        if pool is None:
+            s_relaxed, E, nsteps, fmax_final, converged = _relax_structure_and_energy(s, cfg)
+        else:
+            with pool.borrow() as calculator:
+                s_relaxed, E, nsteps, fmax_final, converged = _relax_structure_and_energy(
+                    s, cfg, calculator=calculator
+                )
         wall = time.time() - t
 
         out_poscar = (root / RELAXED_REFS_DIR / f"{name}_relaxed.POSCAR").resolve()
@@ -393,7 +456,6 @@ def run_refs_build(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | N
             except Exception:
                 pass
 
-        references[name] = entry
         log.info(
             "REF %s (%s): E=%.6f eV, converged=%s, saved=%s",
             name,
@@ -402,18 +464,35 @@ def run_refs_build(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | N
             converged,
             out_poscar,
         )
+        return entry
 
+    ref_jobs: List[tuple[str, Path, str]] = []
     if cfg.reference_mode == "metal":
         for el in cfg.metal_ref:
-            p = (cfg.metals_dir / f"{el}.POSCAR").resolve()
-            relax_ref(el, p, ref_type="metal")
+            ref_jobs.append((el, (cfg.metals_dir / f"{el}.POSCAR").resolve(), "metal"))
     else:
         for ox in cfg.oxides_ref:
-            p = (cfg.oxides_dir / f"{ox}.POSCAR").resolve()
-            relax_ref(ox, p, ref_type="oxide")
-
-        p_g = (cfg.gas_dir / f"{cfg.gas_ref}.POSCAR").resolve()
-        relax_ref(cfg.gas_ref, p_g, ref_type="gas")
+            ref_jobs.append((ox, (cfg.oxides_dir / f"{ox}.POSCAR").resolve(), "oxide"))
+        ref_jobs.append((cfg.gas_ref, (cfg.gas_dir / f"{cfg.gas_ref}.POSCAR").resolve(), "gas"))
+
+    # The references are independent relaxations. With n_workers > 1 (CPU only) they run
+    # in threads that borrow calculators from a pool seeded with the module calculator, so
+    # only n_workers - 1 extra models are loaded; the host relaxations above have already
+    # prepared the backend runtime on the main thread.
+    n_workers = 1 if cfg.device == "cuda" else min(cfg.n_workers, len(ref_jobs))
+    if n_workers > 1:
+        log.info("Reference relaxation threads: %d", n_workers)
+        pool = _CalculatorPool(cfg)
+        with ThreadPoolExecutor(max_workers=n_workers) as ex:
+            futures = [
+                ex.submit(relax_ref, name, path, ref_type, pool=pool) for name, path, ref_type in ref_jobs
+            ]
+            # results are collected in job order, so the JSON layout does not depend on timing
+            for (name, _, _), fut in zip(ref_jobs, futures):
+                references[name] = fut.result()
+    else:
+        for name, path, ref_type in ref_jobs:
+            references[name] = relax_ref(name, path, ref_type)
 
     # --- 4) Write JSON cache ---
     out: dict[str, Any] = {
@@ -474,18 +553,7 @@ def run_refs_build(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | N
     return out_json
 
 
-# --- TOML loader wrapper used by CLI ---
-try:
-    import tomllib
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
-
-
 def run_refs_build_from_toml(config_path: Path) -> Path:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     return run_refs_build(raw, root, config_path=config_path)
\ No newline at end of file
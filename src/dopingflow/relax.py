@@ -1,30 +1,43 @@
 from __future__ import annotations
 
-import json
+import csv
+import functools
+import itertools
 import logging
+import os
+import queue
+import sys
+import threading
 import time
 import traceback
-from collections import Counter
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Tuple
 
-from pymatgen.core import Structure
+import numpy as np
+from pymatgen.core import Lattice, Structure
 from pymatgen.io.vasp import Poscar
 
+from dopingflow._jsonio import dumps_json, loads_json
+from dopingflow._toml import load_toml
 from dopingflow.ml_backends import (
-    build_ase_calculator,
     check_backend_dependency,
+    get_shared_calculator,
     normalize_backend_config,
     prepare_backend_runtime,
     set_default_runtime_env,
 )
-from dopingflow.ml_relaxation import relax_structure_with_calculator
+from dopingflow.ml_relaxation import relax_structure_with_calculator, structure_energy_with_calculator
 
 log = logging.getLogger(__name__)
 
 set_default_runtime_env(tf_threads=1, omp_threads=1)
 
+# candidates of a folder are submitted as about this many batches per worker: fewer
+# round-trips than one job per candidate, small enough to keep workers load-balanced
+_BATCHES_PER_WORKER = 3
+
 
 # -----------------------------
 # Config model
@@ -42,6 +55,10 @@ class RelaxConfig:
     skip_candidate_if_done: bool
     device: str
     gpu_id: int
+    xla_jit: bool
+    start_method: str
+    pin_workers: bool
+    pretty_meta: bool
 
     backend: str
     model: str
@@ -68,6 +85,10 @@ def _parse_relax_config(raw: dict[str, Any], root: Path) -> RelaxConfig:
     skip_candidate_if_done = bool(rel.get("skip_candidate_if_done", True))
     device = str(rel.get("device", "cpu")).lower()
     gpu_id = int(rel.get("gpu_id", 0))
+    xla_jit = bool(rel.get("xla_jit", False))
+    start_method = str(rel.get("start_method", "spawn")).strip().lower()
+    pin_workers = bool(rel.get("pin_workers", False))
+    pretty_meta = bool(rel.get("pretty_meta", False))
 
     backend = str(rel.get("backend", "m3gnet")).strip().lower()
     model = str(rel.get("model", "default")).strip()
@@ -88,6 +109,8 @@ def _parse_relax_config(raw: dict[str, Any], root: Path) -> RelaxConfig:
         raise ValueError('[relax].device must be either "cpu" or "cuda"')
     if gpu_id < 0:
         raise ValueError("[relax].gpu_id must be >= 0")
+    if start_method not in {"spawn", "forkserver"}:
+        raise ValueError('[relax].start_method must be either "spawn" or "forkserver"')
     if optimizer not in {"bfgs", "lbfgs", "fire", "mdmin", "quasinewton"}:
         raise ValueError(
             '[relax].optimizer must be one of: "bfgs", "lbfgs", "fire", "mdmin", "quasinewton"'
@@ -112,6 +135,10 @@ def _parse_relax_config(raw: dict[str, Any], root: Path) -> RelaxConfig:
         skip_candidate_if_done=skip_candidate_if_done,
         device=device,
         gpu_id=gpu_id,
+        xla_jit=xla_jit,
+        start_method=start_method,
+        pin_workers=pin_workers,
+        pretty_meta=pretty_meta,
         backend=backend,
         model=model,
         task=task,
@@ -122,45 +149,132 @@ def _parse_relax_config(raw: dict[str, Any], root: Path) -> RelaxConfig:
 # -----------------------------
 # Helpers
 # -----------------------------
-def _reorder_sites(struct: Structure, order: List[str]) -> Structure:
+def _site_species(struct: Structure) -> List[str]:
+    return [site.species_string for site in struct]
+
+
+def _sort_index(struct: Structure, order: List[str], species: Optional[List[str]] = None) -> np.ndarray:
+    """
+    Site permutation sorting by (position of the species in `order`, species, z, y, x) in
+    fractional coordinates; species not in `order` go last. Stable, like sorted() with that
+    key. `species` may pass _site_species(struct) if the caller already has it.
+    """
     order_index = {el: i for i, el in enumerate(order)}
+    if species is None:
+        species = _site_species(struct)
+    fc = struct.frac_coords
+
+    # integer keys: indices into the sorted unique names order sites exactly as the names
+    # would, and the `order` rank is looked up once per species rather than once per site
+    uniq, inv = np.unique(np.array(species), return_inverse=True)
+    rank = np.array([order_index.get(el, 999) for el in uniq.tolist()], dtype=np.int64)[inv]
+
+    # np.lexsort sorts by the last key first
+    return np.lexsort((fc[:, 0], fc[:, 1], fc[:, 2], inv, rank))
 
-    def key(site):
-        el = site.species_string
-        return (
-            order_index.get(el, 999),
-            el,
-            site.frac_coords[2],
-            site.frac_coords[1],
-            site.frac_coords[0],
-        )
 
-    sites_sorted = sorted(struct.sites, key=key)
+def _reorder_sites(struct: Structure, order: List[str], species: Optional[List[str]] = None) -> Structure:
+    """struct with its sites permuted by _sort_index."""
+    idx = _sort_index(struct, order, species)
+
+    # already in order (the stable sort is the identity): reuse the structure, unless it
+    # carries site properties, which the rebuilt structure would drop from the POSCAR
+    if not struct.site_properties and np.array_equal(idx, np.arange(len(idx))):
+        return struct
+
+    sites = struct.sites
     return Structure(
         struct.lattice,
-        [s.species for s in sites_sorted],
-        [s.frac_coords for s in sites_sorted],
+        [sites[i].species for i in idx],
+        struct.frac_coords[idx],
     )
 
 
-def _safe_write_poscar(struct: Structure, path: Path, order: List[str]) -> None:
-    s2 = _reorder_sites(struct, order) if order else struct
-    Poscar(s2).write_file(str(path), vasp4_compatible=False)
+@functools.lru_cache(maxsize=256)
+def _parse_poscar_cached(path_str: str, mtime_ns: int) -> Structure:
+    # what Structure.from_file does for a POSCAR, minus the format-registry dispatch
+    with open(path_str, "r", encoding="utf-8", errors="replace") as f:
+        text = f.read()
+    return Poscar.from_str(text, default_names=None, read_velocities=False).structure
 
 
-def _species_counts(struct: Structure) -> Dict[str, int]:
-    return dict(Counter(site.species_string for site in struct))
+def _read_poscar(path: Path) -> Structure:
+    """POSCAR parsed once per (path, mtime) in this process; returns a private copy."""
+    path_str = str(path)
+    return _parse_poscar_cached(path_str, os.stat(path_str).st_mtime_ns).copy()
 
 
-def _load_json(path: Path) -> Optional[Dict[str, Any]]:
-    if not path.exists():
-        return None
+def _poscar_str(struct: Structure, idx: Optional[np.ndarray] = None) -> str:
+    """
+    Same text as Poscar(struct).get_str() (VASP 5, direct, 16 decimals) for an ordered
+    structure without site properties, formatted with one %-operation per block.
+    With `idx`, sites are written in that order, as if struct had been rebuilt with them.
+    """
+    matrix = struct.lattice.matrix
+    if np.linalg.det(matrix) < 0:
+        matrix = -matrix  # as pymatgen does, VASP rejects a negative triple product
+
+    sites = struct.sites
+    fc = struct.frac_coords
+    if idx is not None:
+        sites = [sites[i] for i in idx]
+        fc = fc[idx]
+    symbols = [site.specie.symbol for site in sites]
+    runs = [(sym, len(list(grp))) for sym, grp in itertools.groupby(symbols)]
+
+    row = "%21.16f %21.16f %21.16f"
+    coords = np.column_stack((fc, np.array([site.species_string for site in sites], dtype=object)))
+    return "".join(
+        (
+            f"{struct.formula}\n1.0\n",
+            ((row + "\n") * 3) % tuple(matrix.ravel().tolist()),
+            " ".join(sym for sym, _ in runs) + "\n",
+            " ".join(str(n) for _, n in runs) + "\ndirect\n",
+            ((row + " %s\n") * len(sites)) % tuple(coords.ravel().tolist()),
+        )
+    )
+
+
+def _safe_write_poscar(
+    struct: Structure, path: Path, order: List[str], species: Optional[List[str]] = None
+) -> None:
+    if struct.site_properties or struct.properties or not struct.is_ordered:
+        # selective dynamics, velocities, ... (or an error for partial occupancies)
+        s2 = _reorder_sites(struct, order, species) if order else struct
+        Poscar(s2).write_file(str(path), vasp4_compatible=False)
+        return
+    # the sorted order goes straight into the text; no reordered Structure is built
+    idx = _sort_index(struct, order, species) if order else None
+    with open(str(path), "wb") as f:
+        f.write(_poscar_str(struct, idx).encode("utf-8"))
+
+
+def _species_counts(struct: Structure, species: Optional[List[str]] = None) -> Dict[str, int]:
+    """Sites per species, keyed in order of first appearance."""
+    if species is None:
+        species = _site_species(struct)
+    if not species:
+        return {}
+    uniq, first, counts = np.unique(np.array(species), return_index=True, return_counts=True)
+    by_first = np.argsort(first)
+    return dict(zip(uniq[by_first].tolist(), counts[by_first].tolist()))
+
+
+def _loads_json(data: bytes) -> Optional[Dict[str, Any]]:
     try:
-        return json.loads(path.read_text(encoding="utf-8"))
+        return loads_json(data)
     except Exception:
         return None
 
 
+def _load_json(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        data = path.read_bytes()
+    except OSError:
+        return None
+    return _loads_json(data)
+
+
 # -----------------------------
 # Worker globals
 # -----------------------------
@@ -171,6 +285,26 @@ _CALCULATOR_TASK = None
 _CALCULATOR_DEVICE = None
 
 
+def _pin_worker(worker_counter, cores_per_worker: int) -> None:
+    """
+    Restrict this worker to its own `cores_per_worker` CPUs, taken in order from the CPUs
+    the process may use. Worker k gets slot k (modulo the number of slots, so replacement
+    workers reuse slots). Nothing is pinned if the platform or CPU count does not allow it.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+
+    cpus = sorted(os.sched_getaffinity(0))
+    n_slots = len(cpus) // cores_per_worker
+    if n_slots == 0:
+        return
+    base = (worker_id % n_slots) * cores_per_worker
+    os.sched_setaffinity(0, cpus[base : base + cores_per_worker])
+
+
 def _init_worker(
     backend: str,
     model: str,
@@ -179,18 +313,24 @@ def _init_worker(
     gpu_id: int,
     tf_threads: int,
     omp_threads: int,
+    xla_jit: bool = False,
+    worker_counter=None,
 ):
     global _CALCULATOR, _CALCULATOR_BACKEND, _CALCULATOR_MODEL, _CALCULATOR_TASK, _CALCULATOR_DEVICE
 
+    if worker_counter is not None:
+        _pin_worker(worker_counter, max(tf_threads, omp_threads))
+
     prepare_backend_runtime(
         backend=backend,
         device=device,
         gpu_id=gpu_id,
         tf_threads=tf_threads,
         omp_threads=omp_threads,
+        xla_jit=xla_jit,
     )
 
-    _CALCULATOR = build_ase_calculator(
+    _CALCULATOR = get_shared_calculator(
         backend=backend,
         model=model,
         task=task,
@@ -201,10 +341,75 @@ def _init_worker(
     _CALCULATOR_TASK = task
     _CALCULATOR_DEVICE = device
 
+    _warm_up_calculator(_CALCULATOR)
+
+
+def _warm_up_calculator(calculator) -> None:
+    """
+    One evaluation on a two-atom cell, so model loading and graph tracing happen at
+    worker start-up rather than inside the first candidate's walltime. Best effort.
+    """
+    dummy = Structure(Lattice.cubic(3.5), ["Si", "Si"], [[0.0, 0.0, 0.0], [0.5, 0.5, 0.5]])
+    try:
+        structure_energy_with_calculator(dummy, calculator)
+    except Exception as e:
+        log.debug("calculator warm-up failed (ignored): %r", e)
+
 
 # -----------------------------
 # Worker
 # -----------------------------
+def _skip_row(candidate: str, meta_prev: Dict[str, Any]) -> Dict[str, Any]:
+    """Ranking row for a candidate whose 02_relax outputs already exist."""
+    src = meta_prev.get("source_scan") or {}
+    return {
+        "candidate": candidate,
+        "status": "skip",
+        "energy_relaxed_eV": meta_prev.get("energy_relaxed_eV", ""),
+        "rank_sp": src.get("rank_sp", ""),
+        "energy_sp_eV": src.get("energy_sp_eV", ""),
+        "signature": src.get("signature", ""),
+        "walltime_s": meta_prev.get("walltime_s", ""),
+        "note": "already exists",
+    }
+
+
+def _previous_relax_meta(candidate_dir: str) -> Optional[Dict[str, Any]]:
+    """
+    02_relax/meta.json of a candidate whose relax outputs already exist ({} if it does
+    not parse), or None if the meta.json or the POSCAR is missing.
+    """
+    out_dir = os.path.join(candidate_dir, "02_relax")
+    try:
+        os.stat(os.path.join(out_dir, "POSCAR"))
+        with open(os.path.join(out_dir, "meta.json"), "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+    return _loads_json(data) or {}
+
+
+def _probe_candidate(
+    cand_path: Path, skip_if_done: bool
+) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]], Optional[str]]:
+    """
+    (meta_scan, meta_prev, skip_reason) for one candidate, reading each meta.json at most
+    once. meta_prev is set when the candidate is skipped because it is already relaxed;
+    meta_scan is only read for a candidate that will actually be relaxed.
+    """
+    if skip_if_done:
+        meta_prev = _previous_relax_meta(str(cand_path))
+        if meta_prev is not None:
+            return None, meta_prev, "already exists"
+
+    scan_dir = cand_path / "01_scan"
+    poscar_in = scan_dir / "POSCAR"
+    if not poscar_in.exists():
+        return None, None, f"missing {poscar_in}"
+
+    return _load_json(scan_dir / "meta.json"), None, None
+
+
 def _relax_one_candidate(
     job: Tuple[
         str,
@@ -220,6 +425,8 @@ def _relax_one_candidate(
         str,
         str,
         str,
+        bool,
+        bool,
     ]
 ) -> Dict[str, Any]:
     (
@@ -236,36 +443,24 @@ def _relax_one_candidate(
         model,
         task,
         optimizer,
+        xla_jit,
+        pretty_meta,
     ) = job
 
     cand_path = Path(candidate_dir_str)
-
-    scan_dir = cand_path / "01_scan"
-    poscar_in = scan_dir / "POSCAR"
-    meta_in = scan_dir / "meta.json"
+    poscar_in = cand_path / "01_scan" / "POSCAR"
 
     out_dir = cand_path / "02_relax"
     out_dir.mkdir(parents=True, exist_ok=True)
 
     meta_out = out_dir / "meta.json"
 
-    if skip_candidate_if_done and meta_out.exists() and (out_dir / "POSCAR").exists():
-        meta_prev = _load_json(meta_out) or {}
-        src = meta_prev.get("source_scan") or {}
-        return {
-            "candidate": cand_path.name,
-            "status": "skip",
-            "energy_relaxed_eV": meta_prev.get("energy_relaxed_eV", ""),
-            "rank_sp": src.get("rank_sp", ""),
-            "energy_sp_eV": src.get("energy_sp_eV", ""),
-            "signature": src.get("signature", ""),
-            "walltime_s": meta_prev.get("walltime_s", ""),
-            "note": "already exists",
-        }
-
-    meta_scan = _load_json(meta_in) or {}
-    if not poscar_in.exists():
-        return {"candidate": cand_path.name, "status": "skip", "error": f"missing {poscar_in}"}
+    meta_scan, meta_prev, skip_reason = _probe_candidate(cand_path, skip_candidate_if_done)
+    if meta_prev is not None:
+        return _skip_row(cand_path.name, meta_prev)
+    if skip_reason is not None:
+        return {"candidate": cand_path.name, "status": "skip", "error": skip_reason}
+    meta_scan = meta_scan or {}
 
     global _CALCULATOR
     if _CALCULATOR is None:
@@ -277,11 +472,12 @@ def _relax_one_candidate(
             gpu_id=gpu_id,
             tf_threads=tf_threads,
             omp_threads=omp_threads,
+            xla_jit=xla_jit,
         )
 
     t0 = time.time()
     try:
-        s0 = Structure.from_file(str(poscar_in))
+        s0 = _read_poscar(poscar_in)
 
         s_rel, e_rel, nsteps, fmax_final, converged = relax_structure_with_calculator(
             s0,
@@ -291,7 +487,8 @@ def _relax_one_candidate(
             max_steps=int(max_steps),
         )
 
-        _safe_write_poscar(s_rel, out_dir / "POSCAR", order=order)
+        species_rel = _site_species(s_rel)
+        _safe_write_poscar(s_rel, out_dir / "POSCAR", order=order, species=species_rel)
 
         meta_relax = {
             "stage": "02_relax",
@@ -309,7 +506,7 @@ def _relax_one_candidate(
             "converged": bool(converged),
             "walltime_s": float(time.time() - t0),
             "energy_relaxed_eV": float(e_rel),
-            "species_counts_total": _species_counts(s_rel),
+            "species_counts_total": _species_counts(s_rel, species_rel),
             "source_scan": {
                 "rank_sp": meta_scan.get("rank_sp"),
                 "energy_sp_eV": meta_scan.get("energy_sp_eV"),
@@ -318,7 +515,7 @@ def _relax_one_candidate(
             },
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
-        meta_out.write_text(json.dumps(meta_relax, indent=2), encoding="utf-8")
+        meta_out.write_bytes(dumps_json(meta_relax, pretty_meta))
 
         return {
             "candidate": cand_path.name,
@@ -348,7 +545,7 @@ def _relax_one_candidate(
             "traceback": traceback.format_exc(),
             "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
         }
-        meta_out.write_text(json.dumps(meta_fail, indent=2), encoding="utf-8")
+        meta_out.write_bytes(dumps_json(meta_fail, pretty_meta))
 
         return {
             "candidate": cand_path.name,
@@ -360,42 +557,155 @@ def _relax_one_candidate(
         }
 
 
+def _relax_candidate_batch(jobs: List[Tuple]) -> List[Dict[str, Any]]:
+    """Relax several candidates in one worker call; one row per job, in job order."""
+    return [_relax_one_candidate(job) for job in jobs]
+
+
+RANKING_HEADER = [
+    "candidate",
+    "rank_relax",
+    "energy_relaxed_eV",
+    "rank_sp",
+    "energy_sp_eV",
+    "signature",
+    "status",
+    "walltime_s",
+    "converged",
+    "final_fmax_eV_per_A",
+    "optimizer_steps",
+    "error",
+]
+# columns left empty for failed/skipped candidates
+_NOT_OK_BLANK = {"rank_relax", "converged", "final_fmax_eV_per_A", "optimizer_steps"}
+# unranked rows, appended as results arrive; replaced by ranking_relax.csv at the end
+RANKING_PROGRESS = "ranking_relax.progress.csv"
+
+
+def _ranking_cells(r: Dict[str, Any], blank: set[str]) -> List[str]:
+    # str() renders values exactly as the former f-string writer did (None -> "None")
+    return ["" if k in blank else str(r.get(k, "")) for k in RANKING_HEADER]
+
+
+def _write_progress_rows(path: Path, rows: "queue.Queue[Optional[Dict[str, Any]]]") -> None:
+    """Writer thread: append rows from the queue to `path` until a None sentinel."""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(RANKING_HEADER)
+        f.flush()
+        while True:
+            r = rows.get()
+            if r is None:
+                return
+            w.writerow(_ranking_cells(r, {"rank_relax"}))
+            f.flush()
+
+
 def _write_ranking_csv(folder: Path, rows: List[Dict[str, Any]]) -> Path:
-    ok_rows = [r for r in rows if r.get("status") == "ok"]
-    ok_rows_sorted = sorted(ok_rows, key=lambda r: float(r["energy_relaxed_eV"]))
+    ok_rows: List[Dict[str, Any]] = []
+    other_rows: List[Dict[str, Any]] = []
+    for r in rows:
+        (ok_rows if r.get("status") == "ok" else other_rows).append(r)
+    ok_rows.sort(key=lambda r: float(r["energy_relaxed_eV"]))
 
-    for i, r in enumerate(ok_rows_sorted, start=1):
+    for i, r in enumerate(ok_rows, start=1):
         r["rank_relax"] = i
 
     ranking_path = folder / "ranking_relax.csv"
-    with open(ranking_path, "w", encoding="utf-8") as f:
-        f.write(
-            "candidate,rank_relax,energy_relaxed_eV,rank_sp,energy_sp_eV,signature,"
-            "status,walltime_s,converged,final_fmax_eV_per_A,optimizer_steps,error\n"
+    with open(ranking_path, "w", newline="", encoding="utf-8") as f:
+        # csv quotes fields containing commas or quotes (e.g. error messages)
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(RANKING_HEADER)
+        w.writerows(_ranking_cells(r, {"error"}) for r in ok_rows)
+        w.writerows(_ranking_cells(r, _NOT_OK_BLANK) for r in other_rows)
+
+    return ranking_path
+
+
+def _effective_n_workers(cfg: RelaxConfig) -> int:
+    return 1 if cfg.device == "cuda" else cfg.n_workers
+
+
+def _make_executor(cfg: RelaxConfig) -> Executor:
+    """
+    CPU: a process pool of n_workers. CUDA: a single spawned worker, so GPU visibility
+    and memory growth are set in a fresh process before the framework initializes (the
+    main process may already have loaded it on the CPU, e.g. for refs or the scan).
+    """
+    initargs = (
+        cfg.backend,
+        cfg.model,
+        cfg.task,
+        cfg.device,
+        cfg.gpu_id,
+        cfg.tf_threads,
+        cfg.omp_threads,
+        cfg.xla_jit,
+    )
+    import multiprocessing as mp
+
+    if cfg.device == "cuda":
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=mp.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=initargs,
         )
 
-        for r in ok_rows_sorted:
-            f.write(
-                f"{r.get('candidate','')},{r.get('rank_relax','')},{r.get('energy_relaxed_eV','')},"
-                f"{r.get('rank_sp','')},{r.get('energy_sp_eV','')},{r.get('signature','')},"
-                f"{r.get('status','')},{r.get('walltime_s','')},{r.get('converged','')},"
-                f"{r.get('final_fmax_eV_per_A','')},{r.get('optimizer_steps','')},\n"
-            )
+    start_method = cfg.start_method
+    if start_method == "forkserver" and sys.platform != "linux":
+        log.info("start_method=forkserver is only used on Linux; falling back to spawn.")
+        start_method = "spawn"
+    ctx = mp.get_context(start_method)
+    if start_method == "forkserver":
+        # workers fork from a server that imported numpy/pymatgen/dopingflow once; the ML
+        # framework is still imported per worker in _init_worker, never in the server
+        ctx.set_forkserver_preload(["dopingflow.relax"])
+
+    if cfg.pin_workers and not hasattr(os, "sched_setaffinity"):
+        log.info("pin_workers is not supported on this platform; workers are not pinned.")
+    elif cfg.pin_workers:
+        n_cpus = len(os.sched_getaffinity(0))
+        if n_cpus < cfg.n_workers * max(cfg.tf_threads, cfg.omp_threads):
+            log.warning("pin_workers: %d CPUs for %d workers; some workers share cores.", n_cpus, cfg.n_workers)
+        initargs = initargs + (ctx.Value("i", 0),)
+
+    return ProcessPoolExecutor(
+        max_workers=_effective_n_workers(cfg),
+        mp_context=ctx,
+        initializer=_init_worker,
+        initargs=initargs,
+    )
 
-        for r in rows:
-            if r.get("status") == "ok":
-                continue
-            f.write(
-                f"{r.get('candidate','')},,{r.get('energy_relaxed_eV','')},"
-                f"{r.get('rank_sp','')},{r.get('energy_sp_eV','')},{r.get('signature','')},"
-                f"{r.get('status','')},{r.get('walltime_s','')},,,,{r.get('error','')}\n"
-            )
 
-    return ranking_path
+def _log_row(folder_name: str, r: Dict[str, Any]) -> None:
+    if r.get("status") == "ok":
+        log.info(
+            "OK   %s/%s  E_rel=%.6f eV  converged=%s  fmax_final=%.6f  steps=%s  wall=%.1fs",
+            folder_name,
+            r["candidate"],
+            r["energy_relaxed_eV"],
+            r.get("converged"),
+            float(r.get("final_fmax_eV_per_A", 0.0)),
+            r.get("optimizer_steps"),
+            float(r.get("walltime_s", 0.0)),
+        )
+    elif r.get("status") == "skip":
+        log.info("SKIP %s/%s  %s", folder_name, r.get("candidate", "?"), r.get("note", ""))
+    else:
+        log.warning(
+            "%s %s/%s  %s",
+            str(r.get("status", "?")).upper(),
+            folder_name,
+            r.get("candidate", "?"),
+            r.get("error", "")
+        )
 
 
-def _run_folder(folder: Path, cfg: RelaxConfig) -> None:
-    candidates = sorted([p for p in folder.glob("candidate_*") if p.is_dir()])
+def _run_folder(folder: Path, cfg: RelaxConfig, executor: Executor) -> None:
+    # one directory sweep; candidate paths stay strings from here on
+    with os.scandir(folder) as it:
+        candidates = sorted(e.name for e in it if e.name.startswith("candidate_") and e.is_dir())
 
     if not candidates:
         log.info("SKIP %s: no candidate_* folders found", folder.name)
@@ -405,7 +715,7 @@ def _run_folder(folder: Path, cfg: RelaxConfig) -> None:
         log.info("SKIP %s: ranking_relax.csv already exists", folder.name)
         return
 
-    effective_n_workers = 1 if cfg.device == "cuda" else cfg.n_workers
+    effective_n_workers = _effective_n_workers(cfg)
 
     log.info("%s: found %d candidates", folder.name, len(candidates))
     log.info(
@@ -425,76 +735,69 @@ def _run_folder(folder: Path, cfg: RelaxConfig) -> None:
         cfg.omp_threads,
     )
 
-    import multiprocessing as mp
-    from concurrent.futures import ProcessPoolExecutor, as_completed
+    rows: List[Dict[str, Any]] = []
+    t0 = time.time()
 
-    ctx = mp.get_context("spawn")
+    # rows also stream to a progress file, so a crashed run leaves its results on disk
+    progress_path = folder / RANKING_PROGRESS
+    progress: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue()
+    writer = threading.Thread(target=_write_progress_rows, args=(progress_path, progress), daemon=True)
+    writer.start()
 
-    jobs = [
-        (
-            str(c),
-            cfg.fmax,
-            cfg.max_steps,
-            cfg.tf_threads,
-            cfg.omp_threads,
-            cfg.order,
-            cfg.skip_candidate_if_done,
-            cfg.device,
-            cfg.gpu_id,
-            cfg.backend,
-            cfg.model,
-            cfg.task,
-            cfg.optimizer,
-        )
-        for c in candidates
-    ]
+    def collect(r: Dict[str, Any]) -> None:
+        rows.append(r)
+        progress.put(r)
+        _log_row(folder.name, r)
 
-    rows: List[Dict[str, Any]] = []
-    t0 = time.time()
+    try:
+        # candidates with existing outputs are skipped here, without a round-trip to a worker
+        folder_str = str(folder)
+        todo: List[str] = []
+        for name in candidates:
+            cand = os.path.join(folder_str, name)
+            meta_prev = _previous_relax_meta(cand) if cfg.skip_candidate_if_done else None
+            if meta_prev is not None:
+                collect(_skip_row(name, meta_prev))
+            else:
+                todo.append(cand)
+
+        jobs = [
+            (
+                c,
+                cfg.fmax,
+                cfg.max_steps,
+                cfg.tf_threads,
+                cfg.omp_threads,
+                cfg.order,
+                cfg.skip_candidate_if_done,
+                cfg.device,
+                cfg.gpu_id,
+                cfg.backend,
+                cfg.model,
+                cfg.task,
+                cfg.optimizer,
+                cfg.xla_jit,
+                cfg.pretty_meta,
+            )
+            for c in todo
+        ]
 
-    with ProcessPoolExecutor(
-        max_workers=effective_n_workers,
-        mp_context=ctx,
-        initializer=_init_worker,
-        initargs=(
-            cfg.backend,
-            cfg.model,
-            cfg.task,
-            cfg.device,
-            cfg.gpu_id,
-            cfg.tf_threads,
-            cfg.omp_threads,
-        ),
-    ) as ex:
-        futures = [ex.submit(_relax_one_candidate, j) for j in jobs]
+        # round-robin batches, so slow and fast candidates spread over the batches
+        n_batches = min(len(jobs), effective_n_workers * _BATCHES_PER_WORKER)
+        batches = [jobs[i::n_batches] for i in range(n_batches)]
+        futures = [executor.submit(_relax_candidate_batch, b) for b in batches]
 
         for fut in as_completed(futures):
-            r = fut.result()
-            rows.append(r)
-
-            if r.get("status") == "ok":
-                log.info(
-                    "OK   %s/%s  E_rel=%.6f eV  converged=%s  fmax_final=%.6f  steps=%s  wall=%.1fs",
-                    folder.name,
-                    r["candidate"],
-                    r["energy_relaxed_eV"],
-                    r.get("converged"),
-                    float(r.get("final_fmax_eV_per_A", 0.0)),
-                    r.get("optimizer_steps"),
-                    float(r.get("walltime_s", 0.0)),
-                )
-            elif r.get("status") == "skip":
-                log.info("SKIP %s/%s  %s", folder.name, r.get("candidate", "?"), r.get("note", ""))
-            else:
-                log.warning(
-                    "%s %s/%s  %s",
-                    str(r.get("status", "?")).upper(),
-                    folder.name,
-                    r.get("candidate", "?"),
-                    r.get("error", "")
-                )
+            for r in fut.result():
+                collect(r)
+    finally:
+        progress.put(None)
+        writer.join()
 
+    # ranking_relax.csv mutates the rows (rank_relax), so only after the writer is done
     ranking_path = _write_ranking_csv(folder, rows)
+    progress_path.unlink(missing_ok=True)
+
     n_ok = sum(1 for r in rows if r.get("status") == "ok")
     n_fail = sum(1 for r in rows if r.get("status") == "fail")
     n_skip = sum(1 for r in rows if r.get("status") == "skip")
@@ -523,7 +826,8 @@ def run_relax(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None =
     if not cfg.outdir.exists():
         raise FileNotFoundError(f"Output directory not found: {cfg.outdir} (did you run step 01?)")
 
-    folders = sorted([p for p in cfg.outdir.iterdir() if p.is_dir()])
+    with os.scandir(cfg.outdir) as it:
+        folders = [cfg.outdir / name for name in sorted(e.name for e in it if e.is_dir())]
 
     log.info("Step 03 relax: %d structure folders in: %s", len(folders), cfg.outdir)
     log.info(
@@ -539,25 +843,18 @@ def run_relax(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None =
         log.info("CUDA mode: forcing effective_n_workers=1 for safe GPU usage.")
     log.info("NOTE: main-directory POSCAR is ignored; only subfolders are processed.")
 
-    for i, folder in enumerate(folders, start=1):
-        log.info("RUN (%d/%d) %s", i, len(folders), folder.name)
-        _run_folder(folder, cfg)
+    # One executor for all folders: workers (and the model each one loaded) are reused
+    # instead of being respawned per folder. Workers start on the first submit, so
+    # a run where every folder is skipped starts nothing.
+    with _make_executor(cfg) as ex:
+        for i, folder in enumerate(folders, start=1):
+            log.info("RUN (%d/%d) %s", i, len(folders), folder.name)
+            _run_folder(folder, cfg, ex)
 
     log.info("DONE Step 03 relax for all structure folders.")
 
 
-# TOML wrapper
-try:
-    import tomllib
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
-
-
 def run_relax_from_toml(config_path: Path) -> None:
-    raw = _load_raw_toml(config_path)
+    raw = load_toml(config_path)
     root = config_path.resolve().parent
     run_relax(raw, root, config_path=config_path)
\ No newline at end of file
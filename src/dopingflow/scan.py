@@ -1,6 +1,9 @@
 from __future__ import annotations
 
-import heapq
+import csv
+import functools
+import hashlib
+import itertools
 import json
 import logging
 import math
@@ -8,22 +11,22 @@ import os
 import time
 from collections import Counter
 from dataclasses import dataclass
-from itertools import combinations
 from multiprocessing import get_context
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
 from pymatgen.core import Structure
 from pymatgen.io.vasp import Poscar
 from pymatgen.symmetry.analyzer import SpacegroupAnalyzer
 
+from dopingflow._toml import load_toml_cached
 from dopingflow.ml_backends import (
     check_backend_dependency,
+    get_shared_calculator,
     normalize_backend_config,
     prepare_backend_runtime,
     set_default_runtime_env,
-    build_ase_calculator,
 )
 from dopingflow.ml_relaxation import structure_energy_with_calculator
 
@@ -49,6 +52,7 @@ class ScanConfig:
     host_species: str
     max_unique: int
     skip_if_done: bool
+    pin_workers: bool
 
     device: str
     gpu_id: int
@@ -80,6 +84,7 @@ def _parse_scan_config(raw: dict[str, Any]) -> ScanConfig:
     host_species = str(dop.get("host_species", "")).strip()
     max_unique = int(scan.get("max_unique", 100_000))
     skip_if_done = bool(scan.get("skip_if_done", True))
+    pin_workers = bool(scan.get("pin_workers", False))
 
     backend = str(scan.get("backend", "m3gnet")).strip().lower()
     model = str(scan.get("model", "default")).strip()
@@ -147,6 +152,7 @@ def _parse_scan_config(raw: dict[str, Any]) -> ScanConfig:
         host_species=host_species,
         max_unique=max_unique,
         skip_if_done=skip_if_done,
+        pin_workers=pin_workers,
         device=device,
         gpu_id=gpu_id,
         backend=backend,
@@ -171,23 +177,23 @@ def _get_outdir(raw: dict[str, Any], root: Path) -> Path:
 # Helpers
 # -----------------------------
 def _reorder_sites(struct: Structure, order: List[str]) -> Structure:
+    """
+    Sites sorted by (position of the species in `order`, species, z, y, x) in fractional
+    coordinates; species not in `order` go last. Stable, like sorted() with that key.
+    """
     order_index = {el: i for i, el in enumerate(order)}
+    sites = struct.sites
+    fc = struct.frac_coords
 
-    def key(site):
-        el = site.species_string
-        return (
-            order_index.get(el, 999),
-            el,
-            site.frac_coords[2],
-            site.frac_coords[1],
-            site.frac_coords[0],
-        )
+    uniq, inv = np.unique(np.array([site.species_string for site in sites]), return_inverse=True)
+    rank = np.array([order_index.get(el, 999) for el in uniq.tolist()], dtype=np.int64)[inv]
 
-    sites_sorted = sorted(struct.sites, key=key)
+    # np.lexsort sorts by the last key first; inv orders like the species names
+    idx = np.lexsort((fc[:, 0], fc[:, 1], fc[:, 2], inv, rank))
     return Structure(
         struct.lattice,
-        [s.species for s in sites_sorted],
-        [s.frac_coords for s in sites_sorted],
+        [sites[i].species for i in idx],
+        fc[idx],
     )
 
 
@@ -241,28 +247,53 @@ def _build_symmetry_permutations(
     frac = np.array([parent[i].frac_coords for i in sublattice_indices], dtype=float)
     N = frac.shape[0]
 
-    def match_index(coord):
-        c = coord % 1.0
-        d = frac - c
+    tol2 = (symprec * 10) ** 2
+    arange_n = np.arange(N)
+
+    # Sites keyed by their cell on a periodic grid of about 5*symprec: a mapped site is
+    # looked up in O(1) and only checked against the tolerance. Images that land in
+    # another cell (or a grid too coarse to separate the sites) use the nearest-site search.
+    M = max(1, int(round(1.0 / (symprec * 5))))
+
+    def grid_keys(x: np.ndarray) -> List[int]:
+        q = np.round(x * M).astype(np.int64) % M
+        return ((q[:, 0] * M + q[:, 1]) * M + q[:, 2]).tolist()
+
+    lookup = {k: j for j, k in enumerate(grid_keys(frac))}
+    if len(lookup) < N:
+        lookup = {}
+
+    def nearest(mapped: np.ndarray) -> np.ndarray:
+        # d[i, j] = frac[j] - image of site i, periodic in fractional coordinates
+        d = frac[None, :, :] - mapped[:, None, :]
         d -= np.round(d)
-        dist2 = np.sum(d * d, axis=1)
-        j = int(np.argmin(dist2))
-        if dist2[j] > (symprec * 10) ** 2:
+        dist2 = np.einsum("ijk,ijk->ij", d, d)
+        perm = np.argmin(dist2, axis=1).astype(np.int32)
+
+        best = dist2[arange_n, perm]
+        bad = np.flatnonzero(best > tol2)
+        if bad.size:
             raise RuntimeError(
-                f"Failed to match symmetry-mapped site (min dist^2={dist2[j]})."
+                f"Failed to match symmetry-mapped site (min dist^2={best[bad[0]]})."
             )
-        return j
-
-    perms = []
-    for op in ops:
-        R = np.array(op.rotation_matrix, dtype=float)
-        t = np.array(op.translation_vector, dtype=float)
+        return perm
+
+    # every image of every site in one contraction: mapped[k, n] = R_k @ frac[n] + t_k
+    Rs = np.array([op.rotation_matrix for op in ops], dtype=float).reshape(-1, 3, 3)
+    ts = np.array([op.translation_vector for op in ops], dtype=float).reshape(-1, 3)
+    mapped = (np.einsum("kij,nj->kni", Rs, frac) + ts[:, None, :]) % 1.0
+    K = mapped.shape[0]
+
+    matched = np.zeros(K, dtype=bool)
+    if lookup and K:
+        flat = grid_keys(mapped.reshape(-1, 3))
+        perm_all = np.fromiter((lookup.get(k, -1) for k in flat), dtype=np.int32, count=K * N).reshape(K, N)
+        d = frac[perm_all] - mapped
+        d -= np.round(d)
+        worst = np.einsum("knj,knj->kn", d, d).max(axis=1)
+        matched = (perm_all.min(axis=1) >= 0) & (worst <= tol2)
 
-        perm = np.empty(N, dtype=np.int32)
-        for i in range(N):
-            r_new = R.dot(frac[i]) + t
-            perm[i] = match_index(r_new)
-        perms.append(perm)
+    perms = [perm_all[k] if matched[k] else nearest(mapped[k]) for k in range(K)]
 
     uniq, seen = [], set()
     for p in perms:
@@ -273,62 +304,100 @@ def _build_symmetry_permutations(
     return uniq
 
 
-def _canonical_key(labels: np.ndarray, perms: List[np.ndarray]) -> bytes:
-    best = None
-    for perm in perms:
-        img = labels[perm]
-        b = img.tobytes()
-        if best is None or b < best:
-            best = b
-    assert best is not None
-    return best
+def _site_order(frac: np.ndarray) -> np.ndarray:
+    """Sites sorted by fractional (z, y, x): an order that does not depend on the file."""
+    return np.lexsort((frac[:, 0], frac[:, 1], frac[:, 2]))
 
 
-def _enumerate_label_configs(N: int, dopant_label_counts: Dict[int, int]):
-    items = list(dopant_label_counts.items())
-    allpos = list(range(N))
+def _perm_cache_key(parent: Structure, symprec: float) -> bytes:
+    """
+    Fingerprint of the parent structure with its sites in _site_order, so folders whose
+    POSCARs list the same sites in different orders (generate groups each composition's
+    dopants into their own block) share a key.
+    """
+    frac = np.ascontiguousarray(parent.frac_coords, dtype=float)
+    order = _site_order(frac)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(parent.lattice.matrix, dtype=float).tobytes())
+    h.update(frac[order].tobytes())
+    h.update(np.array(parent.atomic_numbers, dtype=np.int64)[order].tobytes())
+    h.update(np.float64(symprec).tobytes())
+    return h.digest()
+
+
+def _sublattice_permutations(
+    parent: Structure,
+    sublattice_indices: List[int],
+    symprec: float,
+    perm_cache: Optional[Dict[bytes, np.ndarray]] = None,
+) -> Tuple[np.ndarray, bool]:
+    """
+    (perm_matrix, reused): the symmetry permutations of the sublattice as a contiguous
+    intp matrix, and whether they came from `perm_cache`. The cache holds them relabelled
+    to the _site_order of the sublattice; with o that order and inv its inverse, a folder's
+    perm P and the cached C are related by C[k, i] = inv[P[k, o[i]]].
+    """
+    order = _site_order(np.asarray([parent[i].frac_coords for i in sublattice_indices], dtype=float))
+    inv = np.empty_like(order)
+    inv[order] = np.arange(len(order))
 
-    if len(items) == 0:
-        yield np.zeros(N, dtype=np.int8)
-        return
+    key = _perm_cache_key(parent, symprec) if perm_cache is not None else None
+    cached = perm_cache.get(key) if perm_cache is not None else None
+    if cached is not None:
+        return np.ascontiguousarray(order[cached[:, inv]], dtype=np.intp), True
 
-    if len(items) == 1:
-        (l1, c1) = items[0]
-        for A in combinations(allpos, c1):
-            labels = np.zeros(N, dtype=np.int8)
-            labels[list(A)] = l1
-            yield labels
-        return
+    perms = _build_symmetry_permutations(parent, sublattice_indices, symprec=symprec)
+    # native index dtype: numpy converts any other index array on every gather
+    perm_matrix = np.ascontiguousarray(np.stack(perms, axis=0), dtype=np.intp)
+    if perm_cache is not None:
+        perm_cache[key] = inv[perm_matrix[:, order]]
+    return perm_matrix, False
 
-    if len(items) == 2:
-        (l1, c1), (l2, c2) = items
-        for A in combinations(allpos, c1):
-            Aset = set(A)
-            rem1 = [p for p in allpos if p not in Aset]
-            for B in combinations(rem1, c2):
-                labels = np.zeros(N, dtype=np.int8)
-                labels[list(A)] = l1
-                labels[list(B)] = l2
-                yield labels
-        return
 
-    if len(items) == 3:
-        (l1, c1), (l2, c2), (l3, c3) = items
-        for A in combinations(allpos, c1):
-            Aset = set(A)
-            rem1 = [p for p in allpos if p not in Aset]
-            for B in combinations(rem1, c2):
-                Bset = set(B)
-                rem2 = [p for p in rem1 if p not in Bset]
-                for C in combinations(rem2, c3):
-                    labels = np.zeros(N, dtype=np.int8)
-                    labels[list(A)] = l1
-                    labels[list(B)] = l2
-                    labels[list(C)] = l3
-                    yield labels
-        return
+def _key_weights(perm_matrix: np.ndarray, max_label: int) -> Optional[np.ndarray]:
+    """
+    Packing matrix for _canonical_key, or None if N labels (0..max_label) do not fit in
+    64 bits. Image k of `labels` packed into one word, first site in the highest bits, is
+    sum_n labels[perm[k, n]] << shift[n]; moving the shifts to the sites they read gives
+    weights[k, perm[k, n]] = 1 << shift[n], so all packed images are weights @ labels.
+    """
+    K, N = perm_matrix.shape
+    bits = max(1, int(max_label).bit_length())
+    if N * bits > 64:
+        return None
+    shifts = np.arange(N - 1, -1, -1, dtype=np.uint64) * np.uint64(bits)
+    weights = np.zeros((K, N), dtype=np.uint64)
+    np.put_along_axis(weights, perm_matrix, np.left_shift(np.uint64(1), shifts)[None, :], axis=1)
+    return weights
+
+
+def _canonical_key(
+    labels: np.ndarray, perm_matrix: np.ndarray, weights: Optional[np.ndarray] = None
+) -> Union[int, bytes]:
+    """
+    Smallest image of `labels` under the symmetry permutations, the rows of perm_matrix.
+    With `weights` (see _key_weights) every image is packed into an int by one matrix-vector
+    product and the key is the smallest int, which also hashes cheaper than bytes.
+    Otherwise all images come from one gather; viewed as fixed-width byte strings they
+    order like bytes, and the key is the smallest as bytes.
+    """
+    if weights is not None:
+        return int((weights @ labels.astype(np.uint64)).min())
+    imgs = labels[perm_matrix]
+    as_bytes = imgs.view(np.dtype(("S", imgs.shape[1]))).ravel()
+    return imgs[int(np.argmin(as_bytes))].tobytes()
 
-    raise ValueError("Exact enumerator supports up to 3 dopants total. Use mode='sample' for more.")
+
+def _canonical_keys(
+    batch: np.ndarray, perm_matrix: np.ndarray, weights: Optional[np.ndarray] = None
+) -> List[Union[int, bytes]]:
+    """_canonical_key for every row of `batch` (shape [M, N]), computed together."""
+    if weights is not None:
+        return (batch.astype(np.uint64) @ weights.T).min(axis=1).tolist()
+    imgs = np.take(batch, perm_matrix, axis=1)
+    as_bytes = imgs.view(np.dtype(("S", imgs.shape[2])))[..., 0]
+    best = np.argmin(as_bytes, axis=1)
+    return [row.tobytes() for row in imgs[np.arange(len(batch)), best]]
 
 
 def _random_labels(
@@ -348,14 +417,13 @@ def _random_labels(
     return labels
 
 
-def _dopant_signature_from_labels(labels: np.ndarray, label_to_el: Dict[int, str]) -> str:
-    parts = []
-    for pos, lab in enumerate(labels):
-        lab = int(lab)
-        if lab == 0:
-            continue
-        parts.append(f"{label_to_el[lab]}{pos}")
-    return "_".join(parts) if parts else "pristine"
+def _dopant_signature_from_labels(labels: np.ndarray, label_el: np.ndarray) -> str:
+    """`label_el` maps each label to its element symbol (object array indexed by label)."""
+    positions = np.flatnonzero(labels)
+    if positions.size == 0:
+        return "pristine"
+    elems = label_el[labels[positions]]
+    return "_".join(f"{e}{p}" for e, p in zip(elems, positions.tolist()))
 
 
 def _choose_scan_mode(raw_ncfg: int, cfg: ScanConfig, n_dopants: int) -> str:
@@ -378,19 +446,42 @@ def _choose_scan_mode(raw_ncfg: int, cfg: ScanConfig, n_dopants: int) -> str:
     return "sample"
 
 
-def _update_best_heap(best, E: float, labels: np.ndarray, idx: int, topk: int) -> bool:
-    item = (-E, idx, labels.copy())
+class _BestK:
+    """
+    Running top-k lowest energies kept in fixed numpy slots; labels are copied only when
+    a configuration is accepted. Among equally worst entries the earliest evaluated one is
+    replaced first, and results come out ordered by (energy, evaluation index).
+    """
 
-    if len(best) < topk:
-        heapq.heappush(best, item)
+    def __init__(self, topk: int):
+        self.topk = topk
+        self.n = 0
+        self.energies = np.empty(topk, dtype=float)
+        self.order = np.empty(topk, dtype=np.int64)
+        self.labels: List[Optional[np.ndarray]] = [None] * topk
+
+    def offer(self, E: float, labels: np.ndarray, idx: int) -> bool:
+        if self.n < self.topk:
+            slot = self.n
+            self.n += 1
+        else:
+            worst = self.energies.max()
+            if not E < worst:
+                return False
+            tied = np.flatnonzero(self.energies == worst)
+            slot = int(tied[np.argmin(self.order[tied])])
+
+        self.energies[slot] = E
+        self.order[slot] = idx
+        self.labels[slot] = labels.copy()
         return True
 
-    worst_E = -best[0][0]
-    if E < worst_E:
-        heapq.heapreplace(best, item)
-        return True
+    def current(self) -> List[float]:
+        return np.sort(self.energies[: self.n]).tolist()
 
-    return False
+    def ranked(self) -> List[Tuple[float, int, np.ndarray]]:
+        rank = np.lexsort((self.order[: self.n], self.energies[: self.n]))
+        return [(float(self.energies[i]), int(self.order[i]), self.labels[i]) for i in rank]
 
 
 # -----------------------------
@@ -423,7 +514,7 @@ def _init_calculator(
         omp_threads=omp_threads,
     )
 
-    _CALCULATOR = build_ase_calculator(
+    _CALCULATOR = get_shared_calculator(
         backend=backend,
         model=model,
         task=task,
@@ -465,13 +556,56 @@ def _ensure_calculator(
     )
 
 
+# structure folder being scanned: sent once per worker, so jobs only carry labels
+_SCAN_LATTICE = None
+_SCAN_FRAC = None
+_SCAN_SPECIES = None
+_SCAN_SITE_PROPS = None
+_SCAN_SUBLATTICE = None
+_SCAN_LABEL_EL = None
+
+
+def _set_scan_context(base_dict: dict, sublattice_indices: List[int], label_to_el: Dict[int, str]) -> None:
+    global _SCAN_LATTICE, _SCAN_FRAC, _SCAN_SPECIES, _SCAN_SITE_PROPS, _SCAN_SUBLATTICE, _SCAN_LABEL_EL
+    # parsed once here; every job builds its structure from these arrays
+    base = Structure.from_dict(base_dict)
+    _SCAN_LATTICE = base.lattice
+    _SCAN_FRAC = base.frac_coords
+    _SCAN_SPECIES = np.array([site.species_string for site in base], dtype=object)
+    _SCAN_SITE_PROPS = base.site_properties or None
+    _SCAN_SUBLATTICE = np.asarray(sublattice_indices, dtype=np.intp)
+    _SCAN_LABEL_EL = np.array([label_to_el[lab] for lab in range(len(label_to_el))], dtype=object)
+
+
+def _pin_worker(worker_counter) -> None:
+    """
+    Restrict this single-threaded worker to one CPU, taken in order from the CPUs the
+    process may use; worker k gets CPU k modulo their number.
+    """
+    if not hasattr(os, "sched_setaffinity"):
+        return
+    with worker_counter.get_lock():
+        worker_id = worker_counter.value
+        worker_counter.value += 1
+
+    cpus = sorted(os.sched_getaffinity(0))
+    os.sched_setaffinity(0, {cpus[worker_id % len(cpus)]})
+
+
 def _worker_initializer(
     backend: str,
     model: str,
     task: str,
     device: str,
     gpu_id: int,
+    base_dict: dict,
+    sublattice_indices: List[int],
+    label_to_el: Dict[int, str],
+    worker_counter=None,
 ):
+    if worker_counter is not None:
+        _pin_worker(worker_counter)
+
     _init_calculator(
         backend=backend,
         model=model,
@@ -481,20 +615,41 @@ def _worker_initializer(
         tf_threads=1,
         omp_threads=1,
     )
+    _set_scan_context(base_dict, sublattice_indices, label_to_el)
 
 
-def _energy_worker_with_labels(args):
-    base_dict, sublattice_indices, labels, label_to_el = args
-    base_local = Structure.from_dict(base_dict)
+def _energy_worker_with_labels(labels_bytes: bytes):
+    labels = np.frombuffer(labels_bytes, dtype=np.int8)
 
-    s = base_local.copy()
-    for pos, site_index in enumerate(sublattice_indices):
-        s[site_index] = label_to_el[int(labels[pos])]
+    species = _SCAN_SPECIES.copy()
+    species[_SCAN_SUBLATTICE] = _SCAN_LABEL_EL[labels]
+    s = Structure(_SCAN_LATTICE, species.tolist(), _SCAN_FRAC, site_properties=_SCAN_SITE_PROPS)
 
     E = structure_energy_with_calculator(s, _CALCULATOR)
     return (E, labels)
 
 
+def _make_pool(
+    cfg: ScanConfig,
+    n_workers: int,
+    base_dict: dict,
+    sub_idx: List[int],
+    label_to_el: Dict[int, str],
+):
+    ctx = get_context("spawn")
+    initargs = (cfg.backend, cfg.model, cfg.task, cfg.device, cfg.gpu_id, base_dict, sub_idx, label_to_el)
+
+    if cfg.pin_workers and not hasattr(os, "sched_setaffinity"):
+        log.info("pin_workers is not supported on this platform; workers are not pinned.")
+    elif cfg.pin_workers:
+        n_cpus = len(os.sched_getaffinity(0))
+        if n_cpus < n_workers:
+            log.warning("pin_workers: %d CPUs for %d workers; some workers share cores.", n_cpus, n_workers)
+        initargs = initargs + (ctx.Value("i", 0),)
+
+    return ctx.Pool(processes=n_workers, initializer=_worker_initializer, initargs=initargs)
+
+
 def _energy_jobs_serial(jobs):
     for job in jobs:
         yield _energy_worker_with_labels(job)
@@ -512,9 +667,10 @@ def _evaluate_exact_configs(
     cfg: ScanConfig,
 ) -> Tuple[List[Tuple[float, int, np.ndarray]], Dict[str, int]]:
     base_dict = base.as_dict()
-    jobs = [(base_dict, sub_idx, lab, label_to_el) for lab in unique_labels]
+    n_jobs = len(unique_labels)
+    jobs = (lab.tobytes() for lab in unique_labels)
 
-    best = []
+    best = _BestK(cfg.topk)
     t0 = time.time()
     effective_n_workers = 1 if cfg.device == "cuda" else cfg.n_workers
 
@@ -528,34 +684,30 @@ def _evaluate_exact_configs(
             tf_threads=1,
             omp_threads=1,
         )
+        _set_scan_context(base_dict, sub_idx, label_to_el)
 
         for done, (E, labels) in enumerate(_energy_jobs_serial(jobs), start=1):
-            _update_best_heap(best, E, labels, done, cfg.topk)
+            best.offer(E, labels, done)
 
-            if done % 2000 == 0 or done == len(jobs):
-                current = sorted([-x[0] for x in best])
-                log.info("%d/%d evaluated | best energies: %s", done, len(jobs), current)
+            if done % 2000 == 0 or done == n_jobs:
+                current = best.current()
+                log.info("%d/%d evaluated | best energies: %s", done, n_jobs, current)
 
     else:
-        ctx = get_context("spawn")
-        with ctx.Pool(
-            processes=effective_n_workers,
-            initializer=_worker_initializer,
-            initargs=(cfg.backend, cfg.model, cfg.task, cfg.device, cfg.gpu_id),
-        ) as pool:
+        with _make_pool(cfg, effective_n_workers, base_dict, sub_idx, label_to_el) as pool:
             for done, (E, labels) in enumerate(
                 pool.imap_unordered(_energy_worker_with_labels, jobs, chunksize=cfg.chunksize),
                 start=1,
             ):
-                _update_best_heap(best, E, labels, done, cfg.topk)
+                best.offer(E, labels, done)
 
-                if done % 2000 == 0 or done == len(jobs):
-                    current = sorted([-x[0] for x in best])
-                    log.info("%d/%d evaluated | best energies: %s", done, len(jobs), current)
+                if done % 2000 == 0 or done == n_jobs:
+                    current = best.current()
+                    log.info("%d/%d evaluated | best energies: %s", done, n_jobs, current)
 
     log.info("Exact evaluation walltime: %.1f s", time.time() - t0)
 
-    best_sorted = sorted([(-E, idx, lab) for (E, idx, lab) in best], key=lambda x: x[0])
+    best_sorted = best.ranked()
     stats = {
         "attempted_samples": 0,
         "unique_sym_samples": len(unique_labels),
@@ -572,7 +724,8 @@ def _sample_unique_configs_and_rank(
     *,
     base: Structure,
     sub_idx: List[int],
-    perms: List[np.ndarray],
+    perm_matrix: np.ndarray,
+    key_weights: Optional[np.ndarray],
     label_to_el: Dict[int, str],
     dopant_label_counts: Dict[int, int],
     cfg: ScanConfig,
@@ -581,7 +734,7 @@ def _sample_unique_configs_and_rank(
     base_dict = base.as_dict()
 
     seen = set()
-    best = []
+    best = _BestK(cfg.topk)
 
     attempted = 0
     no_improve_counter = 0
@@ -600,6 +753,7 @@ def _sample_unique_configs_and_rank(
             tf_threads=1,
             omp_threads=1,
         )
+        _set_scan_context(base_dict, sub_idx, label_to_el)
 
         while attempted < cfg.sample_budget and no_improve_counter < cfg.sample_patience:
             batch_labels = []
@@ -608,7 +762,7 @@ def _sample_unique_configs_and_rank(
             while len(batch_labels) < cfg.sample_batch_size and attempted < cfg.sample_budget:
                 attempted += 1
                 labels = _random_labels(len(sub_idx), dopant_label_counts, rng)
-                key = _canonical_key(labels, perms)
+                key = _canonical_key(labels, perm_matrix, key_weights)
 
                 if key in seen or key in batch_keys:
                     continue
@@ -628,12 +782,12 @@ def _sample_unique_configs_and_rank(
             if not batch_labels:
                 break
 
-            jobs = [(base_dict, sub_idx, lab, label_to_el) for lab in batch_labels]
+            jobs = [lab.tobytes() for lab in batch_labels]
 
             improved_in_batch = False
             for E, labels in _energy_jobs_serial(jobs):
                 eval_counter += 1
-                improved = _update_best_heap(best, E, labels, eval_counter, cfg.topk)
+                improved = best.offer(E, labels, eval_counter)
                 if improved:
                     improved_in_batch = True
 
@@ -643,7 +797,7 @@ def _sample_unique_configs_and_rank(
                 no_improve_counter += len(batch_labels)
 
             if eval_counter % 500 == 0 or attempted >= cfg.sample_budget:
-                current = sorted([-x[0] for x in best])
+                current = best.current()
                 log.info(
                     "sampled attempts=%d | unique=%d | evaluated=%d | best=%s | no_improve=%d",
                     attempted,
@@ -654,12 +808,7 @@ def _sample_unique_configs_and_rank(
                 )
 
     else:
-        ctx = get_context("spawn")
-        with ctx.Pool(
-            processes=effective_n_workers,
-            initializer=_worker_initializer,
-            initargs=(cfg.backend, cfg.model, cfg.task, cfg.device, cfg.gpu_id),
-        ) as pool:
+        with _make_pool(cfg, effective_n_workers, base_dict, sub_idx, label_to_el) as pool:
             while attempted < cfg.sample_budget and no_improve_counter < cfg.sample_patience:
                 batch_labels = []
                 batch_keys = set()
@@ -667,7 +816,7 @@ def _sample_unique_configs_and_rank(
                 while len(batch_labels) < cfg.sample_batch_size and attempted < cfg.sample_budget:
                     attempted += 1
                     labels = _random_labels(len(sub_idx), dopant_label_counts, rng)
-                    key = _canonical_key(labels, perms)
+                    key = _canonical_key(labels, perm_matrix, key_weights)
 
                     if key in seen or key in batch_keys:
                         continue
@@ -687,7 +836,7 @@ def _sample_unique_configs_and_rank(
                 if not batch_labels:
                     break
 
-                jobs = [(base_dict, sub_idx, lab, label_to_el) for lab in batch_labels]
+                jobs = [lab.tobytes() for lab in batch_labels]
 
                 improved_in_batch = False
                 for E, labels in pool.imap_unordered(
@@ -696,7 +845,7 @@ def _sample_unique_configs_and_rank(
                     chunksize=cfg.chunksize,
                 ):
                     eval_counter += 1
-                    improved = _update_best_heap(best, E, labels, eval_counter, cfg.topk)
+                    improved = best.offer(E, labels, eval_counter)
                     if improved:
                         improved_in_batch = True
 
@@ -706,7 +855,7 @@ def _sample_unique_configs_and_rank(
                     no_improve_counter += len(batch_labels)
 
                 if eval_counter % 500 == 0 or attempted >= cfg.sample_budget:
-                    current = sorted([-x[0] for x in best])
+                    current = best.current()
                     log.info(
                         "sampled attempts=%d | unique=%d | evaluated=%d | best=%s | no_improve=%d",
                         attempted,
@@ -718,7 +867,7 @@ def _sample_unique_configs_and_rank(
 
     log.info("Sampling evaluation walltime: %.1f s", time.time() - t0)
 
-    best_sorted = sorted([(-E, idx, lab) for (E, idx, lab) in best], key=lambda x: x[0])
+    best_sorted = best.ranked()
     stats = {
         "attempted_samples": attempted,
         "unique_sym_samples": len(seen),
@@ -731,32 +880,118 @@ def _sample_unique_configs_and_rank(
 # -----------------------------
 # Exact unique generation
 # -----------------------------
+def _first_in_walk_order(
+    labels: np.ndarray, perm_matrix: np.ndarray, label_order: List[int]
+) -> Tuple[bytes, np.ndarray]:
+    """
+    (walk key, member) for the orbit member of `labels` that comes first when walking the
+    positions of each label (in label_order) as sorted tuples in lexicographic order.
+    Comparing sorted position tuples of equal length is comparing the occupation masks in
+    reverse, so the walk key is the concatenated inverted masks, smallest first.
+    """
+    if not label_order:  # pristine: the orbit is the configuration itself
+        return b"", labels
+    imgs = labels[perm_matrix]
+    walk = np.concatenate([imgs != lab for lab in label_order], axis=1).astype(np.uint8)
+    row = int(np.argmin(walk.view(np.dtype(("S", walk.shape[1]))).ravel()))
+    return walk[row].tobytes(), imgs[row].copy()
+
+
+def _enumerate_label_configs(N: int, dopant_label_counts: Dict[int, int]):
+    """
+    Every configuration, in the walk order of _first_in_walk_order: the positions of label 1
+    as sorted tuples in lexicographic order, then those of label 2 among the sites left, ...
+    """
+    label_counts = sorted(dopant_label_counts.items())
+
+    def place(labels: np.ndarray, free: Tuple[int, ...], depth: int):
+        if depth == len(label_counts):
+            yield labels.copy()
+            return
+        lab, cnt = label_counts[depth]
+        for chosen in itertools.combinations(free, cnt):
+            labels[list(chosen)] = lab
+            rest = tuple(i for i in free if i not in chosen)
+            yield from place(labels, rest, depth + 1)
+            labels[list(chosen)] = 0
+
+    yield from place(np.zeros(N, dtype=np.int8), tuple(range(N)), 0)
+
+
 def _enumerate_unique_configs_exact(
     *,
     N: int,
-    perms: List[np.ndarray],
+    perm_matrix: np.ndarray,
+    key_weights: Optional[np.ndarray],
     dopant_label_counts: Dict[int, int],
     cfg: ScanConfig,
 ) -> Tuple[List[np.ndarray], int]:
-    seen = set()
-    unique_labels: List[np.ndarray] = []
-    checked_raw = 0
-
-    for labels in _enumerate_label_configs(N, dopant_label_counts):
-        checked_raw += 1
-        key = _canonical_key(labels, perms)
-
-        if key in seen:
-            continue
-
-        seen.add(key)
-        unique_labels.append(labels.copy())
-
-        if len(unique_labels) >= cfg.max_unique:
+    # Orbit representatives are grown one dopant at a time: every level extends the
+    # symmetry-unique partial configurations of the previous one by one atom on an empty
+    # site and keeps one configuration per canonical key. Each full configuration extends
+    # some unique partial one, so no orbit is missed, and the raw configurations are never
+    # visited one by one.
+    checked_raw = _estimate_num_configs(N, dict(dopant_label_counts))
+    if len(perm_matrix) == 1:
+        # trivial symmetry group: every configuration is its own orbit
+        if checked_raw >= cfg.max_unique:
             raise RuntimeError(
                 f"Unique(sym) configs reached max_unique={cfg.max_unique}. "
                 "This composition is too large for full enumeration."
             )
+        unique_labels = list(_enumerate_label_configs(N, dopant_label_counts))
+        log.info("Done exact generation: raw=%d, unique(sym)=%d", checked_raw, len(unique_labels))
+        return unique_labels, checked_raw
+
+    # Grow in a relabelled space where the most populous label is the background 0, so only
+    # the minority atoms are placed (at most N/2 with one dopant): for a high filling the
+    # middle levels of growing the dopants themselves would hold about C(N, N/2)/|G|
+    # partial configurations.
+    # Swapping two labels maps orbits onto orbits, so the unique set is unchanged.
+    all_counts = {0: N - sum(dopant_label_counts.values()), **dopant_label_counts}
+    background = max(sorted(all_counts), key=all_counts.__getitem__)
+    swap = np.arange(max(all_counts) + 1, dtype=np.int8)
+    swap[0], swap[background] = background, 0
+
+    placements = [lab for lab in sorted(all_counts)[1:] for _ in range(all_counts[int(swap[lab])])]
+    start = np.zeros(N, dtype=np.int8)
+    level: Dict[Union[int, bytes], np.ndarray] = {_canonical_key(start, perm_matrix, key_weights): start}
+
+    for step, lab in enumerate(placements, start=1):
+        last = step == len(placements)
+        nxt: Dict[Union[int, bytes], np.ndarray] = {}
+        for labels in level.values():
+            # all one-atom extensions of this configuration as one array, keyed together
+            empty = np.flatnonzero(labels == 0)
+            children = np.repeat(labels[None, :], len(empty), axis=0)
+            children[np.arange(len(empty)), empty] = lab
+
+            for key, child in zip(_canonical_keys(children, perm_matrix, key_weights), children):
+                if key in nxt:
+                    continue
+                nxt[key] = child
+
+                if last and len(nxt) >= cfg.max_unique:
+                    raise RuntimeError(
+                        f"Unique(sym) configs reached max_unique={cfg.max_unique}. "
+                        "This composition is too large for full enumeration."
+                    )
+        level = nxt
+
+    if len(level) >= cfg.max_unique:
+        raise RuntimeError(
+            f"Unique(sym) configs reached max_unique={cfg.max_unique}. "
+            "This composition is too large for full enumeration."
+        )
+
+    # Report each orbit by the member a lexicographic walk over the positions of label 1,
+    # then label 2, ... reaches first, in that order: the candidates, their order and
+    # signatures do not depend on how the orbits were found.
+    label_order = sorted(dopant_label_counts)
+    ranked = sorted(
+        _first_in_walk_order(swap[labels], perm_matrix, label_order) for labels in level.values()
+    )
+    unique_labels = [labels for _, labels in ranked]
 
     log.info("Done exact generation: raw=%d, unique(sym)=%d", checked_raw, len(unique_labels))
     return unique_labels, checked_raw
@@ -765,7 +1000,9 @@ def _enumerate_unique_configs_exact(
 # -----------------------------
 # Core
 # -----------------------------
-def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
+def _scan_one_folder(
+    struct_dir: Path, cfg: ScanConfig, perm_cache: Optional[Dict[bytes, np.ndarray]] = None
+) -> None:
     poscar_path = struct_dir / cfg.poscar_in
     if not poscar_path.exists():
         raise FileNotFoundError(f"Missing {cfg.poscar_in} in {struct_dir}")
@@ -793,8 +1030,10 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
         raise RuntimeError("Counts inconsistent with sublattice size.")
 
     parent = _make_parent_structure(base, sub_idx, host=cfg.host_species)
-    perms = _build_symmetry_permutations(parent, sub_idx, symprec=cfg.symprec)
-    log.info("Symmetry operations (unique permutations on sublattice): %d", len(perms))
+    perm_matrix, reused = _sublattice_permutations(parent, sub_idx, cfg.symprec, perm_cache)
+    if reused:
+        log.info("Reusing symmetry permutations from a folder with the same parent structure")
+    log.info("Symmetry operations (unique permutations on sublattice): %d", len(perm_matrix))
 
     dopants_sorted = sorted(dopant_counts.items())
     label_to_el: Dict[int, str] = {0: cfg.host_species}
@@ -804,8 +1043,12 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
         dopant_label_counts[lab] = int(cnt)
 
     log.info("Label map: %s", label_to_el)
+    label_el = np.array([label_to_el[lab] for lab in range(len(label_to_el))], dtype=object)
     log.info("Label counts: %s", dopant_label_counts)
 
+    # canonical keys as packed ints when the labels fit in 64 bits, bytes otherwise
+    key_weights = _key_weights(perm_matrix, max_label=len(dopant_label_counts))
+
     selected_mode = _choose_scan_mode(raw_ncfg, cfg, n_dopants=len(dopant_label_counts))
     log.info("Selected scan mode: %s", selected_mode)
 
@@ -817,7 +1060,8 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
 
         unique_labels, checked_raw = _enumerate_unique_configs_exact(
             N=N,
-            perms=perms,
+            perm_matrix=perm_matrix,
+            key_weights=key_weights,
             dopant_label_counts=dopant_label_counts,
             cfg=cfg,
         )
@@ -836,7 +1080,8 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
         best_sorted, stats = _sample_unique_configs_and_rank(
             base=base,
             sub_idx=sub_idx,
-            perms=perms,
+            perm_matrix=perm_matrix,
+            key_weights=key_weights,
             label_to_el=label_to_el,
             dopant_label_counts=dopant_label_counts,
             cfg=cfg,
@@ -855,7 +1100,7 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
             s[site_index] = label_to_el[int(labels[pos])]
 
         s2 = _reorder_sites(s, cfg.order)
-        sig = _dopant_signature_from_labels(labels, label_to_el)
+        sig = _dopant_signature_from_labels(labels, label_el)
 
         cand_dir = struct_dir / f"candidate_{rank:03d}" / "01_scan"
         cand_dir.mkdir(parents=True, exist_ok=True)
@@ -902,7 +1147,7 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
                 "dopant_counts_on_sublattice": {k: int(v) for k, v in dopant_counts.items()},
                 "raw_configs_checked": int(checked_raw),
                 "unique_sym_configs": int(unique_count),
-                "n_sym_perms": int(len(perms)),
+                "n_sym_perms": int(len(perm_matrix)),
                 **stats,
             },
             "labels": [int(x) for x in labels.tolist()],
@@ -925,15 +1170,13 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
 
         log.info("SAVE %s | rank %d | E=%.6f eV | %s", cand_dir / "POSCAR", rank, E, sig)
 
-    (struct_dir / "ranking_scan.csv").write_text(
-        "candidate,rank_sp,energy_sp_eV,signature,backend,model,task\n"
-        + "\n".join(
-            f"{r['candidate']},{r['rank_sp']},{r['energy_sp_eV']:.10f},{r['signature']},{r['backend']},{r['model']},{r['task']}"
+    with open(struct_dir / "ranking_scan.csv", "w", encoding="utf-8", newline="") as f:
+        w = csv.writer(f, lineterminator="\n")
+        w.writerow(["candidate", "rank_sp", "energy_sp_eV", "signature", "backend", "model", "task"])
+        w.writerows(
+            [r["candidate"], r["rank_sp"], f"{r['energy_sp_eV']:.10f}", r["signature"], r["backend"], r["model"], r["task"]]
             for r in ranking_rows
         )
-        + "\n",
-        encoding="utf-8",
-    )
 
     with open(struct_dir / "scan_summary.txt", "w", encoding="utf-8") as f:
         f.write(f"CWD: {struct_dir}\n")
@@ -968,14 +1211,23 @@ def _scan_one_folder(struct_dir: Path, cfg: ScanConfig) -> None:
 # -----------------------------
 # Public API
 # -----------------------------
-def run_scan(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None = None) -> None:
+def run_scan(
+    raw_cfg: dict[str, Any],
+    root: Path,
+    *,
+    config_path: Path | None = None,
+    cfg: ScanConfig | None = None,
+) -> None:
     """
     Step 02:
       - enumerate / sample symmetry-unique dopant arrangements
       - evaluate single-point energies using selected ML backend via ASE calculator
       - keep top-k lowest energies
+
+    `cfg` may carry the already-validated [scan] section of raw_cfg.
     """
-    cfg = _parse_scan_config(raw_cfg)
+    if cfg is None:
+        cfg = _parse_scan_config(raw_cfg)
     check_backend_dependency(cfg.backend, stage_name="Scan")
 
     outdir = _get_outdir(raw_cfg, root)
@@ -998,6 +1250,9 @@ def run_scan(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None =
         log.info("CUDA mode: forcing effective_n_workers=1 for safe GPU usage.")
     log.info("NOTE: only subfolders are processed (main-directory POSCAR is ignored).")
 
+    # folders doped from the same host supercell share one parent structure
+    perm_cache: Dict[bytes, np.ndarray] = {}
+
     for i, sdir in enumerate(subdirs, start=1):
         poscar_path = sdir / cfg.poscar_in
         if not poscar_path.exists():
@@ -1026,23 +1281,21 @@ def run_scan(raw_cfg: dict[str, Any], root: Path, *, config_path: Path | None =
             )
 
         log.info("RUN (%d/%d) %s", i, len(subdirs), sdir.name)
-        _scan_one_folder(sdir, cfg)
+        _scan_one_folder(sdir, cfg, perm_cache)
 
     log.info("DONE Step 02 scan for all structure folders.")
 
 
-# TOML wrapper
-try:
-    import tomllib
-except ModuleNotFoundError:  # pragma: no cover
-    import tomli as tomllib
-
-
-def _load_raw_toml(path: Path) -> dict[str, Any]:
-    return tomllib.loads(path.read_text(encoding="utf-8"))
+@functools.lru_cache(maxsize=8)
+def _load_scan_config_cached(path_str: str, mtime_ns: int) -> Tuple[dict[str, Any], ScanConfig]:
+    # same key as load_toml_cached: an edited input.toml is read and validated again.
+    # The returned dict is shared between calls: do not mutate it.
+    raw = load_toml_cached(path_str, mtime_ns)
+    return raw, _parse_scan_config(raw)
 
 
 def run_scan_from_toml(config_path: Path) -> None:
-    raw = _load_raw_toml(config_path)
-    root = config_path.resolve().parent
-    run_scan(raw, root, config_path=config_path)
\ No newline at end of file
+    path = config_path.resolve()
+    raw, cfg = _load_scan_config_cached(str(path), path.stat().st_mtime_ns)
+    root = path.parent
+    run_scan(raw, root, config_path=config_path, cfg=cfg)
\ No newline at end of file
@@ -0,0 +1,90 @@
+import csv
+import json
+import os
+
+import pytest
+
+from dopingflow import collect
+from dopingflow.collect import OUT_CSV, run_collect
+
+
+def _make_folder(outdir, name, energies):
+    folder = outdir / name
+    for cand, e in energies.items():
+        meta = folder / cand / "02_relax" / "meta.json"
+        meta.parent.mkdir(parents=True)
+        meta.write_text(json.dumps({"energy_relaxed_eV": e}), encoding="utf-8")
+    (folder / "selected_candidates.txt").write_text("\n".join(energies) + "\n", encoding="utf-8")
+    return folder
+
+
+def _age(folder, seconds):
+    # give every file and directory of `folder` an mtime in the past, as cp -p would keep
+    for dirpath, dirnames, filenames in os.walk(folder):
+        for n in dirnames + filenames:
+            p = os.path.join(dirpath, n)
+            st = os.stat(p)
+            os.utime(p, ns=(st.st_atime_ns, st.st_mtime_ns - seconds * 10**9))
+
+
+def _rows(root):
+    with open(root / OUT_CSV, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return {(r["composition_tag"], r["candidate"]): r["E_relaxed_eV"] for r in reader}
+
+
+def test_collect_incremental(tmp_path):
+    raw = {"structure": {"outdir": "out"}, "database": {"skip_if_done": True}}
+    outdir = tmp_path / "out"
+    _make_folder(outdir, "Sb5", {"candidate_001": -1.5, "candidate_002": -1.25})
+
+    run_collect(raw, tmp_path)
+    assert _rows(tmp_path) == {("Sb5", "candidate_001"): "-1.5", ("Sb5", "candidate_002"): "-1.25"}
+
+    # a folder copied in with preserved (older) mtimes is not in the database yet
+    _age(_make_folder(outdir, "Nb5", {"candidate_001": -2.0}), 3600)
+    # a changed folder is re-read
+    meta = outdir / "Sb5" / "candidate_002" / "02_relax" / "meta.json"
+    meta.write_text(json.dumps({"energy_relaxed_eV": -1.75}), encoding="utf-8")
+    st = os.stat(tmp_path / OUT_CSV)
+    os.utime(meta, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    run_collect(raw, tmp_path)
+    assert _rows(tmp_path) == {
+        ("Nb5", "candidate_001"): "-2.0",
+        ("Sb5", "candidate_001"): "-1.5",
+        ("Sb5", "candidate_002"): "-1.75",
+    }
+
+
+def test_collect_failure_keeps_database(tmp_path, monkeypatch):
+    raw = {"structure": {"outdir": "out"}, "database": {"skip_if_done": True}}
+    outdir = tmp_path / "out"
+    _make_folder(outdir, "Nb5", {"candidate_001": -2.0})
+    sb5 = _make_folder(outdir, "Sb5", {"candidate_001": -1.5})
+    run_collect(raw, tmp_path)
+    rows = _rows(tmp_path)
+    assert len(rows) == 2
+
+    # a run that fails part way leaves the previous database in place
+    (sb5 / "selected_candidates.txt").touch()
+    st = os.stat(tmp_path / OUT_CSV)
+    os.utime(sb5 / "selected_candidates.txt", ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def fail(folder):
+        raise RuntimeError("boom")
+
+    monkeypatch.setattr(collect, "_collect_one_folder", fail)
+    with pytest.raises(RuntimeError):
+        run_collect(raw, tmp_path)
+    assert _rows(tmp_path) == rows
+
+    # a database that lost a folder's rows is not up to date, even if newer than its inputs
+    monkeypatch.undo()
+    with open(tmp_path / OUT_CSV, "r+", encoding="utf-8") as f:
+        lines = [ln for ln in f if not ln.startswith("Sb5,")]
+        f.seek(0)
+        f.writelines(lines)
+        f.truncate()
+    run_collect(raw, tmp_path)
+    assert _rows(tmp_path) == rows
@@ -0,0 +1,16 @@
+import numpy as np
+import pytest
+
+from dopingflow.generate import _iter_compositions, iter_compositions
+
+
+@pytest.mark.parametrize("allowed_totals, levels", [([5.0], []), ([], [5.0])])
+def test_enumerate_requires_levels_and_totals(allowed_totals, levels):
+    with pytest.raises(ValueError, match="non-empty"):
+        iter_compositions(["Sb", "Nb"], [], 2, allowed_totals, levels)
+
+
+def test_iter_compositions_empty_arrays():
+    empty = np.empty(0)
+    assert list(_iter_compositions(["Sb"], [], 1, empty, np.array([5.0]))) == []
+    assert list(_iter_compositions(["Sb"], [], 1, np.array([5.0]), empty)) == []
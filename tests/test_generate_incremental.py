@@ -0,0 +1,52 @@
+import json
+
+from pymatgen.core import Lattice, Structure
+
+from dopingflow.generate import run_generate
+
+
+def _setup_refs(root):
+    refs = root / "reference_structures"
+    refs.mkdir()
+    host = Structure.from_spacegroup(
+        "P4_2/mnm", Lattice.tetragonal(4.737, 3.186), ["Sn", "O"], [[0, 0, 0], [0.3056, 0.3056, 0]]
+    )
+    host.make_supercell([2, 1, 1])
+    host.to(filename=str(refs / "host_supercell.vasp"), fmt="poscar")
+    (refs / "reference_energies.json").write_text(
+        json.dumps({"host": {"relaxed_supercell_poscar": "reference_structures/host_supercell.vasp"}}),
+        encoding="utf-8",
+    )
+
+
+def _raw(compositions, clean_outdir=True):
+    return {
+        "structure": {"outdir": "out"},
+        "generate": {
+            "poscar_order": ["Sn", "Sb", "Nb", "O"],
+            "clean_outdir": clean_outdir,
+            "skip_if_done": True,
+        },
+        "doping": {"mode": "explicit", "host_species": "Sn", "compositions": compositions},
+    }
+
+
+def _folders(root):
+    return sorted(p.name for p in (root / "out").iterdir() if p.is_dir())
+
+
+def test_generate_incremental_drops_unrequested(tmp_path):
+    _setup_refs(tmp_path)
+    run_generate(_raw([{"Sb": 25.0}, {"Nb": 25.0}]), tmp_path)
+    assert len(_folders(tmp_path)) == 2
+    (tmp_path / "out" / "notes").mkdir()
+
+    # without clean_outdir the unrequested composition is kept (with a warning)
+    run_generate(_raw([{"Sb": 25.0}], clean_outdir=False), tmp_path)
+    assert len(_folders(tmp_path)) == 3
+
+    # with clean_outdir it is removed; folders generate did not write are left alone
+    run_generate(_raw([{"Sb": 25.0}]), tmp_path)
+    remaining = _folders(tmp_path)
+    assert len(remaining) == 2 and "notes" in remaining
+    assert all("Nb" not in name for name in remaining)
@@ -0,0 +1,99 @@
+import itertools
+
+import numpy as np
+import pytest
+from pymatgen.core import Lattice, Structure
+
+from dopingflow.scan import (
+    _build_symmetry_permutations,
+    _enumerate_unique_configs_exact,
+    _key_weights,
+    _make_parent_structure,
+    _parse_scan_config,
+)
+
+
+def _rutile_perm_matrix(supercell=(2, 2, 1)):
+    host = Structure.from_spacegroup(
+        "P4_2/mnm", Lattice.tetragonal(4.737, 3.186), ["Sn", "O"], [[0, 0, 0], [0.3056, 0.3056, 0]]
+    )
+    host.make_supercell(list(supercell))
+    sub_idx = [i for i, site in enumerate(host) if site.specie.symbol == "Sn"]
+    parent = _make_parent_structure(host, sub_idx, host="Sn")
+    perms = _build_symmetry_permutations(parent, sub_idx, 1e-3)
+    assert len(perms) > 1
+    return np.stack(perms, axis=0).astype(np.intp)
+
+
+def _brute_force(N, perm_matrix, dopant_label_counts):
+    # every configuration via nested combinations (label 1 first, then label 2 on the sites
+    # left, ...), keeping the first one seen of each orbit, keyed by its smallest image as bytes
+    label_counts = sorted(dopant_label_counts.items())
+
+    def walk(labels, free, depth):
+        if depth == len(label_counts):
+            yield labels.copy()
+            return
+        lab, cnt = label_counts[depth]
+        for chosen in itertools.combinations(free, cnt):
+            labels[list(chosen)] = lab
+            yield from walk(labels, [i for i in free if i not in chosen], depth + 1)
+            labels[list(chosen)] = 0
+
+    seen = set()
+    unique = []
+    n_raw = 0
+    for labels in walk(np.zeros(N, dtype=np.int8), list(range(N)), 0):
+        n_raw += 1
+        key = min(labels[perm].tobytes() for perm in perm_matrix)
+        if key not in seen:
+            seen.add(key)
+            unique.append(labels)
+    return unique, n_raw
+
+
+@pytest.mark.parametrize("packed", [True, False])
+@pytest.mark.parametrize(
+    "dopant_label_counts",
+    [{}, {1: 2}, {1: 1, 2: 2}, {1: 1, 2: 2, 3: 1}, {1: 6}, {1: 5, 2: 2}, {1: 1, 2: 6}],
+)
+@pytest.mark.parametrize("trivial_group", [False, True])
+def test_exact_enumeration_matches_brute_force(packed, dopant_label_counts, trivial_group):
+    perm_matrix = _rutile_perm_matrix()
+    if trivial_group:
+        perm_matrix = perm_matrix[:1]
+    N = perm_matrix.shape[1]
+    key_weights = _key_weights(perm_matrix, max_label=len(dopant_label_counts)) if packed else None
+    assert (key_weights is not None) == packed
+
+    unique, checked_raw = _enumerate_unique_configs_exact(
+        N=N,
+        perm_matrix=perm_matrix,
+        key_weights=key_weights,
+        dopant_label_counts=dopant_label_counts,
+        cfg=_parse_scan_config({"doping": {"host_species": "Sn"}}),
+    )
+
+    expected, n_raw = _brute_force(N, perm_matrix, dopant_label_counts)
+    assert checked_raw == n_raw
+    assert [u.tolist() for u in unique] == [e.tolist() for e in expected]
+
+
+def test_exact_enumeration_high_filling():
+    # nearly every site doped: growing the dopants one by one would pass through about
+    # C(32, 16) / |G| partial configurations
+    perm_matrix = _rutile_perm_matrix((2, 2, 4))
+    N = perm_matrix.shape[1]
+    dopant_label_counts = {1: 30}
+
+    unique, checked_raw = _enumerate_unique_configs_exact(
+        N=N,
+        perm_matrix=perm_matrix,
+        key_weights=_key_weights(perm_matrix, max_label=1),
+        dopant_label_counts=dopant_label_counts,
+        cfg=_parse_scan_config({"doping": {"host_species": "Sn"}}),
+    )
+
+    expected, n_raw = _brute_force(N, perm_matrix, dopant_label_counts)
+    assert checked_raw == n_raw == 496
+    assert [u.tolist() for u in unique] == [e.tolist() for e in expected]
@@ -0,0 +1,38 @@
+from pymatgen.core import Lattice, Structure
+from pymatgen.io.vasp import Poscar
+
+from dopingflow.generate import build_structure_from_counts, reorder_structure_by_species
+from dopingflow.scan import (
+    _build_symmetry_permutations,
+    _infer_enumeration_sublattice,
+    _make_parent_structure,
+    _sublattice_permutations,
+)
+
+
+def _generated_parent(host, counts, seed):
+    # same path as generate -> scan: substitute, group species, write and re-read the POSCAR
+    s = build_structure_from_counts(host, "Sn", counts, seed)
+    s = reorder_structure_by_species(s, ["Sn", "Sb", "Nb", "O"])
+    s = Poscar.from_str(Poscar(s).get_str()).structure
+    sub_idx, _, _ = _infer_enumeration_sublattice(s, host="Sn", anions=["O"])
+    return _make_parent_structure(s, sub_idx, host="Sn"), sub_idx
+
+
+def test_generated_compositions_share_permutations():
+    host = Structure.from_spacegroup(
+        "P4_2/mnm", Lattice.tetragonal(4.737, 3.186), ["Sn", "O"], [[0, 0, 0], [0.3056, 0.3056, 0]]
+    )
+    host.make_supercell([2, 2, 2])
+
+    cache = {}
+    results = []
+    for counts, seed in [({"Sb": 2}, 1), ({"Sb": 1, "Nb": 1}, 2), ({"Nb": 3}, 3)]:
+        parent, sub_idx = _generated_parent(host, counts, seed)
+        perm_matrix, reused = _sublattice_permutations(parent, sub_idx, 1e-3, cache)
+        fresh = _build_symmetry_permutations(parent, sub_idx, 1e-3)
+        assert {p.tobytes() for p in perm_matrix.astype(fresh[0].dtype)} == {p.tobytes() for p in fresh}
+        results.append(reused)
+
+    assert results == [False, True, True]
+    assert len(cache) == 1